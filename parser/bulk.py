@@ -0,0 +1,155 @@
+"""Concurrent schedule scraping for many groups of one provider.
+
+Used by ``parser.py --all-groups`` / ``--groups-file``. Groups are fetched and
+parsed by a bounded thread pool, or with ``--parse-processes`` fetched by the
+threads and parsed by worker processes (parse_pipeline); every result is
+written out as soon as it is ready, either as one NDJSON line or as one JSON
+file per group. A failure is recorded for its group and does not stop the run.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Iterable, Protocol
+
+_UNSAFE_FILENAME_RE = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+class ResultSink(Protocol):
+    def write(self, record: dict[str, Any]) -> None:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class NdjsonSink:
+    """NDJSON lines to ``path``, or to stdout when ``path`` is None."""
+
+    def __init__(self, path: Path | None) -> None:
+        self.path = path
+        self._file = path.open("w", encoding="utf-8") if path else sys.stdout
+        self._lock = threading.Lock()
+
+    def write(self, record: dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        if self.path:
+            self._file.close()
+
+
+class DirectorySink:
+    """One JSON file per group in ``path``.
+
+    Groups whose names had to be changed to make a file name get a short hash
+    of the original name, so "А/Б" and "А Б" do not overwrite each other.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.mkdir(parents=True, exist_ok=True)
+
+    def write(self, record: dict[str, Any]) -> None:
+        group = record["group"]
+        name = _UNSAFE_FILENAME_RE.sub("_", group).strip("_") or "group"
+        if name != group:
+            name += "-" + hashlib.blake2b(group.encode("utf-8"), digest_size=4).hexdigest()
+        suffix = ".json" if record["ok"] else ".error.json"
+        target = self.path / f"{name}{suffix}"
+        target.write_text(
+            json.dumps(record, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+
+    def close(self) -> None:
+        pass
+
+
+def read_groups_file(path: Path) -> list[str]:
+    lines = path.read_text(encoding="utf-8").splitlines()
+    stripped = (line.strip() for line in lines)
+    return [line for line in stripped if line and not line.startswith("#")]
+
+
+def scrape_groups(
+    slug: str,
+    groups: Iterable[str],
+    get_schedule: Callable[[str], Any],
+    sink: ResultSink,
+    *,
+    workers: int,
+) -> tuple[int, int]:
+    """Scrape ``groups`` concurrently; return (succeeded, failed) counts."""
+    succeeded = failed = 0
+    workers = max(1, workers)
+    groups = iter(groups)
+    # Не больше двух задач на поток: готовые расписания не копятся в памяти.
+    pending: dict[Future, str] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            for group in islice(groups, 2 * workers - len(pending)):
+                pending[pool.submit(get_schedule, group)] = group
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if _write_result(sink, slug, pending.pop(future), future.result):
+                    succeeded += 1
+                else:
+                    failed += 1
+    return succeeded, failed
+
+
+def scrape_groups_pipelined(
+    slug: str,
+    groups: Iterable[str],
+    fetch: Callable[[str], Any],
+    parse: Callable[[Any], Any],
+    finish: Callable[[Any, Any], Any],
+    sink: ResultSink,
+    *,
+    workers: int,
+    processes: int,
+) -> tuple[int, int]:
+    """Download with ``workers`` threads, ``parse`` in ``processes`` processes.
+
+    ``finish(fetched, parsed)`` turns a parsed page into the written schedule.
+    """
+    from parse_pipeline import run_pipeline
+
+    succeeded = failed = 0
+    outcomes = run_pipeline(
+        groups, fetch, parse, fetch_workers=workers, processes=processes
+    )
+    for outcome in outcomes:
+        def result() -> Any:
+            if outcome.error is not None:
+                raise outcome.error
+            return finish(outcome.fetched, outcome.parsed)
+
+        if _write_result(sink, slug, outcome.item, result):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
+
+
+def _write_result(sink: ResultSink, slug: str, group: str, result: Callable[[], Any]) -> bool:
+    record: dict[str, Any] = {"slug": slug, "group": group}
+    try:
+        record.update(ok=True, schedule=result())
+    except Exception as exc:  # noqa: BLE001
+        record.update(ok=False, error=str(exc))
+        print(f"Ошибка для группы {group}: {exc}", file=sys.stderr)
+    sink.write(record)
+    return record["ok"]
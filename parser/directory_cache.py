@@ -0,0 +1,179 @@
+"""Disk-backed cache for group directories (group name -> group id).
+
+The directory is kept in memory for ``ttl`` seconds and persisted as JSON so
+that a freshly started process does not have to download it again. Once the
+TTL has passed, the page is revalidated with ``If-None-Match`` /
+``If-Modified-Since`` when the server sent an ``ETag`` or ``Last-Modified``
+header, and is only parsed again if it actually changed. Callers that find
+the directory stale at the same time share one refresh (see single_flight).
+If the refresh fails and a saved copy exists, the copy is served and the next
+attempt waits ``retry_after`` seconds, so an outage costs one timeout per
+``retry_after`` rather than one per request.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple
+
+from single_flight import SingleFlight
+
+if TYPE_CHECKING:
+    from group_resolver import GroupResolver
+
+
+class ConditionalResponse(NamedTuple):
+    text: str | None  # None означает 304 Not Modified
+    etag: str | None
+    last_modified: str | None
+
+
+ConditionalFetch = Callable[[str, str | None, str | None], ConditionalResponse]
+
+
+class GroupDirectoryCache:
+    def __init__(
+        self,
+        url: str,
+        parse: Callable[[str], dict[str, str]],
+        fetch: ConditionalFetch,
+        *,
+        path: Path | None,
+        ttl: float,
+        retry_after: float = 60.0,
+        flight: SingleFlight | None = None,
+    ) -> None:
+        self.url = url
+        self.path = path
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self._parse = parse
+        self._fetch = fetch
+        self._flight = flight or SingleFlight()
+        self._lock = threading.Lock()
+        self._groups: dict[str, str] | None = None
+        self._etag: str | None = None
+        self._last_modified: str | None = None
+        self._fetched_at = 0.0
+        self._retry_at = 0.0
+        self._loaded_from_disk = False
+        self._resolver: GroupResolver | None = None
+        self._resolver_source: dict[str, str] | None = None
+
+    def get(self) -> dict[str, str]:
+        with self._lock:
+            if not self._loaded_from_disk:
+                self._loaded_from_disk = True
+                self._load()
+            if self._groups is not None and not self._expired():
+                return self._groups
+        return self._flight.do(("directory", self.url), self._update)
+
+    def _update(self) -> dict[str, str]:
+        with self._lock:
+            # Список мог обновить запрос, закончившийся только что.
+            if self._groups is not None and not self._expired():
+                return self._groups
+        try:
+            self._refresh()
+        except Exception as exc:
+            if self._groups is None:
+                raise
+            print(
+                f"Не удалось обновить список групп ({exc}), "
+                "использую сохранённую копию",
+                file=sys.stderr,
+            )
+            with self._lock:
+                self._retry_at = time.time() + self.retry_after
+                self._save()
+        with self._lock:
+            assert self._groups is not None
+            return self._groups
+
+    def resolver(self) -> GroupResolver:
+        """Name resolver over the current directory, rebuilt only when it changes."""
+        return self.lookup()[1]
+
+    def lookup(self) -> tuple[dict[str, str], GroupResolver]:
+        """The directory and its resolver from one ``get()``."""
+        from group_resolver import GroupResolver
+
+        groups = self.get()
+        with self._lock:
+            if self._resolver is None or self._resolver_source is not groups:
+                self._resolver = GroupResolver(groups)
+                self._resolver_source = groups
+            return groups, self._resolver
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._fetched_at = 0.0
+            self._retry_at = 0.0
+
+    def _expired(self) -> bool:
+        now = time.time()
+        return now - self._fetched_at >= self.ttl and now >= self._retry_at
+
+    def _refresh(self) -> None:
+        with self._lock:
+            have_copy = self._groups is not None
+            etag = self._etag if have_copy else None
+            last_modified = self._last_modified if have_copy else None
+        # Загрузка и разбор идут без блокировки: обновление одно (single flight),
+        # а остальные запросы тем временем получают сохранённую копию или ждут его.
+        response = self._fetch(self.url, etag, last_modified)
+        groups = None
+        if response.text is not None or not have_copy:
+            if response.text is None:
+                raise ValueError(f"Пустой ответ сервера для {self.url}")
+            groups = self._parse(response.text)
+        with self._lock:
+            if groups is not None:
+                self._groups = groups
+            self._etag = response.etag or self._etag
+            self._last_modified = response.last_modified or self._last_modified
+            self._fetched_at = time.time()
+            self._retry_at = 0.0
+            self._save()
+
+    def _load(self) -> None:
+        if not self.path or not self.path.exists():
+            return
+        try:
+            data: dict[str, Any] = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return
+        if data.get("url") != self.url or not isinstance(data.get("groups"), dict):
+            return
+        self._groups = data["groups"]
+        self._etag = data.get("etag")
+        self._last_modified = data.get("last_modified")
+        self._fetched_at = float(data.get("fetched_at") or 0.0)
+        self._retry_at = float(data.get("retry_at") or 0.0)
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        payload = {
+            "url": self.url,
+            "etag": self._etag,
+            "last_modified": self._last_modified,
+            "fetched_at": self._fetched_at,
+            "retry_at": self._retry_at,
+            "groups": self._groups,
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(
+                json.dumps(payload, ensure_ascii=False), encoding="utf-8"
+            )
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            print(f"Не удалось сохранить кэш групп: {exc}", file=sys.stderr)
@@ -0,0 +1,391 @@
+"""Teacher and room index over the parsed schedules of every slug.
+
+Each lesson of a group becomes an ``Entry`` (weekday, pair, week type,
+subject, teacher and room names). Per slug the index keeps inverted maps
+``teacher -> group -> entries``, ``room -> group -> entries`` and
+``(weekday, pair) -> group -> entries``, so "where is teacher X on Tuesday,
+pair 3" or "which rooms are free then" only look at the lessons of that
+teacher or of that slot, not at every schedule. Updating a group replaces
+its entries in all three maps.
+
+TOGU lessons take the weekday from the day name, the pair from its number
+and carry their ``date_range``; raw dnevuch slots have a date, a start time
+(used as the pair) and one lesson per item of ``classes`` with ``teacher``
+and ``place``. Both arrive in the ``schedule_days`` shape of schedule_diff,
+which is also what ChangeFeed keeps on disk: ``seed`` (called once, on the
+first query) replays those snapshots, so a restarted process answers without
+fetching anything. Names are matched ignoring case, spacing, punctuation and
+ё; failing that, a query that starts exactly one known name ("иванов" for
+"Иванов И.И.") picks it. There is no fuzzy matching: a near miss on a
+teacher's name would silently show somebody else's lessons.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from datetime import date
+from functools import lru_cache
+from typing import Any, Callable, Iterable, NamedTuple
+
+from lesson_index import (
+    NUMERATOR_WEEK,
+    WEEKDAYS,
+    WeekCalendar,
+    parse_date_range,
+    parse_slot_date,
+    week_type_of,
+)
+from schedule_diff import Days, day_name, schedule_days
+
+_WEEKDAY_ORDER = {name: number for number, name in enumerate(WEEKDAYS)}
+_WEEKDAY_NAMES = {name.casefold(): name for name in WEEKDAYS}
+
+
+class Entry(NamedTuple):
+    group: str
+    day: str
+    date: str | None
+    pair: str | None
+    week_type: str | None
+    subject: str | None
+    lesson_type: str | None
+    date_range: str | None
+    teachers: tuple[str, ...]
+    rooms: tuple[str, ...]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "group": self.group,
+            "day": self.day,
+            "date": self.date,
+            "pair": self.pair,
+            "week_type": self.week_type,
+            "subject": self.subject,
+            "lesson_type": self.lesson_type,
+            "date_range": self.date_range,
+            "teachers": list(self.teachers),
+            "rooms": list(self.rooms),
+        }
+
+
+def _key(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+_PUNCTUATION_RE = re.compile(r"[^\w]+")
+
+
+def _normal(name: str) -> str:
+    return " ".join(_PUNCTUATION_RE.sub(" ", name.casefold().replace("ё", "е")).split())
+
+
+def _names(items: Any) -> list[tuple[str, str | None]]:
+    names = []
+    for item in items or []:
+        name = item.get("name") if isinstance(item, dict) else item
+        if isinstance(name, str) and name.strip():
+            url = item.get("url") if isinstance(item, dict) else None
+            names.append((" ".join(name.split()), url))
+    return names
+
+
+def lesson_names(lesson: dict[str, Any]) -> dict[str, list[tuple[str, str | None]]]:
+    """Teacher and room ``(name, url)`` pairs of a TOGU lesson or a dnevuch slot."""
+    if "classes" in lesson:
+        items = [item for item in lesson.get("classes") or [] if isinstance(item, dict)]
+        return {
+            "teachers": _names([item.get("teacher") for item in items]),
+            "rooms": _names([item.get("place") for item in items]),
+        }
+    return {"teachers": _names(lesson.get("teachers")), "rooms": _names(lesson.get("rooms"))}
+
+
+def _togu_entries(group: str, day: str, lesson: dict[str, Any],
+                  found: dict[str, dict[str, str | None]]) -> list[Entry]:
+    weekday = _WEEKDAY_NAMES.get(day_name(day).strip().casefold())
+    if weekday is None:
+        return []
+    names = lesson_names(lesson)
+    teachers, rooms = names["teachers"], names["rooms"]
+    for kind, kind_names in names.items():
+        for name, url in kind_names:
+            found[kind].setdefault(name, url)
+    pair = lesson.get("pair") or {}
+    return [
+        Entry(
+            group=group,
+            day=weekday,
+            date=None,
+            pair=str(pair["number"]) if pair.get("number") else None,
+            week_type=week_type_of(lesson.get("week_type")),
+            subject=lesson.get("subject"),
+            lesson_type=lesson.get("lesson_type"),
+            date_range=lesson.get("date_range"),
+            teachers=tuple(dict.fromkeys(name for name, _ in teachers)),
+            rooms=tuple(dict.fromkeys(name for name, _ in rooms)),
+        )
+    ]
+
+
+def _slot_entries(group: str, slot: dict[str, Any],
+                  found: dict[str, dict[str, str | None]]) -> list[Entry]:
+    slot_date = parse_slot_date(slot.get("date"))
+    if slot_date is None:
+        return []
+    entries = []
+    for item in slot.get("classes") or []:
+        if not isinstance(item, dict):
+            continue
+        names = lesson_names({"classes": [item]})
+        teachers, rooms = names["teachers"], names["rooms"]
+        for kind, kind_names in names.items():
+            for name, _ in kind_names:
+                found[kind].setdefault(name, None)
+        entries.append(
+            Entry(
+                group=group,
+                day=WEEKDAYS[slot_date.weekday()],
+                date=slot_date.isoformat(),
+                pair=slot.get("time") or None,
+                week_type=week_type_of(slot.get("week")),
+                subject=item.get("name"),
+                lesson_type=item.get("type"),
+                date_range=None,
+                teachers=tuple(name for name, _ in teachers),
+                rooms=tuple(name for name, _ in rooms),
+            )
+        )
+    return entries
+
+
+def extract_entries(group: str, days: Days) -> tuple[list[Entry], dict[str, dict[str, str | None]]]:
+    """Lessons of one group plus the teacher / room names (and URLs) seen in them."""
+    found: dict[str, dict[str, str | None]] = {"teachers": {}, "rooms": {}}
+    entries: list[Entry] = []
+    for day, lessons in days.items():
+        for lesson in lessons:
+            if not isinstance(lesson, dict):
+                continue
+            if "classes" in lesson:
+                entries.extend(_slot_entries(group, lesson, found))
+            else:
+                entries.extend(_togu_entries(group, day, lesson, found))
+    return entries, found
+
+
+@lru_cache(maxsize=4096)
+def _spans(date_range: str, start_year: int) -> tuple[tuple[date, date], ...]:
+    calendar = WeekCalendar(date(start_year, 9, 1))
+    return tuple(parse_date_range(date_range, calendar))
+
+
+class _Slug:
+    def __init__(self) -> None:
+        self.groups: dict[str, tuple[Entry, ...]] = {}
+        self.postings: dict[str, dict[Any, dict[str, tuple[Entry, ...]]]] = {
+            "teachers": {},
+            "rooms": {},
+            "slots": {},
+        }
+        self.names: dict[str, dict[str, dict[str, Any]]] = {"teachers": {}, "rooms": {}}
+        # kind -> нормализованное имя -> ключи names[kind].
+        self.normal: dict[str, dict[str, list[str]]] = {}
+
+
+class EntityIndex:
+    def __init__(self, seed: Callable[[], Iterable[tuple[str, str, Days]]] | None = None) -> None:
+        self._seed = seed
+        self._seed_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._slugs: dict[str, _Slug] = {}
+
+    def update(self, slug: str, group: str, schedule: Any) -> None:
+        """Index a freshly parsed schedule (TOGU result or dnevuch array)."""
+        self.update_days(slug, group, schedule_days(schedule))
+
+    def update_days(self, slug: str, group: str, days: Days, *, replace: bool = True) -> None:
+        entries, found = extract_entries(group, days)
+        with self._lock:
+            state = self._slugs.setdefault(slug, _Slug())
+            if not replace and group in state.groups:
+                return
+            self._remove(state, group)
+            state.groups[group] = tuple(entries)
+            grouped: dict[tuple[str, Any], list[Entry]] = {}
+            for entry in entries:
+                for kind, keys in (
+                    ("teachers", {_key(name) for name in entry.teachers}),
+                    ("rooms", {_key(name) for name in entry.rooms}),
+                    ("slots", {(entry.day, entry.pair)}),
+                ):
+                    for key in keys:
+                        grouped.setdefault((kind, key), []).append(entry)
+            for (kind, key), key_entries in grouped.items():
+                state.postings[kind].setdefault(key, {})[group] = tuple(key_entries)
+            for kind, names in found.items():
+                known = state.names[kind]
+                for name, url in names.items():
+                    info = known.get(_key(name))
+                    if info is None:
+                        known[_key(name)] = {"name": name, "url": url}
+                        state.normal.pop(kind, None)
+                    elif url and not info["url"]:
+                        info["url"] = url
+
+    def teacher(self, slug: str, name: str, **filters: Any) -> dict[str, Any]:
+        return self._lessons(slug, "teachers", name, filters)
+
+    def room(self, slug: str, name: str, **filters: Any) -> dict[str, Any]:
+        return self._lessons(slug, "rooms", name, filters)
+
+    def free_rooms(self, slug: str, day: str, pair: str, *,
+                   week_type: str | None = None, on: date | None = None) -> list[str]:
+        """Known rooms of ``slug`` with no lesson in (``day``, ``pair``)."""
+        self._ensure_seeded()
+        with self._lock:
+            state = self._slugs.get(slug)
+            if state is None:
+                return []
+            slot = state.postings["slots"].get((day, pair), {})
+            busy = {
+                _key(room)
+                for entries in slot.values()
+                for entry in entries
+                if _matches(entry, None, None, week_type, on)
+                for room in entry.rooms
+            }
+            rooms = state.names["rooms"]
+            return sorted(rooms[key]["name"] for key in rooms if key not in busy)
+
+    def names(self, slug: str, kind: str) -> list[dict[str, Any]]:
+        """All teachers or rooms (``kind``) seen in the schedules of ``slug``."""
+        self._ensure_seeded()
+        with self._lock:
+            state = self._slugs.get(slug)
+            if state is None:
+                return []
+            return sorted(
+                (dict(info) for info in state.names[kind].values()),
+                key=lambda info: info["name"],
+            )
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        with self._lock:
+            return {
+                slug: {
+                    "groups": len(state.groups),
+                    "teachers": len(state.names["teachers"]),
+                    "rooms": len(state.names["rooms"]),
+                }
+                for slug, state in sorted(self._slugs.items())
+            }
+
+    def _lessons(self, slug: str, kind: str, name: str,
+                 filters: dict[str, Any]) -> dict[str, Any]:
+        self._ensure_seeded()
+        with self._lock:
+            state = self._slugs.get(slug)
+            key = self._resolve(state, kind, name) if state else None
+            if key is None:
+                if kind == "teachers":
+                    raise ValueError(f"Преподаватель '{name}' не найден в загруженных расписаниях")
+                raise ValueError(f"Аудитория '{name}' не найдена в загруженных расписаниях")
+            info = dict(state.names[kind][key])
+            by_group = state.postings[kind].get(key, {})
+            entries = [
+                entry
+                for group_entries in by_group.values()
+                for entry in group_entries
+                if _matches(entry, filters.get("day"), filters.get("pair"),
+                            filters.get("week_type"), filters.get("on"))
+            ]
+        entries.sort(key=lambda entry: (
+            entry.date or "",
+            _WEEKDAY_ORDER.get(entry.day, 7),
+            _pair_order(entry.pair),
+            entry.group,
+        ))
+        return {**info, "lessons": [entry.to_dict() for entry in entries]}
+
+    def _resolve(self, state: _Slug, kind: str, name: str) -> str | None:
+        known = state.names[kind]
+        key = _key(name)
+        if key in known:
+            return key
+        normal = state.normal.get(kind)
+        if normal is None:
+            normal = state.normal[kind] = {}
+            for known_key in known:
+                normal.setdefault(_normal(known_key), []).append(known_key)
+        query = _normal(name)
+        keys = normal.get(query)
+        if keys is None and query:
+            keys = [
+                known_key
+                for text, text_keys in normal.items()
+                if text.startswith(query + " ")
+                for known_key in text_keys
+            ]
+        if not keys:
+            return None
+        if len(keys) > 1:
+            variants = ", ".join(sorted(known[known_key]["name"] for known_key in keys)[:5])
+            raise ValueError(f"'{name}' подходит к нескольким: {variants}")
+        return keys[0]
+
+    def _remove(self, state: _Slug, group: str) -> None:
+        for entry in state.groups.pop(group, ()):
+            for kind, keys in (
+                ("teachers", {_key(name) for name in entry.teachers}),
+                ("rooms", {_key(name) for name in entry.rooms}),
+                ("slots", {(entry.day, entry.pair)}),
+            ):
+                for key in keys:
+                    by_group = state.postings[kind].get(key)
+                    if by_group is None:
+                        continue
+                    by_group.pop(group, None)
+                    if not by_group:
+                        del state.postings[kind][key]
+
+    def _ensure_seeded(self) -> None:
+        if self._seed is None:
+            return
+        # Остальные запросы ждут, пока снимки не будут прочитаны целиком.
+        with self._seed_lock:
+            if self._seed is None:
+                return
+            # Только группы, которых ещё нет: свежий разбор важнее снимка.
+            for slug, group, days in self._seed():
+                self.update_days(slug, group, days, replace=False)
+            self._seed = None
+
+
+def _pair_order(pair: str | None) -> tuple[int, str]:
+    return (int(pair), "") if pair and pair.isdigit() else (99, pair or "")
+
+
+def _matches(entry: Entry, day: str | None, pair: str | None,
+             week_type: str | None, on: date | None) -> bool:
+    if day is not None and entry.day != day:
+        return False
+    if pair is not None and entry.pair != pair:
+        return False
+    if week_type is not None and entry.week_type not in (None, week_type):
+        return False
+    if on is not None:
+        if entry.date is not None:
+            return entry.date == on.isoformat()
+        if entry.date_range:
+            start_year = WeekCalendar(on).start_year
+            spans = _spans(entry.date_range, start_year)
+            if spans and not any(start <= on <= end for start, end in spans):
+                return False
+    return True
+
+
+def day_filters(on: date) -> dict[str, Any]:
+    """Filters for one date: its weekday, its week type and the date itself."""
+    calendar = WeekCalendar(on, NUMERATOR_WEEK)
+    return {"day": WEEKDAYS[on.weekday()], "week_type": calendar.week_type(on), "on": on}
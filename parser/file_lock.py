@@ -0,0 +1,32 @@
+"""Exclusive lock between processes that share a file in the cache directory.
+
+``FileLock(path)`` takes ``flock`` on ``path`` (created if missing) for the
+duration of a ``with`` block. Threads of one process still need their own
+threading lock. Without ``fcntl`` (Windows) the lock is a no-op.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+
+class FileLock:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file: Any = None
+
+    def __enter__(self) -> FileLock:
+        try:
+            import fcntl
+        except ImportError:
+            return self
+        self._file = self.path.open("a")
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._file is not None:
+            # Закрытие файла снимает flock.
+            self._file.close()
+            self._file = None
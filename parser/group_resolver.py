@@ -0,0 +1,168 @@
+"""Fuzzy group-name lookup over a prebuilt index.
+
+A ``GroupResolver`` is built once per group directory. It answers in the same
+order as the original linear lookup: exact name, names recovered from broken
+console encodings (exact or case-insensitive), then ``difflib`` similarity on
+the original and on the case-folded name. The similarity step first scores
+the names that share the most character trigrams with the query. Trigrams do
+not bound the difflib ratio, so the best candidate score then becomes the
+cutoff for all other names: their ``quick_ratio`` (shared characters, an
+upper bound of the ratio) is counted at once from an index of characters,
+and the full ratio is computed only for names that can still reach the
+cutoff. The answer is the same as scoring every name with difflib. Answers
+are memoized, since the same misspelling tends to be sent again and again.
+"""
+
+from __future__ import annotations
+
+import difflib
+import heapq
+from collections import Counter
+from typing import Iterable
+
+CUTOFF = 0.6
+MAX_CANDIDATES = 16
+MEMO_SIZE = 4096
+_CONSOLE_ENCODINGS = ("cp1251", "cp866", "latin-1")
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def encoding_variants(name: str) -> list[str]:
+    # Попытки восстановить строку после проблем с кодировкой консоли.
+    variants = [name]
+    for enc in _CONSOLE_ENCODINGS:
+        for raw, codec in ((name.encode(enc, errors="ignore"), "utf-8"),
+                           (name.encode("utf-8", errors="ignore"), enc)):
+            try:
+                variant = raw.decode(codec)
+            except UnicodeError:
+                continue
+            if variant not in variants:
+                variants.append(variant)
+    return variants
+
+
+class GroupResolver:
+    def __init__(self, names: Iterable[str]) -> None:
+        self.names: list[str] = list(dict.fromkeys(names))
+        self._exact = set(self.names)
+        self._folded: dict[str, str] = {}
+        for name in self.names:
+            self._folded.setdefault(name.casefold(), name)
+        self._memo: dict[str, str | None] = {}
+        self._postings: dict[str, list[int]] = {}
+        for index, name in enumerate(self.names):
+            for gram in _trigrams(name.casefold()):
+                self._postings.setdefault(gram, []).append(index)
+        # Индексы символов нужны только для опечаток: строятся при первой из них.
+        self._char_indexes: tuple[_CharIndex, _CharIndex] | None = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def resolve(self, query: str) -> str | None:
+        if query in self._exact:
+            return query
+        if query in self._memo:
+            return self._memo[query]
+        match = self._lookup(query)
+        if len(self._memo) >= MEMO_SIZE:
+            self._memo.clear()
+        self._memo[query] = match
+        return match
+
+    def _lookup(self, query: str) -> str | None:
+        for variant in encoding_variants(query):
+            if variant in self._exact:
+                return variant
+            key = self._folded.get(variant.casefold())
+            if key is not None:
+                return key
+
+        if self._char_indexes is None:
+            self._char_indexes = (_CharIndex(self.names), _CharIndex(self._folded))
+        by_chars, folded_by_chars = self._char_indexes
+        candidates = self._candidates(query)
+        match = _closest(query, candidates, by_chars)
+        if match is not None:
+            return match
+        folded = list(dict.fromkeys(name.casefold() for name in candidates))
+        match = _closest(query.casefold(), folded, folded_by_chars)
+        if match is not None:
+            return self._folded[match]
+        return None
+
+    def _candidates(self, query: str) -> list[str]:
+        scores: Counter[int] = Counter()
+        for gram in _trigrams(query.casefold()):
+            scores.update(self._postings.get(gram, ()))
+        if not scores:
+            return []
+        # Имена с тем же числом общих триграмм, что и у последнего кандидата,
+        # не отбрасываем: иначе при равной похожести выбор зависел бы от порядка.
+        top = heapq.nlargest(MAX_CANDIDATES, scores.values())
+        threshold = top[-1]
+        return [
+            self.names[index]
+            for index, score in scores.items()
+            if score >= threshold
+        ]
+
+
+class _CharIndex:
+    """Names by character counts, for difflib's ``quick_ratio`` of every name at once."""
+
+    def __init__(self, names: Iterable[str]) -> None:
+        self.names = list(names)
+        self.lengths = [len(name) for name in self.names]
+        # (символ, k) -> имена, где символ встречается не меньше k раз.
+        self._postings: dict[tuple[str, int], list[int]] = {}
+        for index, name in enumerate(self.names):
+            for char, count in Counter(name).items():
+                for k in range(1, count + 1):
+                    self._postings.setdefault((char, k), []).append(index)
+
+    def reaching(self, query: str, cutoff: float) -> list[str]:
+        """Names whose quick_ratio against ``query`` is at least ``cutoff``."""
+        shared: Counter[int] = Counter()
+        for char, count in Counter(query).items():
+            for k in range(1, count + 1):
+                shared.update(self._postings.get((char, k), ()))
+        length = len(query)
+        return [
+            self.names[index]
+            for index, matches in shared.items()
+            if 2.0 * matches / (length + self.lengths[index]) >= cutoff
+        ]
+
+
+def _best(query: str, names: Iterable[str], cutoff: float) -> tuple[float, str] | None:
+    """The same (score, name) that difflib.get_close_matches(n=1) would pick."""
+    matcher = difflib.SequenceMatcher()
+    matcher.set_seq2(query)
+    best = None
+    for name in names:
+        matcher.set_seq1(name)
+        if matcher.real_quick_ratio() < cutoff or matcher.quick_ratio() < cutoff:
+            continue
+        scored = (matcher.ratio(), name)
+        # При равной похожести difflib выбирает большее имя.
+        if scored[0] >= cutoff and (best is None or scored > best):
+            best = scored
+    return best
+
+
+def _closest(query: str, candidates: list[str], index: _CharIndex) -> str | None:
+    """Best difflib match among all names of ``index``, scoring ``candidates`` first."""
+    best = _best(query, candidates, CUTOFF)
+    cutoff = best[0] if best else CUTOFF
+    checked = set(candidates)
+    others = (name for name in index.reaching(query, cutoff) if name not in checked)
+    rival = _best(query, others, cutoff)
+    if rival is not None and (best is None or rival > best):
+        best = rival
+    return best[1] if best else None
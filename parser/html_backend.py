@@ -0,0 +1,128 @@
+"""Pluggable HTML parsing backends.
+
+The schedule parser works on a BeautifulSoup tree, so a backend supplies two
+things: a tree builder for ``soup()`` and a fast path for ``links()``, which
+is all the group directory and slug discovery pages need.
+
+Backends, fastest first:
+
+* ``selectolax`` - lexbor (C) for link extraction, lxml or html.parser tree;
+* ``lxml`` - BeautifulSoup on top of the lxml (C) tree builder;
+* ``html.parser`` - pure-Python BeautifulSoup, always available.
+
+``PARSER_HTML_BACKEND`` forces a backend by name; by default the fastest
+installed one is used. ``scripts/check_backends.py`` compares all installed
+backends against golden outputs.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+from typing import NamedTuple, Protocol
+
+from bs4 import BeautifulSoup
+
+BACKEND_ENV = "PARSER_HTML_BACKEND"
+# У lexbor текст <script>/<style> входит в text(), у BeautifulSoup - нет.
+_NON_TEXT_TAGS = ["script", "style", "template"]
+
+
+class Link(NamedTuple):
+    href: str
+    text: str
+    title: str | None
+
+
+class HtmlBackend(Protocol):
+    name: str
+
+    def soup(self, html: str) -> BeautifulSoup:
+        ...
+
+    def links(self, html: str) -> list[Link]:
+        ...
+
+
+class SoupBackend:
+    def __init__(self, features: str) -> None:
+        self.name = features
+
+    def soup(self, html: str) -> BeautifulSoup:
+        return BeautifulSoup(html, self.name)
+
+    def links(self, html: str) -> list[Link]:
+        return [
+            Link(tag["href"], tag.get_text(strip=True), tag.get("title"))
+            for tag in self.soup(html).find_all("a", href=True)
+        ]
+
+
+class SelectolaxBackend:
+    name = "selectolax"
+
+    def __init__(self, tree: SoupBackend) -> None:
+        self._tree = tree
+
+    def soup(self, html: str) -> BeautifulSoup:
+        return self._tree.soup(html)
+
+    def links(self, html: str) -> list[Link]:
+        from selectolax.lexbor import LexborHTMLParser
+
+        tree = LexborHTMLParser(html)
+        tree.strip_tags(_NON_TEXT_TAGS)
+        return [
+            Link(
+                node.attributes.get("href") or "",
+                node.text(deep=True, separator="", strip=True),
+                node.attributes.get("title"),
+            )
+            for node in tree.css("a[href]")
+        ]
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def available_backends() -> dict[str, HtmlBackend]:
+    fallback = SoupBackend("html.parser")
+    backends: dict[str, HtmlBackend] = {}
+    tree = fallback
+    if _installed("lxml"):
+        tree = SoupBackend("lxml")
+    if _installed("selectolax"):
+        backends["selectolax"] = SelectolaxBackend(tree)
+    if tree is not fallback:
+        backends["lxml"] = tree
+    backends["html.parser"] = fallback
+    return backends
+
+
+def select_backend(name: str | None = None) -> HtmlBackend:
+    backends = available_backends()
+    name = name or os.environ.get(BACKEND_ENV) or "auto"
+    if name == "auto":
+        return next(iter(backends.values()))
+    if name not in backends:
+        raise ValueError(
+            f"HTML-бэкенд '{name}' недоступен, установлены: {', '.join(backends)}"
+        )
+    return backends[name]
+
+
+_BACKEND: HtmlBackend | None = None
+
+
+def get_backend() -> HtmlBackend:
+    global _BACKEND
+    if _BACKEND is None:
+        _BACKEND = select_backend()
+    return _BACKEND
+
+
+def set_backend(name: str) -> HtmlBackend:
+    global _BACKEND
+    _BACKEND = select_backend(name)
+    return _BACKEND
@@ -0,0 +1,198 @@
+"""Shared HTTP layer for the parser and its helper scripts.
+
+All requests go through one ``requests.Session`` so connections to dnevuch.ru
+and togudv.ru are pooled and kept alive. Transient failures (timeouts,
+connection resets, 5xx) are retried with exponential backoff, but a read
+timeout only once and no retry starts after ``PARSER_HTTP_DEADLINE`` seconds,
+so one fetch of a hung host is bounded by the deadline plus one timeout
+instead of (retries + 1) timeouts. The number of simultaneous requests to a
+single host is capped so that a burst of lookups does not get us rate-limited.
+Pages can also be recorded to or replayed from disk (see page_fixtures).
+
+``requests`` is imported when the first client is created, so replayed runs
+and answers from the caches start without it.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator
+from urllib.parse import urlsplit
+
+import metrics
+from page_fixtures import PageFixtures, from_env
+
+if TYPE_CHECKING:
+    import requests
+
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+}
+
+DEFAULT_TIMEOUT = float(os.environ.get("PARSER_HTTP_TIMEOUT", 30))
+DEFAULT_RETRIES = int(os.environ.get("PARSER_HTTP_RETRIES", 3))
+DEFAULT_DEADLINE = float(os.environ.get("PARSER_HTTP_DEADLINE", 40))
+DEFAULT_PER_HOST = int(os.environ.get("PARSER_HTTP_PER_HOST", 4))
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class HttpClient:
+    _started = threading.local()
+
+    def __init__(
+        self,
+        *,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = 0.5,
+        per_host: int = DEFAULT_PER_HOST,
+        pool_size: int = 16,
+        deadline: float = DEFAULT_DEADLINE,
+    ) -> None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.request import ACCEPT_ENCODING
+        from urllib3.util.retry import Retry
+
+        self.timeout = timeout
+        self.deadline = deadline
+        self.per_host = max(1, per_host)
+        started = self._started
+
+        class DeadlineRetry(Retry):
+            def is_exhausted(self) -> bool:
+                # Объект Retry общий для адаптера, начало запроса хранится в потоке.
+                at = getattr(started, "at", None)
+                expired = at is not None and time.monotonic() - at >= deadline
+                return expired or super().is_exhausted()
+
+        retry = DeadlineRetry(
+            total=retries,
+            connect=retries,
+            # Сервер, не ответивший за timeout, редко успевает со второй попытки.
+            read=min(retries, 1),
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            max_retries=retry,
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+        )
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        # urllib3 добавляет br/zstd, только если установлены декодеры.
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._host_slots: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host)
+                self._host_slots[host] = slot
+        return slot
+
+    def get(
+        self,
+        url: str,
+        headers: dict[str, str] | None = None,
+    ) -> requests.Response:
+        with self._slot(url):
+            self._started.at = time.monotonic()
+            return self.session.get(url, headers=headers, timeout=self.timeout)
+
+    @contextmanager
+    def stream(
+        self,
+        url: str,
+        headers: dict[str, str] | None = None,
+    ) -> Iterator[requests.Response]:
+        with self._slot(url):
+            self._started.at = time.monotonic()
+            response = self.session.get(
+                url, headers=headers, timeout=self.timeout, stream=True
+            )
+            try:
+                yield response
+            finally:
+                response.close()
+
+
+_CLIENT: HttpClient | None = None
+_CLIENT_LOCK = threading.Lock()
+_FIXTURES: PageFixtures | None = from_env()
+
+
+def get_client() -> HttpClient:
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = HttpClient()
+    return _CLIENT
+
+
+def get_fixtures() -> PageFixtures | None:
+    return _FIXTURES
+
+
+def set_fixtures(fixtures: PageFixtures | None) -> None:
+    global _FIXTURES
+    _FIXTURES = fixtures
+
+
+def fetch_text(url: str) -> str:
+    fixtures = _FIXTURES
+    if fixtures is not None and fixtures.replaying:
+        with metrics.span("fixtures.load"):
+            return fixtures.load(url)
+    with metrics.span("http.get") as span:
+        response = get_client().get(url)
+        span.bytes = len(response.content)
+    # Время до заголовков ответа: DNS, TLS, ожидание сервера.
+    metrics.record("http.headers", response.elapsed.total_seconds())
+    response.raise_for_status()
+    response.encoding = "utf-8"
+    if fixtures is not None:
+        fixtures.save(url, response.text)
+    return response.text
+
+
+def _chunks(text: str, chunk_size: int) -> Iterator[str]:
+    for start in range(0, len(text), chunk_size):
+        yield text[start:start + chunk_size]
+
+
+@contextmanager
+def stream_text(url: str, chunk_size: int = 16 * 1024) -> Iterator[Iterator[str]]:
+    """Yield the decoded body of ``url`` chunk by chunk; closing stops the download."""
+    if _FIXTURES is not None:
+        # Записывается страница целиком, поэтому и читается целиком.
+        yield _chunks(fetch_text(url), chunk_size)
+        return
+    with metrics.span("http.stream") as span, get_client().stream(url) as response:
+        metrics.record("http.headers", response.elapsed.total_seconds())
+        response.raise_for_status()
+        response.encoding = "utf-8"
+        chunks = response.iter_content(chunk_size=chunk_size, decode_unicode=True)
+        yield _counted(chunks, span) if metrics.enabled() else chunks
+
+
+def _counted(chunks: Iterator[str], span: metrics.Span) -> Iterator[str]:
+    for chunk in chunks:
+        span.bytes += len(chunk)
+        yield chunk
@@ -0,0 +1,129 @@
+"""Extract JSON literals assigned in inline scripts from a stream of text.
+
+dnevuch.ru embeds its data as ``let scheduleData = [...];``. Instead of
+running a lazy regex over the whole page, the text is consumed chunk by
+chunk: a marker pattern locates the assignment, and a small scanner that
+understands JSON strings and nesting finds where exactly that one value
+ends. Reading stops as soon as the requested values are complete, so the
+rest of the page does not have to be downloaded or kept in memory.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Iterable
+
+# Хвост буфера, который сохраняется между кусками, чтобы не потерять маркер
+# на границе двух кусков.
+_MARKER_TAIL = 256
+_STRUCTURE_RE = re.compile(r'["\[\]{}]')
+_STRING_END_RE = re.compile(r'["\\]')
+_OPENERS = "[{"
+
+
+class JsValueScanner:
+    """Finds the end of a single JSON array/object fed in pieces."""
+
+    def __init__(self) -> None:
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.started = False
+
+    def feed(self, text: str, pos: int = 0) -> int | None:
+        """Consume ``text[pos:]``; return the index just past the value or None."""
+        length = len(text)
+        while pos < length:
+            if self.escaped:
+                self.escaped = False
+                pos += 1
+                continue
+            if self.in_string:
+                match = _STRING_END_RE.search(text, pos)
+                if not match:
+                    return None
+                pos = match.end()
+                if match.group() == "\\":
+                    self.escaped = True
+                else:
+                    self.in_string = False
+                continue
+            if not self.started:
+                while pos < length and text[pos].isspace():
+                    pos += 1
+                if pos == length:
+                    return None
+                if text[pos] not in _OPENERS:
+                    raise ValueError(f"ожидался JSON-массив или объект, а не {text[pos]!r}")
+                self.started = True
+            match = _STRUCTURE_RE.search(text, pos)
+            if not match:
+                return None
+            pos = match.end()
+            char = match.group()
+            if char == '"':
+                self.in_string = True
+            elif char in _OPENERS:
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.depth == 0:
+                    return pos
+        return None
+
+
+def find_js_values(
+    chunks: Iterable[str],
+    patterns: dict[str, re.Pattern],
+    stop_on: Iterable[str] | None = None,
+) -> dict[str, str]:
+    """Return the raw JSON text of the first value after each marker pattern.
+
+    ``patterns`` must match the text right before the value (for example
+    ``let\\s+groups\\s*=\\s*``). Consumption stops once every name in
+    ``stop_on`` (all patterns by default) has been found.
+    """
+    wanted = set(patterns if stop_on is None else stop_on)
+    pending = dict(patterns)
+    found: dict[str, str] = {}
+    buffer = ""
+    name: str | None = None
+    scanner: JsValueScanner | None = None
+    parts: list[str] = []
+
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            if scanner is not None and name is not None:
+                try:
+                    end = scanner.feed(buffer)
+                except ValueError:
+                    # Не массив и не объект: ищем следующее присваивание.
+                    pending[name] = patterns[name]
+                    name, scanner, parts = None, None, []
+                    continue
+                if end is None:
+                    parts.append(buffer)
+                    buffer = ""
+                    break
+                parts.append(buffer[:end])
+                found[name] = "".join(parts).strip()
+                buffer = buffer[end:]
+                name, scanner, parts = None, None, []
+                if wanted <= found.keys():
+                    return found
+                continue
+
+            best: tuple[int, str, re.Match] | None = None
+            for key, pattern in pending.items():
+                match = pattern.search(buffer)
+                if match and (best is None or match.start() < best[0]):
+                    best = (match.start(), key, match)
+            if best is None:
+                buffer = buffer[-_MARKER_TAIL:]
+                break
+            _, name, match = best
+            del pending[name]
+            scanner = JsValueScanner()
+            buffer = buffer[match.end():]
+    return found
@@ -0,0 +1,284 @@
+"""Per-date lesson index for "today" / "tomorrow" lookups.
+
+The index maps an ISO date to the lessons held on that day::
+
+    {"2026-09-07": {"weekday": "Понедельник", "week_type": "числ.",
+                    "lessons": [[0, 0], [0, 2]]}}
+
+``lessons`` are ``[day, lesson]`` positions in the schedule (``days[day]
+.lessons[lesson]`` for TOGU, ``schedule[day][slot]`` for dnevuch), so the
+index stays small and the schedule itself is not duplicated.
+
+TOGU lessons only name a weekday, a ``date_range`` such as ``01.09-15.12``,
+``с 01.09 по 22.12`` or ``01.10, 15.10`` without a year, and an optional
+``week_type``. The year comes from the academic year of ``retrieved_at``,
+which starts in August (a schedule published in August is for the coming
+year): dates from August to December fall into its first calendar year,
+January to July into the second. Weeks alternate starting with a numerator
+(``числ.``) week on the week of September 1, unless
+``PARSER_NUMERATOR_WEEK`` names a date in some numerator week. Lessons without
+a ``date_range`` take the overall span of the schedule's ranges; when no
+lesson has one, the weekly grid is taken to hold for the term of
+``retrieved_at`` (September to December, or January to June). dnevuch slots
+carry their own date and week, so they are indexed as they are.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Any
+
+WEEKDAYS = (
+    "Понедельник",
+    "Вторник",
+    "Среда",
+    "Четверг",
+    "Пятница",
+    "Суббота",
+    "Воскресенье",
+)
+_WEEKDAY_NUMBERS = {name.casefold(): number for number, name in enumerate(WEEKDAYS)}
+
+_DAY_MONTH_RE = re.compile(r"(\d{1,2})\.(\d{1,2})(?:\.(\d{2,4}))?")
+_RANGE_SEPARATOR_RE = re.compile(r"^\s*(?:-|–|—|по)\s*$", re.IGNORECASE)
+_ISO_DATE_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+_DOTTED_DATE_RE = re.compile(r"(\d{1,2})[./](\d{1,2})[./](\d{4})")
+
+NUMERATOR_WEEK = os.environ.get("PARSER_NUMERATOR_WEEK")
+
+
+def week_type_of(raw: Any) -> str | None:
+    text = str(raw or "").strip().casefold()
+    if text.startswith("ч"):
+        return "числ."
+    if text.startswith("з"):
+        return "знам."
+    return None
+
+
+def academic_year_start(reference: date) -> int:
+    # Учебный год считается с августа: расписание публикуют до 1 сентября.
+    return reference.year if reference.month >= 8 else reference.year - 1
+
+
+def term_span(reference: date) -> tuple[date, date]:
+    """The autumn or spring term ``reference`` falls into (or precedes)."""
+    start_year = academic_year_start(reference)
+    if reference.month >= 8:
+        return date(start_year, 9, 1), date(start_year, 12, 31)
+    return date(start_year + 1, 1, 1), date(start_year + 1, 6, 30)
+
+
+def _monday(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+class WeekCalendar:
+    """Numerator/denominator week of any date."""
+
+    def __init__(self, reference: date, numerator_week: str | None = None) -> None:
+        self.start_year = academic_year_start(reference)
+        anchor = _parse_iso(numerator_week) if numerator_week else None
+        self._anchor = _monday(anchor or date(self.start_year, 9, 1))
+
+    def week_type(self, day: date) -> str:
+        weeks = (_monday(day) - self._anchor).days // 7
+        return "числ." if weeks % 2 == 0 else "знам."
+
+    def resolve(self, day: int, month: int, year: int | None = None) -> date | None:
+        if year is None:
+            year = self.start_year if month >= 8 else self.start_year + 1
+        elif year < 100:
+            year += 2000
+        try:
+            return date(year, month, day)
+        except ValueError:
+            return None
+
+
+def parse_date_range(text: str | None, calendar: WeekCalendar) -> list[tuple[date, date]]:
+    """Resolve a TOGU ``date_range`` into inclusive (start, end) spans."""
+    if not text:
+        return []
+    spans: list[tuple[date, date]] = []
+    matches = list(_DAY_MONTH_RE.finditer(text))
+    index = 0
+    while index < len(matches):
+        first = matches[index]
+        start = calendar.resolve(
+            int(first.group(1)),
+            int(first.group(2)),
+            int(first.group(3)) if first.group(3) else None,
+        )
+        end = start
+        if index + 1 < len(matches):
+            second = matches[index + 1]
+            between = text[first.end():second.start()]
+            if _RANGE_SEPARATOR_RE.match(between):
+                end = calendar.resolve(
+                    int(second.group(1)),
+                    int(second.group(2)),
+                    int(second.group(3)) if second.group(3) else None,
+                )
+                index += 1
+        index += 1
+        if start and end:
+            if end < start:
+                # Диапазон через Новый год: 15.12-20.01.
+                end = end.replace(year=end.year + 1)
+            spans.append((start, end))
+    return spans
+
+
+def _parse_iso(text: str) -> date | None:
+    match = _ISO_DATE_RE.search(text)
+    if match:
+        try:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        except ValueError:
+            return None
+    return None
+
+
+def parse_slot_date(text: Any) -> date | None:
+    """Parse a dnevuch slot date: YYYY-MM-DD, DD.MM.YYYY or DD/MM/YYYY."""
+    if not isinstance(text, str):
+        return None
+    parsed = _parse_iso(text)
+    if parsed:
+        return parsed
+    match = _DOTTED_DATE_RE.search(text)
+    if match:
+        try:
+            return date(int(match.group(3)), int(match.group(2)), int(match.group(1)))
+        except ValueError:
+            return None
+    return None
+
+
+def _reference_date(schedule: dict[str, Any]) -> date:
+    retrieved_at = schedule.get("retrieved_at")
+    if isinstance(retrieved_at, str):
+        try:
+            return datetime.fromisoformat(retrieved_at).date()
+        except ValueError:
+            pass
+    return date.today()
+
+
+def _add(index: dict[str, Any], day: date, weekday: str, week_type: str | None,
+         position: list[int]) -> None:
+    entry = index.get(day.isoformat())
+    if entry is None:
+        entry = index[day.isoformat()] = {
+            "weekday": weekday,
+            "week_type": week_type,
+            "lessons": [],
+        }
+    entry["lessons"].append(position)
+
+
+def build_days_index(schedule: dict[str, Any]) -> dict[str, Any]:
+    """Index of a TOGU result (``days`` with weekday names and lessons)."""
+    reference = _reference_date(schedule)
+    calendar = WeekCalendar(reference, NUMERATOR_WEEK)
+    resolved: list[tuple[int, int, int, list[tuple[date, date]], str | None]] = []
+    all_spans: list[tuple[date, date]] = []
+    for day_index, day in enumerate(schedule.get("days") or []):
+        weekday = _WEEKDAY_NUMBERS.get(str(day.get("name") or "").strip().casefold())
+        if weekday is None:
+            continue
+        for lesson_index, lesson in enumerate(day.get("lessons") or []):
+            spans = parse_date_range(lesson.get("date_range"), calendar)
+            all_spans.extend(spans)
+            resolved.append(
+                (day_index, lesson_index, weekday, spans, week_type_of(lesson.get("week_type")))
+            )
+    if not resolved:
+        return {}
+    if all_spans:
+        default_spans = [(min(s for s, _ in all_spans), max(e for _, e in all_spans))]
+    else:
+        # Ни у одного занятия нет дат: сетка действует весь семестр.
+        default_spans = [term_span(reference)]
+
+    index: dict[str, Any] = {}
+    for day_index, lesson_index, weekday, spans, week_type in resolved:
+        for start, end in spans or default_spans:
+            if start == end:
+                # Отдельная дата: занятие в этот день, даже если день недели другой.
+                _add(index, start, WEEKDAYS[start.weekday()],
+                     calendar.week_type(start), [day_index, lesson_index])
+                continue
+            current = start + timedelta(days=(weekday - start.weekday()) % 7)
+            while current <= end:
+                current_week = calendar.week_type(current)
+                if week_type is None or week_type == current_week:
+                    _add(index, current, WEEKDAYS[weekday], current_week,
+                         [day_index, lesson_index])
+                current += timedelta(days=7)
+    return dict(sorted(index.items()))
+
+
+def build_slots_index(schedule: list[Any]) -> dict[str, Any]:
+    """Index of a raw dnevuch ``scheduleData`` array (days of dated slots)."""
+    index: dict[str, Any] = {}
+    for day_index, day in enumerate(schedule):
+        if not isinstance(day, list):
+            continue
+        for slot_index, slot in enumerate(day):
+            if not isinstance(slot, dict):
+                continue
+            slot_date = parse_slot_date(slot.get("date"))
+            if slot_date is None:
+                continue
+            _add(index, slot_date, WEEKDAYS[slot_date.weekday()],
+                 week_type_of(slot.get("week")), [day_index, slot_index])
+    return dict(sorted(index.items()))
+
+
+def build_date_index(schedule: Any) -> dict[str, Any]:
+    if isinstance(schedule, dict):
+        return build_days_index(schedule)
+    if isinstance(schedule, list):
+        return build_slots_index(schedule)
+    return {}
+
+
+def lessons_on(schedule: Any, index: dict[str, Any], day: date) -> dict[str, Any]:
+    """Lessons of one date, looked up in ``index``."""
+    entry = index.get(day.isoformat())
+    result: dict[str, Any] = {
+        "date": day.isoformat(),
+        "weekday": WEEKDAYS[day.weekday()],
+        "week_type": None,
+        "lessons": [],
+    }
+    if entry is None:
+        return result
+    result["week_type"] = entry["week_type"]
+    if isinstance(schedule, dict):
+        days = schedule["days"]
+        result["lessons"] = [days[d]["lessons"][i] for d, i in entry["lessons"]]
+    else:
+        result["lessons"] = [schedule[d][i] for d, i in entry["lessons"]]
+    return result
+
+
+def parse_day(text: str, today: date | None = None) -> date:
+    """``today``, ``tomorrow``, ``yesterday`` or an ISO / DD.MM.YYYY date."""
+    today = today or date.today()
+    shortcuts = {
+        "today": 0, "сегодня": 0,
+        "tomorrow": 1, "завтра": 1,
+        "yesterday": -1, "вчера": -1,
+    }
+    key = text.strip().casefold()
+    if key in shortcuts:
+        return today + timedelta(days=shortcuts[key])
+    parsed = parse_slot_date(text)
+    if parsed is None:
+        raise ValueError(f"Не удалось разобрать дату: {text}")
+    return parsed
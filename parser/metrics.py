@@ -0,0 +1,184 @@
+"""Optional timing spans and aggregated metrics for the parser.
+
+Instrumentation is off unless ``PARSER_METRICS=1`` is set or ``enable()`` is
+called (``parser.py --metrics``); a disabled ``span()`` returns a shared no-op
+object, so the hot paths pay one function call.
+
+Every finished span is added to a histogram of its duration and to a byte
+counter. Spans finished inside ``trace()`` are also collected as a per-request
+list of ``{"name", "start_ms", "ms", "bytes"}``. Spans opened with
+``trace=False`` (the per-cell helpers, called hundreds of times per page) only
+go to the histograms. ``prometheus()`` renders the histograms in the
+Prometheus text format and ``snapshot()`` as a JSON-friendly dict.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_enabled = os.environ.get("PARSER_METRICS", "").lower() in ("1", "true", "yes")
+_local = threading.local()
+
+
+class _Histogram:
+    __slots__ = ("buckets", "count", "sum", "bytes")
+
+    def __init__(self) -> None:
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.bytes = 0
+
+    def observe(self, seconds: float, size: int) -> None:
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+        self.bytes += size
+
+
+_histograms: dict[str, _Histogram] = {}
+_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("name", "bytes", "_trace", "_started")
+
+    def __init__(self, name: str, trace: bool) -> None:
+        self.name = name
+        self.bytes = 0
+        self._trace = trace
+        self._started = 0.0
+
+    def __enter__(self) -> Span:
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        finished = time.perf_counter()
+        record(self.name, finished - self._started, self.bytes)
+        spans = getattr(_local, "spans", None) if self._trace else None
+        if spans is not None:
+            spans.append(
+                {
+                    "name": self.name,
+                    "start_ms": round((self._started - _local.started) * 1000, 3),
+                    "ms": round((finished - self._started) * 1000, 3),
+                    "bytes": self.bytes,
+                }
+            )
+
+
+class _NoopSpan:
+    bytes = 0
+
+    def __enter__(self) -> _NoopSpan:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, *, trace: bool = True) -> Span | _NoopSpan:
+    """Time a block: ``with span("fetch_page") as s: ...; s.bytes = n``."""
+    if not _enabled:
+        return _NOOP
+    return Span(name, trace)
+
+
+def record(name: str, seconds: float, size: int = 0) -> None:
+    """Add an externally measured duration to the histogram ``name``."""
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = _Histogram()
+        histogram.observe(seconds, size)
+
+
+@contextmanager
+def trace() -> Iterator[list[dict[str, Any]]]:
+    """Collect the spans finished in this thread while the block runs."""
+    spans: list[dict[str, Any]] = []
+    previous = getattr(_local, "spans", None), getattr(_local, "started", 0.0)
+    _local.spans, _local.started = spans, time.perf_counter()
+    try:
+        yield spans
+    finally:
+        _local.spans, _local.started = previous
+        spans.sort(key=lambda item: item["start_ms"])
+
+
+def snapshot() -> dict[str, Any]:
+    with _lock:
+        return {
+            name: {
+                "count": histogram.count,
+                "sum_seconds": histogram.sum,
+                "bytes": histogram.bytes,
+                "buckets": {
+                    str(bound): count
+                    for bound, count in zip(BUCKETS, histogram.buckets)
+                },
+            }
+            for name, histogram in sorted(_histograms.items())
+        }
+
+
+def prometheus() -> str:
+    lines = [
+        "# HELP parser_span_seconds Duration of parser stages.",
+        "# TYPE parser_span_seconds histogram",
+    ]
+    byte_lines = [
+        "# HELP parser_span_bytes_total Bytes processed by parser stages.",
+        "# TYPE parser_span_bytes_total counter",
+    ]
+    with _lock:
+        for name, histogram in sorted(_histograms.items()):
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.buckets):
+                cumulative += count
+                lines.append(
+                    f'parser_span_seconds_bucket{{span="{label}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f'parser_span_seconds_bucket{{span="{label}",le="+Inf"}} {histogram.count}'
+            )
+            lines.append(f'parser_span_seconds_sum{{span="{label}"}} {histogram.sum:.6f}')
+            lines.append(f'parser_span_seconds_count{{span="{label}"}} {histogram.count}')
+            if histogram.bytes:
+                byte_lines.append(
+                    f'parser_span_bytes_total{{span="{label}"}} {histogram.bytes}'
+                )
+    return "\n".join(lines + byte_lines) + "\n"
+
+
+def reset() -> None:
+    with _lock:
+        _histograms.clear()
@@ -0,0 +1,270 @@
+"""Compressed, content-addressed archive of fetched pages.
+
+Every page downloaded by ``parser.fetch_page`` (and every changed TOGU group
+directory) is kept so that a change in the parsing code can be applied to the
+already downloaded pages (``parser.py --reparse``) instead of scraping the
+sites again. Layout of the archive directory:
+
+* ``blobs/ab/abcdef....zst`` - the page body compressed with zstd, named by
+  the blake2b hash of its content (the same hash as result_cache), so a page
+  that did not change between fetches is stored once. Without the optional
+  ``zstandard`` package pages are written gzip-compressed (``.gz``); both
+  kinds are read back.
+* ``index.ndjson`` - one line per version of a URL: ``{"url", "digest", "at",
+  "bytes"}``, appended by every process that fetches. A fetch that returns the
+  same content as the last archived version of its URL adds nothing, so
+  ``at`` is the time a version was first seen.
+
+With ``keep`` set, once a URL has twice as many versions the index is
+rewritten with the last ``keep`` versions of every URL and blobs no longer
+referenced are deleted. Writers take ``index.lock`` (file_lock), so processes
+sharing the archive do not lose each other's lines. Each process follows the
+index incrementally (only new lines are read), which keeps ``put`` and
+``latest()`` cheap on a long history. ``index.checkpoint.json`` holds the last
+version and the version count of every URL up to an offset of the index; a new
+process starts from it instead of the first line, so a one-shot CLI run does
+not read the whole history on its first ``put``. Writers refresh it after
+``CHECKPOINT_BYTES`` of new lines and after every compaction.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+from file_lock import FileLock
+
+ZSTD_LEVEL = 9
+# Недавние блобы не удаляются: их строка в индексе может быть ещё не дописана.
+BLOB_GRACE = 60 * 60
+CHECKPOINT_BYTES = 1 << 20
+
+
+def _zstd() -> Any:
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+class PageArchive:
+    def __init__(self, path: Path, keep: int = 0) -> None:
+        self.path = path
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._zstd = _zstd()
+        # Прочитанная часть индекса: (inode, байт) и последние версии URL.
+        self._read_to: tuple[int, int] | None = None
+        self._latest: dict[str, dict[str, Any]] = {}
+        self._versions: dict[str, int] = {}
+        self._checkpoint_to = 0
+
+    def put(self, url: str, text: str, at: float | None = None) -> str:
+        """Archive ``text`` fetched from ``url``; return its digest."""
+        data = text.encode("utf-8")
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        if self._blob(digest) is None:
+            if self._zstd is not None:
+                target = self._blob_path(digest, ".zst")
+                compressed = self._zstd.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+            else:
+                target = self._blob_path(digest, ".gz")
+                compressed = gzip.compress(data, mtime=0)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+            tmp_path.write_bytes(compressed)
+            os.replace(tmp_path, target)
+        line = json.dumps(
+            {"url": url, "digest": digest, "at": at or time.time(), "bytes": len(data)},
+            ensure_ascii=False,
+        )
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            with FileLock(self.path / "index.lock"):
+                self._follow()
+                current = self._latest.get(url)
+                if current is not None and current["digest"] == digest:
+                    return digest
+                with (self.path / "index.ndjson").open("a", encoding="utf-8") as index:
+                    index.write(line + "\n")
+                self._follow()
+                if self.keep and self._versions.get(url, 0) >= 2 * self.keep:
+                    self._compact()
+                elif self._read_to is not None and (
+                    self._read_to[1] - self._checkpoint_to >= CHECKPOINT_BYTES
+                ):
+                    self._save_checkpoint()
+        return digest
+
+    def entries(self) -> Iterator[dict[str, Any]]:
+        index_path = self.path / "index.ndjson"
+        if not index_path.exists():
+            return
+        with index_path.open(encoding="utf-8") as index:
+            for line in index:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Недописанная строка прерванного процесса.
+                    continue
+
+    def latest(self, until: float | None = None) -> dict[str, dict[str, Any]]:
+        """The last archived entry of every URL, fetched no later than ``until``."""
+        if until is None:
+            with self._lock:
+                self._follow()
+                return dict(self._latest)
+        latest: dict[str, dict[str, Any]] = {}
+        for entry in self.entries():
+            if until is not None and entry["at"] > until:
+                continue
+            current = latest.get(entry["url"])
+            if current is None or entry["at"] >= current["at"]:
+                latest[entry["url"]] = entry
+        return latest
+
+    def load(self, digest: str) -> str:
+        blob = self._blob(digest)
+        if blob is None:
+            raise LookupError(f"Страница {digest} не найдена в архиве {self.path}")
+        data = blob.read_bytes()
+        if blob.suffix == ".gz":
+            return gzip.decompress(data).decode("utf-8")
+        if self._zstd is None:
+            raise RuntimeError(
+                "Для чтения архива в формате zstd установите пакет: pip install zstandard"
+            )
+        return self._zstd.ZstdDecompressor().decompress(data).decode("utf-8")
+
+    def stats(self) -> dict[str, int]:
+        blobs = [blob for blob in (self.path / "blobs").glob("*/*") if blob.suffix in (".zst", ".gz")]
+        return {
+            "versions": sum(1 for _ in self.entries()),
+            "blobs": len(blobs),
+            "stored_bytes": sum(blob.stat().st_size for blob in blobs),
+        }
+
+    def _follow(self) -> None:
+        """Read the index lines appended since the last call."""
+        index_path = self.path / "index.ndjson"
+        try:
+            handle = index_path.open("rb")
+        except FileNotFoundError:
+            return
+        with handle:
+            stat = os.fstat(handle.fileno())
+            inode = stat.st_ino
+            if self._read_to is None or self._read_to[0] != inode:
+                # Первое чтение или индекс переписан при чистке: с контрольной точки.
+                self._read_to = (inode, 0)
+                self._latest = {}
+                self._versions = {}
+                self._checkpoint_to = 0
+                self._load_checkpoint(handle, inode, stat.st_size)
+            offset = self._read_to[1]
+            handle.seek(offset)
+            for raw in handle:
+                if not raw.endswith(b"\n"):
+                    # Строка ещё дописывается; прочитаем её в следующий раз.
+                    break
+                offset += len(raw)
+                try:
+                    entry = json.loads(raw)
+                except ValueError:
+                    continue
+                url = entry["url"]
+                self._versions[url] = self._versions.get(url, 0) + 1
+                current = self._latest.get(url)
+                if current is None or entry["at"] >= current["at"]:
+                    self._latest[url] = entry
+            self._read_to = (inode, offset)
+
+    def _compact(self) -> None:
+        """Keep the last ``keep`` versions of every URL, drop unreferenced blobs."""
+        by_url: dict[str, list[dict[str, Any]]] = {}
+        for entry in self.entries():
+            by_url.setdefault(entry["url"], []).append(entry)
+        kept = []
+        for versions in by_url.values():
+            versions.sort(key=lambda entry: entry["at"])
+            kept.extend(versions[-self.keep:])
+        kept.sort(key=lambda entry: entry["at"])
+        index_path = self.path / "index.ndjson"
+        tmp_path = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(
+            "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in kept),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, index_path)
+        referenced = {entry["digest"] for entry in kept}
+        cutoff = time.time() - BLOB_GRACE
+        for blob in (self.path / "blobs").glob("*/*"):
+            digest = blob.name.split(".", 1)[0]
+            if digest not in referenced and blob.stat().st_mtime < cutoff:
+                blob.unlink(missing_ok=True)
+        self._read_to = None
+        self._follow()
+        self._save_checkpoint()
+
+    def _load_checkpoint(self, handle: Any, inode: int, size: int) -> None:
+        checkpoint_path = self.path / "index.checkpoint.json"
+        try:
+            state = json.loads(checkpoint_path.read_text(encoding="utf-8"))
+            offset = int(state["offset"])
+            if state["inode"] != inode or not 0 < offset <= size:
+                return
+            # Номер inode мог достаться новому индексу: точка должна стоять на конце строки.
+            handle.seek(offset - 1)
+            if handle.read(1) != b"\n":
+                return
+            latest = {entry["url"]: entry for entry in state["latest"]}
+            versions = {url: int(count) for url, count in state["versions"].items()}
+        except (OSError, ValueError, TypeError, KeyError):
+            return
+        self._read_to = (inode, offset)
+        self._latest = latest
+        self._versions = versions
+        self._checkpoint_to = offset
+
+    def _save_checkpoint(self) -> None:
+        """Write the followed state; the caller holds ``index.lock``."""
+        if self._read_to is None:
+            return
+        inode, offset = self._read_to
+        checkpoint_path = self.path / "index.checkpoint.json"
+        tmp_path = checkpoint_path.with_name(f"{checkpoint_path.name}.{os.getpid()}.tmp")
+        try:
+            tmp_path.write_text(
+                json.dumps(
+                    {
+                        "inode": inode,
+                        "offset": offset,
+                        "latest": list(self._latest.values()),
+                        "versions": self._versions,
+                    },
+                    ensure_ascii=False,
+                ),
+                encoding="utf-8",
+            )
+            os.replace(tmp_path, checkpoint_path)
+        except OSError:
+            # Без контрольной точки следующий процесс просто прочитает индекс целиком.
+            return
+        self._checkpoint_to = offset
+
+    def _blob(self, digest: str) -> Path | None:
+        for suffix in (".zst", ".gz"):
+            blob = self._blob_path(digest, suffix)
+            if blob.exists():
+                return blob
+        return None
+
+    def _blob_path(self, digest: str, suffix: str) -> Path:
+        return self.path / "blobs" / digest[:2] / f"{digest}{suffix}"
@@ -0,0 +1,87 @@
+"""Record / replay of fetched pages.
+
+With ``PARSER_FIXTURES_MODE=record`` every page fetched through http_client is
+also saved under ``PARSER_FIXTURES_DIR`` (default ``parser/fixtures/pages``);
+with ``replay`` pages are served from there and the network is never used, a
+page that was not recorded is an error. ``index.json`` in the directory maps
+URLs to file names. Used for offline runs and by scripts/bench_parser.py.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit
+
+MODES = ("record", "replay")
+DEFAULT_DIR = Path(__file__).resolve().parent / "fixtures" / "pages"
+
+_UNSAFE_RE = re.compile(r"[^\w.-]+")
+
+
+class PageFixtures:
+    def __init__(self, path: Path, mode: str) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Неизвестный режим фикстур: {mode}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._index: dict[str, str] | None = None
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def urls(self) -> list[str]:
+        with self._lock:
+            return list(self._load_index())
+
+    def load(self, url: str) -> str:
+        with self._lock:
+            name = self._load_index().get(url)
+        if name is None:
+            raise LookupError(f"Страница не записана в {self.path}: {url}")
+        return (self.path / name).read_text(encoding="utf-8")
+
+    def save(self, url: str, text: str) -> None:
+        with self._lock:
+            index = self._load_index()
+            name = index.get(url) or self._file_name(url)
+            self.path.mkdir(parents=True, exist_ok=True)
+            (self.path / name).write_text(text, encoding="utf-8")
+            index[url] = name
+            tmp_path = self.path / f"index.json.{os.getpid()}.tmp"
+            tmp_path.write_text(
+                json.dumps(index, ensure_ascii=False, indent=2, sort_keys=True),
+                encoding="utf-8",
+            )
+            os.replace(tmp_path, self.path / "index.json")
+
+    def _load_index(self) -> dict[str, str]:
+        if self._index is None:
+            index_path = self.path / "index.json"
+            self._index = (
+                json.loads(index_path.read_text(encoding="utf-8"))
+                if index_path.exists()
+                else {}
+            )
+        return self._index
+
+    @staticmethod
+    def _file_name(url: str) -> str:
+        parts = urlsplit(url)
+        readable = _UNSAFE_RE.sub("_", f"{parts.netloc}{parts.path}").strip("_")
+        digest = hashlib.blake2b(url.encode("utf-8"), digest_size=6).hexdigest()
+        return f"{readable[:80]}-{digest}.html"
+
+
+def from_env() -> PageFixtures | None:
+    mode = os.environ.get("PARSER_FIXTURES_MODE")
+    if not mode:
+        return None
+    path = Path(os.environ.get("PARSER_FIXTURES_DIR") or DEFAULT_DIR)
+    return PageFixtures(path, mode)
@@ -0,0 +1,85 @@
+"""Two-stage fetch / parse pipeline.
+
+HTML parsing is pure Python and holds the GIL, so parsing in the fetch
+threads keeps a bulk run on one core however many pages are downloaded at
+once. ``run_pipeline`` splits the work: ``fetch_workers`` threads download
+(``fetch(item)``) and a pool of ``processes`` worker processes parses
+(``parse(fetched)``; it has to be a module-level function, its argument and
+result are pickled). Results are yielded in completion order.
+
+The stages are coupled by ``max_pending`` slots: a fetch thread takes a slot
+before downloading and the slot is returned only when the caller has taken
+the result. When parsing (or the caller writing results) falls behind, the
+fetch threads wait instead of piling up downloaded pages in memory.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, NamedTuple
+
+
+class Outcome(NamedTuple):
+    item: Any
+    fetched: Any
+    parsed: Any
+    error: BaseException | None
+
+
+def _context() -> multiprocessing.context.BaseContext:
+    # fork при работающих потоках загрузки может унаследовать захваченные блокировки.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def run_pipeline(
+    items: Iterable[Any],
+    fetch: Callable[[Any], Any],
+    parse: Callable[[Any], Any],
+    *,
+    fetch_workers: int,
+    processes: int,
+    max_pending: int | None = None,
+) -> Iterator[Outcome]:
+    """Fetch ``items`` in threads, parse in processes; yield one Outcome per item."""
+    processes = max(1, processes)
+    slots = threading.Semaphore(max_pending or 2 * processes)
+    done: queue.SimpleQueue[Outcome] = queue.SimpleQueue()
+    stopping = threading.Event()
+
+    def parsed(item: Any, fetched: Any, future: Future) -> None:
+        error = future.exception()
+        done.put(Outcome(item, fetched, None if error else future.result(), error))
+
+    def fetch_one(item: Any) -> None:
+        slots.acquire()
+        if stopping.is_set():
+            done.put(Outcome(item, None, None, RuntimeError("Обработка прервана")))
+            return
+        try:
+            fetched = fetch(item)
+            future = parse_pool.submit(parse, fetched)
+        except Exception as exc:  # noqa: BLE001
+            done.put(Outcome(item, None, None, exc))
+            return
+        future.add_done_callback(lambda future: parsed(item, fetched, future))
+
+    with ProcessPoolExecutor(max_workers=processes, mp_context=_context()) as parse_pool, \
+            ThreadPoolExecutor(max_workers=max(1, fetch_workers)) as fetch_pool:
+        count = 0
+        for item in items:
+            fetch_pool.submit(fetch_one, item)
+            count += 1
+        try:
+            for _ in range(count):
+                outcome = done.get()
+                slots.release()
+                yield outcome
+        finally:
+            # Прерванный потребитель: ждущие потоки загрузки выходят без запросов.
+            stopping.set()
+            for _ in range(count):
+                slots.release()
@@ -1,29 +1,51 @@
+from __future__ import annotations
+
 import argparse
-import difflib
 import json
+import os
 import re
 import sys
+import threading
+import time
 import urllib.parse
-from datetime import datetime, timezone
+from collections import OrderedDict
+from datetime import date, datetime, timezone, tzinfo
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Protocol
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, NoReturn, Protocol
 from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup, Tag
+import lesson_index
+import metrics
+import schedule_format
+from entity_index import EntityIndex, day_filters
+from http_client import fetch_text, get_client, get_fixtures, stream_text
+from js_values import find_js_values
+from result_cache import ResultCache, content_digest
+from schedule_diff import ChangeFeed
+from prefetch import Prefetcher, parse_peaks
+from provider_health import ProviderHealth
+from single_flight import SingleFlight
 
-BASE_URL_TEMPLATE = "https://dnevuch.ru/raspisanie-{slug}"
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/120.0.0.0 Safari/537.36"
-    )
-}
+# bs4, requests, модель ТОГУ, пул потоков и сервер загружаются только там, где нужны:
+# --list-groups и ответ из кэша не должны платить за импорт разбора HTML.
+if TYPE_CHECKING:
+    from bs4 import Tag
+    from directory_cache import ConditionalResponse, GroupDirectoryCache
+
+    from group_resolver import GroupResolver
+    from page_archive import PageArchive
+    from schedule_model import Day, Lesson, Pair, ToguSchedule
+    from schedule_store import ScheduleStore
 
-PATTERN_GROUPS = re.compile(r"let\s+groups\s*=\s*(\[[\s\S]*?\]);")
-PATTERN_SCHEDULE = re.compile(r"let\s+scheduleData\s*=\s*(\[[\s\S]*?\]);")
-PATTERN_INFO = re.compile(r"let\s+info\s*=\s*(\{[\s\S]*?\});")
+# Загруженная страница группы ТОГУ: ключ кэша, id группы, URL, HTML и время
+# загрузки (None - только что; для страниц из архива - время из архива).
+ToguPage = tuple[tuple[str, str], str, str, str, float | None]
+
+BASE_URL_TEMPLATE = "https://dnevuch.ru/raspisanie-{slug}"
+# Маркеры находят начало значения, конец определяет js_values.JsValueScanner.
+PATTERN_GROUPS = re.compile(r"let\s+groups\s*=\s*(?=\[)")
+PATTERN_SCHEDULE = re.compile(r"let\s+scheduleData\s*=\s*(?=\[)")
+PATTERN_INFO = re.compile(r"let\s+info\s*=\s*(?=\{)")
 
 TOGU_GROUPS_URL = "https://togudv.ru/rasp/groups/"
 TOGU_GROUP_URL_TEMPLATE = TOGU_GROUPS_URL + "{group_id}/"
@@ -37,41 +59,213 @@ TOGU_PAIR_TIMES: dict[str, tuple[str, str]] = {
     "7": ("18:50", "20:20"),
     "8": ("20:30", "22:00"),
 }
+# Часовой пояс ТОГУ (Хабаровск): по нему считаются "сегодня" и текущая пара.
+TOGU_TIMEZONE = os.environ.get("TOGU_TIMEZONE", "Asia/Vladivostok")
 PAIR_LABEL_RE = re.compile(r"(\d+)\s*пара", re.IGNORECASE)
 TIME_RE = re.compile(r"\b(\d{1,2}:\d{2})\b")
 HREF_DIGITS_RE = re.compile(r"^\d+/$")
 
+CACHE_DIR = Path(
+    os.environ.get("PARSER_CACHE_DIR") or Path(__file__).resolve().parent / ".cache"
+)
+TOGU_GROUPS_TTL = float(os.environ.get("TOGU_GROUPS_TTL", 6 * 60 * 60))
+TOGU_GROUPS_RETRY = float(os.environ.get("TOGU_GROUPS_RETRY", 60))
+DNEVUCH_GROUPS_TTL = float(os.environ.get("DNEVUCH_GROUPS_TTL", 60 * 60))
+
+# Разобранные расписания; имеет смысл в долгоживущем процессе (--serve).
+RESULT_CACHE = ResultCache(
+    max_entries=int(os.environ.get("PARSER_RESULT_CACHE_ENTRIES", 1024)),
+    max_bytes=int(os.environ.get("PARSER_RESULT_CACHE_BYTES", 64 * 1024 * 1024)),
+    ttl=float(os.environ.get("PARSER_RESULT_TTL", 15 * 60)),
+)
+# Изменения расписаний групп между обновлениями (метод changes в --serve).
+CHANGE_FEED = ChangeFeed(
+    path=CACHE_DIR / "snapshots",
+    max_events=int(os.environ.get("PARSER_CHANGE_FEED_SIZE", 10000)),
+)
+# Преподаватели и аудитории всех разобранных групп; после перезапуска
+# заполняется из снимков ленты изменений при первом запросе.
+ENTITY_INDEX = EntityIndex(seed=CHANGE_FEED.snapshots)
+# Одновременные одинаковые запросы (30 студентов в 8:25) скачивают и разбирают
+# страницу один раз.
+IN_FLIGHT = SingleFlight()
+# Фоновое обновление популярных групп (--serve --prefetch).
+PREFETCHER: Prefetcher | None = None
+PREFETCH_INTERVAL = float(os.environ.get("PARSER_PREFETCH_INTERVAL", 10 * 60))
+PREFETCH_TOP = int(os.environ.get("PARSER_PREFETCH_TOP", 50))
+PREFETCH_HOST_BUDGET = int(os.environ.get("PARSER_PREFETCH_HOST_BUDGET", 300))
+PREFETCH_PEAKS = os.environ.get("PARSER_PREFETCH_PEAKS", "08:00,13:00")
+PREFETCH_LEAD = float(os.environ.get("PARSER_PREFETCH_LEAD", 15 * 60))
+# Недоступные вузы, группы и сайты отвечают ошибкой сразу, без ожидания таймаута.
+HEALTH = ProviderHealth(
+    lambda slug: _provider_host(slug),
+    threshold=int(os.environ.get("PARSER_CIRCUIT_THRESHOLD", 3)),
+    base_backoff=float(os.environ.get("PARSER_FAILURE_BACKOFF", 30)),
+    max_backoff=float(os.environ.get("PARSER_FAILURE_BACKOFF_MAX", 60 * 60)),
+    registry=Path(
+        os.environ.get("PARSER_PROVIDERS_STATUS")
+        or Path(__file__).resolve().parent / "providers_status.json"
+    ),
+    path=CACHE_DIR / "provider_health.json",
+)
+# База разобранных расписаний, общая для всех процессов парсера; "off" отключает.
+SCHEDULE_DB = os.environ.get("PARSER_DB") or str(CACHE_DIR / "schedules.sqlite3")
+_SCHEDULE_STORE: ScheduleStore | None = None
+_SCHEDULE_STORE_LOCK = threading.Lock()
+# Архив скачанных страниц для --reparse; "off" отключает.
+ARCHIVE_DIR = os.environ.get("PARSER_ARCHIVE_DIR") or str(CACHE_DIR / "archive")
+ARCHIVE_KEEP = int(os.environ.get("PARSER_ARCHIVE_KEEP", 20))
+_ARCHIVE: PageArchive | None = None
+_ARCHIVE_LOCK = threading.Lock()
+_TOGU_DIRECTORY: GroupDirectoryCache | None = None
+_TOGU_DIRECTORY_LOCK = threading.Lock()
+
+
+def get_store() -> ScheduleStore | None:
+    global _SCHEDULE_STORE
+    if SCHEDULE_DB.lower() in ("", "off", "0"):
+        return None
+    with _SCHEDULE_STORE_LOCK:
+        if _SCHEDULE_STORE is None:
+            from schedule_store import ScheduleStore
+
+            _SCHEDULE_STORE = ScheduleStore(Path(SCHEDULE_DB))
+        return _SCHEDULE_STORE
+
+
+def _store_schedule(key: tuple[str, str], page: str, schedule: Callable[[], Any]) -> None:
+    store = get_store()
+    if store is None:
+        return
+    try:
+        store.save(*key, content_digest(page), schedule)
+    except Exception as exc:
+        # База - дополнительное хранилище, ответ уходит и без неё.
+        print(f"Не удалось сохранить расписание в базу: {exc}", file=sys.stderr)
+
+
+def _stored_day(key: tuple[str, str], day: date) -> dict[str, Any] | None:
+    """The day from the schedule database, if RESULT_CACHE has nothing fresher."""
+    store = get_store()
+    if store is None:
+        return None
+    # expires_in не считается попаданием или промахом в статистике кэша.
+    remaining = RESULT_CACHE.expires_in(key)
+    if remaining is not None and remaining > 0:
+        return None
+    try:
+        return store.day(*key, day, max_age=RESULT_CACHE.ttl)
+    except Exception as exc:
+        print(f"Не удалось прочитать расписание из базы: {exc}", file=sys.stderr)
+        return None
+
+
+def get_archive() -> PageArchive | None:
+    global _ARCHIVE
+    if ARCHIVE_DIR.lower() in ("", "off", "0"):
+        return None
+    with _ARCHIVE_LOCK:
+        if _ARCHIVE is None:
+            from page_archive import PageArchive
+
+            _ARCHIVE = PageArchive(Path(ARCHIVE_DIR), keep=ARCHIVE_KEEP)
+        return _ARCHIVE
+
+
+def _archive_page(url: str, text: str) -> None:
+    fixtures = get_fixtures()
+    archive = get_archive()
+    if archive is None or (fixtures is not None and fixtures.replaying):
+        return
+    try:
+        with metrics.span("archive.put"):
+            archive.put(url, text)
+    except Exception as exc:
+        print(f"Не удалось сохранить страницу в архив: {exc}", file=sys.stderr)
+
 
 def fetch_page(url: str) -> str:
-    response = requests.get(url, headers=HEADERS, timeout=30)
+    with metrics.span("fetch_page") as span:
+        text = fetch_text(url)
+        span.bytes = len(text)
+    _archive_page(url, text)
+    return text
+
+
+def fetch_page_conditional(
+    url: str,
+    etag: str | None = None,
+    last_modified: str | None = None,
+) -> ConditionalResponse:
+    from directory_cache import ConditionalResponse
+
+    if get_fixtures() is not None:
+        # Записанные страницы хранятся без ETag / Last-Modified.
+        text = fetch_text(url)
+        _archive_page(url, text)
+        return ConditionalResponse(text, None, None)
+    headers: dict[str, str] = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    with metrics.span("http.get") as span:
+        response = get_client().get(url, headers=headers)
+        span.bytes = len(response.content)
+    metrics.record("http.headers", response.elapsed.total_seconds())
+    if response.status_code == 304:
+        return ConditionalResponse(None, etag, last_modified)
     response.raise_for_status()
     response.encoding = "utf-8"
-    return response.text
+    _archive_page(url, response.text)
+    return ConditionalResponse(
+        response.text,
+        response.headers.get("ETag"),
+        response.headers.get("Last-Modified"),
+    )
 
 
-def extract_js_array(html: str, pattern: re.Pattern) -> list | None:
-    match = pattern.search(html)
-    if not match:
-        return None
+def fetch_js_values(
+    url: str,
+    patterns: dict[str, re.Pattern],
+    stop_on: Iterable[str] | None = None,
+) -> dict[str, str]:
+    with metrics.span("fetch_js_values"), stream_text(url) as chunks:
+        return find_js_values(chunks, patterns, stop_on)
+
 
+def _decode_js_array(payload: str | None) -> list | None:
+    if payload is None:
+        return None
     try:
-        return json.loads(match.group(1))
+        with metrics.span("js.decode") as span:
+            span.bytes = len(payload)
+            return json.loads(payload)
     except json.JSONDecodeError as error:
         raise ValueError(
             "Не удалось преобразовать данные из скрипта в JSON"
         ) from error
 
 
-def extract_js_object(html: str, pattern: re.Pattern) -> dict | None:
-    match = pattern.search(html)
-    if not match:
+def _decode_js_object(payload: str | None) -> dict | None:
+    if payload is None:
         return None
     try:
-        return json.loads(match.group(1))
+        return json.loads(payload)
     except json.JSONDecodeError:
         return None
 
 
+def extract_js_array(html: str, pattern: re.Pattern) -> list | None:
+    with metrics.span("extract_js_array") as span:
+        span.bytes = len(html)
+        return _decode_js_array(find_js_values([html], {"value": pattern}).get("value"))
+
+
+def extract_js_object(html: str, pattern: re.Pattern) -> dict | None:
+    return _decode_js_object(find_js_values([html], {"value": pattern}).get("value"))
+
+
 def _normalize_week_type(raw: str) -> str | None:
     if not raw:
         return None
@@ -129,6 +323,41 @@ def _parse_rooms(cell: Tag | None) -> list[dict[str, Any]]:
     return rooms
 
 
+def _descendant_ids(tags: list[Tag]) -> set[int]:
+    ids: set[int] = set()
+    for tag in tags:
+        ids.add(id(tag))
+        ids.update(id(node) for node in tag.descendants)
+    return ids
+
+
+def _first_outside(candidates: list[Tag], hidden: list[Tag]) -> Tag | None:
+    skipped = _descendant_ids(hidden)
+    for tag in candidates:
+        if id(tag) not in skipped:
+            return tag
+    return None
+
+
+def _text_without(tag: Tag, hidden: list[Tag], separator: str = "") -> str:
+    # То же, что tag.get_text(separator, strip=True) после extract() для
+    # каждого тега из hidden, но без изменения дерева.
+    from bs4 import CData, NavigableString
+
+    skipped = _descendant_ids(hidden)
+    types = tag.interesting_string_types or (NavigableString, CData)
+    if isinstance(types, type):
+        types = (types,)
+    parts: list[str] = []
+    for node in tag.descendants:
+        if type(node) not in types or id(node) in skipped:
+            continue
+        text = node.strip()
+        if text:
+            parts.append(text)
+    return separator.join(parts)
+
+
 def _parse_teachers(cell: Tag | None) -> list[dict[str, Any]]:
     teachers: list[dict[str, Any]] = []
     if not cell:
@@ -140,14 +369,13 @@ def _parse_teachers(cell: Tag | None) -> list[dict[str, Any]]:
             continue
         title_tag = item.find("span", class_="prepod-title")
         title = title_tag.get_text(strip=True) if title_tag else None
-        if title_tag:
-            title_tag.extract()
-        link = item.find("a", href=True)
+        hidden = [title_tag] if title_tag else []
+        link = _first_outside(item.find_all("a", href=True), hidden)
         if link:
             name = link.get_text(strip=True)
             href = urljoin(TOGU_GROUPS_URL, link["href"])
         else:
-            name = item.get_text(strip=True)
+            name = _text_without(item, hidden)
             href = None
         teachers.append({"name": name, "title": title, "url": href})
     return teachers
@@ -162,29 +390,36 @@ def _parse_discipline(cell: Tag | None) -> dict[str, Any]:
             "date_range": None,
             "subgroups": [],
         }
-    copy = BeautifulSoup(str(cell), "html.parser").find("td")
-    event_type_tag = copy.find("span", class_="event-type")
+    hidden: list[Tag] = []
+    event_type_tag = cell.find("span", class_="event-type")
     lesson_type = None
     lesson_type_full = None
     if event_type_tag:
         lesson_type = event_type_tag.get_text(strip=True)
         lesson_type_full = event_type_tag.get("title")
-        event_type_tag.extract()
+        hidden.append(event_type_tag)
     subgroups: list[str] = []
-    for subgroup_tag in copy.select("span.event-subgroup"):
+    skipped = _descendant_ids(hidden)
+    subgroup_tags = [
+        tag for tag in cell.select("span.event-subgroup")
+        if id(tag) not in skipped
+    ]
+    for subgroup_tag in subgroup_tags:
         text = subgroup_tag.get_text(strip=True)
         if text:
             subgroups.append(text)
-        subgroup_tag.extract()
-    strong_tag = copy.find("strong")
+    hidden.extend(subgroup_tags)
+    strong_tag = _first_outside(cell.find_all("strong"), hidden)
     date_range = None
     if strong_tag:
-        date_range = strong_tag.get_text(strip=True)
-        strong_tag.extract()
-    mobile_block = copy.find("div", class_="visible-xs")
+        date_range = _text_without(strong_tag, hidden)
+        hidden.append(strong_tag)
+    mobile_block = _first_outside(
+        cell.find_all("div", class_="visible-xs"), hidden
+    )
     if mobile_block:
-        mobile_block.extract()
-    subject = copy.get_text(" ", strip=True) or None
+        hidden.append(mobile_block)
+    subject = _text_without(cell, hidden, " ") or None
     return {
         "subject": subject,
         "lesson_type": lesson_type or None,
@@ -194,15 +429,15 @@ def _parse_discipline(cell: Tag | None) -> dict[str, Any]:
     }
 
 
-def _fetch_togu_group_ids() -> dict[str, str]:
-    html = fetch_page(TOGU_GROUPS_URL)
-    soup = BeautifulSoup(html, "html.parser")
+def _parse_togu_group_ids(html: str) -> dict[str, str]:
+    from html_backend import get_backend
+
     mapping: dict[str, str] = {}
-    for link in soup.find_all("a", href=True):
-        href = link["href"].strip()
+    for link in get_backend().links(html):
+        href = link.href.strip()
         if not HREF_DIGITS_RE.match(href):
             continue
-        name = link.get_text(strip=True)
+        name = link.text
         if name:
             mapping[name] = href.rstrip("/")
     if not mapping:
@@ -210,75 +445,82 @@ def _fetch_togu_group_ids() -> dict[str, str]:
     return mapping
 
 
-def _resolve_togu_group_name(
-    group_name: str,
-    group_ids: dict[str, str],
-) -> str:
-    if group_name in group_ids:
-        return group_name
+def _fetch_togu_directory(
+    url: str, etag: str | None, last_modified: str | None
+) -> ConditionalResponse:
+    # Недоступный сайт ТОГУ блокирует и обновление списка групп.
+    return HEALTH.guard(
+        "togu", None, lambda: fetch_page_conditional(url, etag, last_modified)
+    )
 
-    variants = {group_name}
-    # Попытки восстановить строку после проблем с кодировкой консоли.
-    encodings = ("cp1251", "cp866", "latin-1")
-    for enc in encodings:
-        try:
-            variants.add(
-                group_name.encode(enc, errors="ignore").decode("utf-8")
-            )
-        except UnicodeError:
-            pass
-        try:
-            variants.add(
-                group_name.encode("utf-8", errors="ignore").decode(enc)
+
+def get_togu_directory() -> GroupDirectoryCache:
+    """The TOGU group directory, created on first use (with group_resolver)."""
+    global _TOGU_DIRECTORY
+    with _TOGU_DIRECTORY_LOCK:
+        if _TOGU_DIRECTORY is None:
+            from directory_cache import GroupDirectoryCache
+
+            _TOGU_DIRECTORY = GroupDirectoryCache(
+                TOGU_GROUPS_URL,
+                _parse_togu_group_ids,
+                _fetch_togu_directory,
+                path=CACHE_DIR / "togu_groups.json",
+                ttl=TOGU_GROUPS_TTL,
+                retry_after=TOGU_GROUPS_RETRY,
+                flight=IN_FLIGHT,
             )
-        except UnicodeError:
-            pass
-    for variant in variants:
-        if variant in group_ids:
-            return variant
-        lowered = variant.casefold()
-        for key in group_ids:
-            if key.casefold() == lowered:
-                return key
-
-    keys = list(group_ids.keys())
-    matches = difflib.get_close_matches(group_name, keys, n=1, cutoff=0.6)
-    if matches:
-        return matches[0]
-    matches = difflib.get_close_matches(
-        group_name.casefold(),
-        [key.casefold() for key in keys],
-        n=1,
-        cutoff=0.6,
-    )
-    if matches:
-        idx = [key.casefold() for key in keys].index(matches[0])
-        return keys[idx]
+        return _TOGU_DIRECTORY
 
-    raise ValueError(
-        f"Группа '{group_name}' не найдена на сайте ТОГУ"
-    )
 
+def _fetch_togu_group_ids() -> dict[str, str]:
+    return get_togu_directory().get()
+
+
+def _resolve_togu_group_name(group_name: str, resolver: GroupResolver) -> str:
+    with metrics.span("resolve_group"):
+        group_key = resolver.resolve(group_name)
+    if group_key is None:
+        raise ValueError(
+            f"Группа '{group_name}' не найдена на сайте ТОГУ"
+        )
+    return group_key
+
+
+def _parse_togu_days(html: str) -> list[Day]:
+    with metrics.span("togu.parse") as span:
+        span.bytes = len(html)
+        from html_backend import get_backend
+
+        with metrics.span("togu.soup"):
+            soup = get_backend().soup(html)
+        with metrics.span("togu.rows"):
+            return _parse_togu_rows(soup)
+
+
+def _parse_togu_rows(soup: Any) -> list[Day]:
+    from schedule_model import Day, Lesson, Pair
 
-def _parse_togu_schedule(html: str) -> list[dict[str, Any]]:
-    soup = BeautifulSoup(html, "html.parser")
     container = soup.select_one("#all_weeks")
     if not container:
         return []
 
-    days: list[dict[str, Any]] = []
+    # Ячейки разбираются сотни раз на страницу: только гистограммы, без трассы.
+    cell = metrics.span
+    days: list[Day] = []
     for heading in container.select("h3.rasp-weekday-title"):
         day_name = heading.get_text(strip=True)
         table = heading.find_next_sibling("table")
-        lessons: list[dict[str, Any]] = []
+        lessons: list[Lesson] = []
         if table:
-            current_pair: dict[str, Any] | None = None
+            current_pair: Pair | None = None
             current_week_type: str | None = None
             for row in table.find_all("tr"):
                 time_cell = row.find("td", class_="time-hour")
                 if time_cell:
                     pair_text = " ".join(time_cell.stripped_strings)
-                    current_pair = _parse_pair_cell(pair_text)
+                    with cell("togu.cell.pair", trace=False):
+                        current_pair = Pair.from_dict(_parse_pair_cell(pair_text))
                 week_cell = row.find("td", class_="time-weektype")
                 if week_cell is not None:
                     week_text = " ".join(week_cell.stripped_strings)
@@ -287,54 +529,205 @@ def _parse_togu_schedule(html: str) -> list[dict[str, Any]]:
                 room_cell = row.find("td", class_="time-room")
                 teacher_cell = row.find("td", class_="time-prepod")
 
-                info = _parse_discipline(discipline_cell)
+                with cell("togu.cell.discipline", trace=False):
+                    info = _parse_discipline(discipline_cell)
                 if not info["subject"] and not room_cell and not teacher_cell:
                     continue
 
-                lesson = {
-                    "pair": current_pair or {},
-                    "week_type": current_week_type,
-                    "subject": info["subject"],
-                    "lesson_type": info["lesson_type"],
-                    "lesson_type_full": info["lesson_type_full"],
-                    "date_range": info["date_range"],
-                    "subgroups": info["subgroups"],
-                    "rooms": _parse_rooms(room_cell),
-                    "teachers": _parse_teachers(teacher_cell),
-                }
-                lessons.append(lesson)
-        days.append({"name": day_name, "lessons": lessons})
+                with cell("togu.cell.rooms", trace=False):
+                    rooms = _parse_rooms(room_cell)
+                with cell("togu.cell.teachers", trace=False):
+                    teachers = _parse_teachers(teacher_cell)
+                lessons.append(
+                    Lesson.build(
+                        pair=current_pair,
+                        week_type=current_week_type,
+                        subject=info["subject"],
+                        lesson_type=info["lesson_type"],
+                        lesson_type_full=info["lesson_type_full"],
+                        date_range=info["date_range"],
+                        subgroups=info["subgroups"],
+                        rooms=rooms,
+                        teachers=teachers,
+                    )
+                )
+        days.append(Day(sys.intern(day_name), tuple(lessons)))
     return days
 
 
+def _parse_togu_schedule(html: str) -> list[dict[str, Any]]:
+    return [day.to_dict() for day in _parse_togu_days(html)]
+
+
+def _togu_result(
+    group_key: str,
+    group_id: str,
+    source_url: str,
+    days: list[Day],
+    fetched_at: float | None = None,
+) -> dict[str, Any]:
+    # От retrieved_at зависит учебный год дат без года в индексе dates.
+    retrieved_at = datetime.fromtimestamp(
+        time.time() if fetched_at is None else fetched_at, timezone.utc
+    )
+    return {
+        "provider": "togudv.ru",
+        "group": group_key,
+        "group_id": group_id,
+        "source": source_url,
+        "retrieved_at": retrieved_at.isoformat(),
+        "pair_times": TOGU_PAIR_TIMES,
+        "days": [day.to_dict() for day in days],
+    }
+
+
+def parse_togu_page(page: ToguPage) -> dict[str, Any]:
+    """Parse a downloaded TOGU group page into the result dict with its date index.
+
+    Runs in parse_pipeline worker processes, so it only touches its argument.
+    """
+    key, group_id, source_url, html, fetched_at = page
+    schedule = _togu_result(key[1], group_id, source_url, _parse_togu_days(html), fetched_at)
+    schedule["dates"] = lesson_index.build_date_index(schedule)
+    return schedule
+
+
 class ScheduleProvider(Protocol):
     slug: str
 
     def list_groups(self) -> list[dict]:
         ...
 
+    def resolve_group(self, group_name: str) -> str:
+        ...
+
     def get_schedule(self, group_name: str) -> Any:
         ...
 
+    def get_day(self, group_name: str, day: date) -> dict[str, Any]:
+        ...
+
+    def expires_in(self, group_name: str) -> float | None:
+        ...
+
+    def refresh(self, group_name: str) -> None:
+        ...
+
+    def cache_group(self, group_name: str) -> str:
+        ...
+
 
 class DnevuchEmbeddedProvider:
     def __init__(self, slug: str) -> None:
         self.slug = slug.lower()
         self.base_url = BASE_URL_TEMPLATE.format(slug=self.slug)
+        self._resolver: GroupResolver | None = None
+        self._resolver_built_at = 0.0
+        self._lock = threading.Lock()
+        # Массив scheduleData отдаётся как есть, поэтому индекс по датам
+        # хранится рядом: группа -> (расписание, индекс), не больше групп,
+        # чем помещается в RESULT_CACHE.
+        self._date_indexes: OrderedDict[str, tuple[Any, dict[str, Any]]] = OrderedDict()
 
     def list_groups(self) -> list[dict]:
-        html = fetch_page(self.base_url)
-        groups = extract_js_array(html, PATTERN_GROUPS)
+        return IN_FLIGHT.do(
+            ("groups", self.slug), lambda: HEALTH.guard(self.slug, None, self._fetch_groups)
+        )
+
+    def _fetch_groups(self) -> list[dict]:
+        values = fetch_js_values(self.base_url, {"groups": PATTERN_GROUPS})
+        groups = _decode_js_array(values.get("groups"))
         if groups is None:
             raise ValueError("Список групп не найден на странице")
         return groups
 
+    def resolver(self) -> GroupResolver:
+        with self._lock:
+            expired = time.time() - self._resolver_built_at >= DNEVUCH_GROUPS_TTL
+            if self._resolver is not None and not expired:
+                return self._resolver
+        # Список групп скачивается без блокировки: get_day других групп не ждёт
+        # сети, а одновременные загрузки объединяет IN_FLIGHT в list_groups.
+        names = [
+            str(item["number"])
+            for item in self.list_groups()
+            if isinstance(item, dict) and item.get("number")
+        ]
+        from group_resolver import GroupResolver
+
+        resolver = GroupResolver(names)
+        with self._lock:
+            self._resolver = resolver
+            self._resolver_built_at = time.time()
+        return resolver
+
+    def resolve_group(self, group_name: str) -> str:
+        group_key = self.resolver().resolve(group_name)
+        if group_key is None:
+            raise ValueError(f"Группа '{group_name}' не найдена")
+        return group_key
+
     def get_schedule(self, group_name: str) -> Any:
+        key = (self.slug, group_name)
+        cached = RESULT_CACHE.get(key)
+        if cached is not None:
+            return cached
+        return IN_FLIGHT.do(("schedule", *key), lambda: self._load_schedule(key))
+
+    def expires_in(self, group_name: str) -> float | None:
+        return RESULT_CACHE.expires_in((self.slug, group_name))
+
+    def refresh(self, group_name: str) -> None:
+        """Reload the schedule into RESULT_CACHE, even if the cached one is fresh."""
+        key = (self.slug, group_name)
+        IN_FLIGHT.do(("schedule", *key), lambda: self._load_schedule(key))
+
+    def cache_group(self, group_name: str) -> str:
+        """Group part of the RESULT_CACHE key of ``group_name``."""
+        return group_name
+
+    def _load_schedule(self, key: tuple[str, str]) -> Any:
+        group_name = key[1]
+        payload = HEALTH.guard(
+            self.slug, group_name, lambda: self._fetch_schedule_payload(group_name)
+        )
+        schedule = RESULT_CACHE.put_page(
+            key, payload, lambda: self._build_schedule(group_name, payload)
+        )
+        _store_schedule(key, payload, lambda: schedule)
+        return schedule
+
+    def _build_schedule(self, group_name: str, payload: str) -> list:
+        schedule = _decode_js_array(payload)
+        CHANGE_FEED.observe(self.slug, group_name, schedule)
+        ENTITY_INDEX.update(self.slug, group_name, schedule)
+        return schedule
+
+    def get_day(self, group_name: str, day: date) -> dict[str, Any]:
+        stored = _stored_day((self.slug, group_name), day)
+        if stored is not None:
+            return stored
+        schedule = self.get_schedule(group_name)
+        with self._lock:
+            cached = self._date_indexes.get(group_name)
+            if cached is None or cached[0] is not schedule:
+                cached = (schedule, lesson_index.build_date_index(schedule))
+                self._date_indexes[group_name] = cached
+            self._date_indexes.move_to_end(group_name)
+            while len(self._date_indexes) > RESULT_CACHE.max_entries:
+                self._date_indexes.popitem(last=False)
+        return lesson_index.lessons_on(schedule, cached[1], day)
+
+    def _fetch_schedule_payload(self, group_name: str) -> str:
         query = urllib.parse.quote(group_name)
-        page = fetch_page(f"{self.base_url}?group={query}")
-        schedule = extract_js_array(page, PATTERN_SCHEDULE)
-        if schedule is None:
-            info = extract_js_object(page, PATTERN_INFO)
+        values = fetch_js_values(
+            f"{self.base_url}?group={query}",
+            {"schedule": PATTERN_SCHEDULE, "info": PATTERN_INFO},
+            stop_on=["schedule"],
+        )
+        payload = values.get("schedule")
+        if payload is None:
+            info = _decode_js_object(values.get("info"))
             hint = ""
             if info and info.get("url"):
                 hint = f" Попробуйте перейти на {info['url']}."
@@ -342,7 +735,7 @@ class DnevuchEmbeddedProvider:
                 "Расписание не найдено. Проверь название группы или доступность данных."
                 + hint
             )
-        return schedule
+        return payload
 
 
 class ToguScheduleProvider:
@@ -355,28 +748,110 @@ class ToguScheduleProvider:
             for name, group_id in sorted(mapping.items())
         ]
 
+    def resolve_group(self, group_name: str) -> str:
+        return _resolve_togu_group_name(
+            group_name, get_togu_directory().resolver()
+        )
+
     def get_schedule(self, group_name: str) -> dict[str, Any]:
-        group_ids = _fetch_togu_group_ids()
-        group_key = _resolve_togu_group_name(group_name, group_ids)
+        return self._get_record(*self._locate(group_name)).to_dict()
+
+    def get_day(self, group_name: str, day: date) -> dict[str, Any]:
+        key, group_id = self._locate(group_name)
+        stored = _stored_day(key, day)
+        if stored is not None:
+            return stored
+        return self._get_record(key, group_id).lessons_on(day)
+
+    def expires_in(self, group_name: str) -> float | None:
+        return RESULT_CACHE.expires_in(self._locate(group_name)[0])
+
+    def refresh(self, group_name: str) -> None:
+        key, group_id = self._locate(group_name)
+        IN_FLIGHT.do(("schedule", *key), lambda: self._load_record(key, group_id))
+
+    def cache_group(self, group_name: str) -> str:
+        # Опечатки и разные написания одной группы считаются вместе.
+        return self.resolve_group(group_name)
+
+    def _get_record(self, key: tuple[str, str], group_id: str) -> ToguSchedule:
+        cached = RESULT_CACHE.get(key)
+        if cached is not None:
+            return cached
+        return IN_FLIGHT.do(
+            ("schedule", *key), lambda: self._load_record(key, group_id)
+        )
+
+    def _locate(self, group_name: str) -> tuple[tuple[str, str], str]:
+        """Cache key and TOGU id of the group that ``group_name`` resolves to."""
+        group_ids, resolver = get_togu_directory().lookup()
+        group_key = _resolve_togu_group_name(group_name, resolver)
         if group_key != group_name:
             print(
                 f"Использую ближайшее совпадение группы: {group_key}",
                 file=sys.stderr,
             )
-        group_id = group_ids[group_key]
+        return (self.slug, group_key), group_ids[group_key]
 
+    def _load_record(self, key: tuple[str, str], group_id: str) -> ToguSchedule:
+        group_key = key[1]
         source_url = TOGU_GROUP_URL_TEMPLATE.format(group_id=group_id)
-        html = fetch_page(source_url)
-        days = _parse_togu_schedule(html)
-        return {
-            "provider": "togudv.ru",
-            "group": group_key,
-            "group_id": group_id,
-            "source": source_url,
-            "retrieved_at": datetime.now(timezone.utc).isoformat(),
-            "pair_times": TOGU_PAIR_TIMES,
-            "days": days,
-        }
+        html = HEALTH.guard(self.slug, group_key, lambda: fetch_page(source_url))
+        record = RESULT_CACHE.put_page(
+            key,
+            html,
+            lambda: self._build_schedule(group_key, group_id, source_url, html),
+        )
+        _store_schedule(key, html, record.to_dict)
+        return record
+
+    def fetch_page(self, group_name: str) -> ToguPage:
+        """Download the page of ``group_name`` for parse_togu_page (bulk pipeline)."""
+        key, group_id = self._locate(group_name)
+        source_url = TOGU_GROUP_URL_TEMPLATE.format(group_id=group_id)
+        html = HEALTH.guard(self.slug, key[1], lambda: fetch_page(source_url))
+        return key, group_id, source_url, html, None
+
+    def adopt(self, page: ToguPage, schedule: dict[str, Any]) -> dict[str, Any]:
+        """Cache and store a result of parse_togu_page like a regular fetch."""
+        from schedule_model import ToguSchedule
+
+        key, _, _, html, _ = page
+
+        def build() -> ToguSchedule:
+            CHANGE_FEED.observe(self.slug, key[1], schedule)
+            ENTITY_INDEX.update(self.slug, key[1], schedule)
+            return ToguSchedule.from_dict(schedule)
+
+        RESULT_CACHE.put_page(key, html, build)
+        _store_schedule(key, html, lambda: schedule)
+        return schedule
+
+    def _build_schedule(
+        self,
+        group_key: str,
+        group_id: str,
+        source_url: str,
+        html: str,
+    ) -> ToguSchedule:
+        from schedule_model import ToguSchedule, compact_dates
+
+        days = _parse_togu_days(html)
+        schedule = _togu_result(group_key, group_id, source_url, days)
+        dates = lesson_index.build_date_index(schedule)
+        CHANGE_FEED.observe(self.slug, group_key, schedule)
+        ENTITY_INDEX.update(self.slug, group_key, schedule)
+        # В кэше хранится компактная модель, словарь собирается при выдаче.
+        return ToguSchedule(
+            provider=schedule["provider"],
+            group=sys.intern(group_key),
+            group_id=sys.intern(group_id),
+            source=source_url,
+            retrieved_at=schedule["retrieved_at"],
+            pair_times=TOGU_PAIR_TIMES,
+            days=tuple(days),
+            dates=compact_dates(dates),
+        )
 
 
 PROVIDER_FACTORIES: Dict[str, Callable[[], ScheduleProvider]] = {
@@ -384,12 +859,150 @@ PROVIDER_FACTORIES: Dict[str, Callable[[], ScheduleProvider]] = {
 }
 
 
+_PROVIDERS: dict[str, ScheduleProvider] = {}
+_PROVIDERS_LOCK = threading.Lock()
+
+
+def _provider_host(slug: str) -> str:
+    url = TOGU_GROUPS_URL if slug == ToguScheduleProvider.slug else BASE_URL_TEMPLATE
+    return urllib.parse.urlsplit(url).netloc
+
+
 def get_provider(slug: str) -> ScheduleProvider:
     slug_lower = slug.lower()
-    factory = PROVIDER_FACTORIES.get(slug_lower)
-    if factory:
-        return factory()
-    return DnevuchEmbeddedProvider(slug_lower)
+    with _PROVIDERS_LOCK:
+        provider = _PROVIDERS.get(slug_lower)
+        if provider is None:
+            factory = PROVIDER_FACTORIES.get(slug_lower)
+            if factory:
+                provider = factory()
+            else:
+                provider = DnevuchEmbeddedProvider(slug_lower)
+            _PROVIDERS[slug_lower] = provider
+    return provider
+
+
+def _togu_zone() -> tzinfo:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+    try:
+        return ZoneInfo(TOGU_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        # Без базы часовых поясов (Windows без tzdata) - UTC+10.
+        from datetime import timedelta
+
+        return timezone(timedelta(hours=10))
+
+
+def _togu_now() -> datetime:
+    return datetime.now(_togu_zone())
+
+
+def _parse_day(slug: str, text: str) -> date:
+    """lesson_index.parse_day with "today" of the university for TOGU."""
+    today = _togu_now().date() if slug == ToguScheduleProvider.slug else None
+    return lesson_index.parse_day(text, today)
+
+
+def _current_pair(slug: str, now: datetime) -> str:
+    """Number of the TOGU pair going on at ``now``, or of the next one."""
+    if slug != ToguScheduleProvider.slug:
+        raise ValueError("pair: now есть только для ТОГУ, укажите время начала пары")
+    clock = now.strftime("%H:%M")
+    for number, (_, end) in TOGU_PAIR_TIMES.items():
+        if clock <= end:
+            return number
+    raise ValueError("Пары на сегодня закончились")
+
+
+def _entity_filters(slug: str, request: dict[str, Any]) -> dict[str, Any]:
+    """Filters of the teacher / room / free_rooms methods: ``date`` and ``pair``."""
+    filters: dict[str, Any] = {}
+    pair = request.get("pair")
+    now = _togu_now() if slug == ToguScheduleProvider.slug else None
+    text = request.get("date") or ("today" if pair == "now" else None)
+    if text:
+        filters.update(day_filters(lesson_index.parse_day(text, now.date() if now else None)))
+    if pair == "now":
+        filters["pair"] = _current_pair(slug, now or datetime.now())
+    elif pair is not None:
+        filters["pair"] = str(pair)
+    return filters
+
+
+# Методы handle_request: по ним называются замеры запросов в --serve.
+REQUEST_METHODS = frozenset({
+    "ping", "stats", "metrics", "changes",
+    "teacher", "room", "free_rooms", "list_teachers", "list_rooms",
+    "list_groups", "resolve_group", "get_schedule", "get_day",
+})
+
+
+def handle_request(request: dict[str, Any]) -> Any:
+    method = request.get("method")
+    if method == "ping":
+        return "pong"
+    if method == "stats":
+        return {
+            "result_cache": RESULT_CACHE.stats(),
+            "single_flight": IN_FLIGHT.stats(),
+            "prefetch": PREFETCHER.stats() if PREFETCHER else None,
+            "entities": ENTITY_INDEX.stats(),
+            "health": HEALTH.stats(),
+            "store": store.stats() if (store := get_store()) else None,
+        }
+    if method == "metrics":
+        if request.get("format") == "prometheus":
+            return metrics.prometheus()
+        return metrics.snapshot()
+    if method == "changes":
+        return CHANGE_FEED.since(int(request.get("since") or 0), request.get("slug"))
+
+    slug = (request.get("slug") or "togu").lower()
+    if method in ("teacher", "room"):
+        name = request.get(method)
+        if method == "teacher":
+            if not name:
+                raise ValueError("Укажите преподавателя (teacher)")
+            return ENTITY_INDEX.teacher(slug, name, **_entity_filters(slug, request))
+        if not name:
+            raise ValueError("Укажите аудиторию (room)")
+        return ENTITY_INDEX.room(slug, name, **_entity_filters(slug, request))
+    if method == "free_rooms":
+        filters = _entity_filters(slug, {"date": "today", **request})
+        if "pair" not in filters:
+            raise ValueError("Укажите пару (pair)")
+        return ENTITY_INDEX.free_rooms(slug, **filters)
+    if method in ("list_teachers", "list_rooms"):
+        return ENTITY_INDEX.names(slug, method.removeprefix("list_"))
+
+    provider = get_provider(slug)
+    if method == "list_groups":
+        return provider.list_groups()
+    if method == "resolve_group":
+        group = request.get("group")
+        if not group:
+            raise ValueError("Укажите группу (group)")
+        return provider.resolve_group(group)
+    if method == "get_schedule":
+        group = request.get("group")
+        if not group:
+            raise ValueError("Укажите группу (group)")
+        schedule = provider.get_schedule(group)
+        if PREFETCHER is not None:
+            PREFETCHER.record(provider.slug, provider.cache_group(group))
+        if request.get("format") == "dedup":
+            return schedule_format.dedupe(schedule)
+        return schedule
+    if method == "get_day":
+        group = request.get("group")
+        if not group:
+            raise ValueError("Укажите группу (group)")
+        day = provider.get_day(group, _parse_day(provider.slug, request.get("date") or "today"))
+        if PREFETCHER is not None:
+            PREFETCHER.record(provider.slug, provider.cache_group(group))
+        return day
+    raise ValueError(f"Неизвестный метод: {method}")
 
 
 def parse_args() -> argparse.Namespace:
@@ -405,24 +1018,347 @@ def parse_args() -> argparse.Namespace:
         "--group",
         help="название группы, точно как на сайте"
     )
+    parser.add_argument(
+        "--date",
+        help=(
+            "вывести только занятия одного дня: today, tomorrow, yesterday "
+            "(или сегодня, завтра, вчера), ГГГГ-ММ-ДД или ДД.ММ.ГГГГ"
+        )
+    )
     parser.add_argument(
         "--list-groups",
         action="store_true",
         help="вывести список доступных групп и завершить работу"
     )
+    parser.add_argument(
+        "--all-groups",
+        action="store_true",
+        help="скачать расписания всех групп вуза (результат в NDJSON)"
+    )
+    parser.add_argument(
+        "--groups-file",
+        type=Path,
+        help="скачать расписания групп из файла (по одной на строку)"
+    )
+    parser.add_argument(
+        "--reparse",
+        action="store_true",
+        help=(
+            "разобрать заново страницы групп ТОГУ из архива (PARSER_ARCHIVE_DIR) "
+            "без обращения к сети: все группы или группы из --groups-file"
+        )
+    )
+    parser.add_argument(
+        "--as-of",
+        type=_timestamp_arg,
+        help="для --reparse: брать страницы, скачанные не позже этого времени (ГГГГ-ММ-ДД[ ЧЧ:ММ])"
+    )
     parser.add_argument(
         "--output",
         type=Path,
-        default=Path("schedule.json"),
-        help="путь к файлу для сохранения расписания"
+        help=(
+            "путь к файлу для сохранения расписания "
+            "(по умолчанию schedule.json, для нескольких групп schedule.ndjson); "
+            "\"-\" - вывести результат в stdout"
+        )
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        help="для --all-groups/--groups-file: каталог с файлом на каждую группу"
+    )
+    parser.add_argument(
+        "--format",
+        choices=schedule_format.FORMATS,
+        default="json",
+        help=(
+            "формат результата: json (с отступами), compact (без отступов), "
+            "dedup (преподаватели, аудитории и пары хранятся один раз), "
+            "msgpack (двоичный, нужен пакет msgpack)"
+        )
+    )
+    parser.add_argument(
+        "--framing",
+        choices=schedule_format.FRAMINGS,
+        default="none",
+        help=(
+            "для --output -: none (только данные), ndjson (строка "
+            "{\"ok\": ..., \"result\"|\"error\": ...}) или length "
+            "(4 байта длины big-endian перед данными)"
+        )
+    )
+    parser.add_argument(
+        "--metrics",
+        type=Path,
+        nargs="?",
+        const=Path("-"),
+        help=(
+            "замерять этапы (загрузка, разбор, запись) и сохранить замеры в файл "
+            "(без значения - вывести в stderr); в режиме --serve - метод metrics"
+        )
+    )
+    parser.add_argument(
+        "--metrics-format",
+        choices=("json", "prometheus"),
+        default="json",
+        help="формат замеров для --metrics"
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help=(
+            "работать как постоянный процесс: читать JSON-запросы построчно "
+            "из stdin (или из --socket) и отвечать JSON-строками"
+        )
+    )
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        help="путь к Unix-сокету для режима --serve вместо stdin/stdout"
+    )
+    parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        help=(
+            "в режиме --serve заранее обновлять расписания самых запрашиваемых "
+            "групп (перед утренним пиком и каждые PARSER_PREFETCH_INTERVAL секунд)"
+        )
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help=(
+            "число одновременно обрабатываемых запросов "
+            "в режиме --serve и при скачивании нескольких групп"
+        )
+    )
+    parser.add_argument(
+        "--parse-processes",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            "при скачивании нескольких групп ТОГУ разбирать страницы в N процессах, "
+            "пока --workers потоков скачивают следующие (0 - разбор в потоках загрузки)"
+        )
     )
     return parser.parse_args()
 
 
+def serve(args: argparse.Namespace) -> None:
+    import server
+
+    global PREFETCHER
+    if args.prefetch:
+        PREFETCHER = Prefetcher(
+            lambda slug, group: get_provider(slug).refresh(group),
+            lambda slug, group: get_provider(slug).expires_in(group),
+            _provider_host,
+            interval=PREFETCH_INTERVAL,
+            top=PREFETCH_TOP,
+            host_budget=PREFETCH_HOST_BUDGET,
+            peaks=parse_peaks(PREFETCH_PEAKS),
+            lead=PREFETCH_LEAD,
+            path=CACHE_DIR / "prefetch.json",
+            # Пики запросов - по часам университета, а не сервера.
+            tz=_togu_zone(),
+        )
+        PREFETCHER.start()
+    workers = max(1, args.workers)
+    try:
+        if args.socket:
+            server.serve_unix(
+                handle_request, args.socket, workers=workers, methods=REQUEST_METHODS
+            )
+        else:
+            server.serve_stdio(handle_request, workers=workers, methods=REQUEST_METHODS)
+    finally:
+        if PREFETCHER is not None:
+            PREFETCHER.stop()
+
+
+def _timestamp_arg(value: str) -> float:
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"неверное время: {value}") from None
+
+
+def _archived_togu_pages(until: float | None) -> tuple[list[str], Callable[[str], ToguPage]]:
+    """Groups with an archived TOGU page and a loader of the page by group name."""
+    archive = get_archive()
+    if archive is None:
+        raise ValueError("Архив страниц отключён (PARSER_ARCHIVE_DIR=off)")
+    latest = archive.latest(until)
+    directory = latest.get(TOGU_GROUPS_URL)
+    if directory is None:
+        raise ValueError(f"В архиве {archive.path} нет списка групп ТОГУ")
+    pages: dict[str, tuple[str, str, dict[str, Any]]] = {}
+    for name, group_id in _parse_togu_group_ids(archive.load(directory["digest"])).items():
+        url = TOGU_GROUP_URL_TEMPLATE.format(group_id=group_id)
+        entry = latest.get(url)
+        if entry is not None:
+            pages[name] = (group_id, url, entry)
+
+    def load(group_name: str) -> ToguPage:
+        if group_name not in pages:
+            raise LookupError(f"Страницы группы '{group_name}' нет в архиве")
+        group_id, url, entry = pages[group_name]
+        html = archive.load(entry["digest"])
+        return (ToguScheduleProvider.slug, group_name), group_id, url, html, entry["at"]
+
+    return sorted(pages), load
+
+
+def scrape_many(args: argparse.Namespace, provider: ScheduleProvider) -> None:
+    import bulk
+
+    try:
+        if args.reparse:
+            if not isinstance(provider, ToguScheduleProvider):
+                raise ValueError("--reparse поддерживается только для ТОГУ")
+            groups, fetch = _archived_togu_pages(args.as_of)
+        if args.groups_file:
+            groups = bulk.read_groups_file(args.groups_file)
+        elif not args.reparse:
+            groups = [
+                str(item["number"])
+                for item in provider.list_groups()
+                if item.get("number")
+            ]
+    except Exception as exc:
+        print(f"Ошибка: {exc}", file=sys.stderr)
+        sys.exit(1)
+
+    get_schedule = provider.get_schedule
+    if args.format == "msgpack":
+        print("Формат msgpack не поддерживается для нескольких групп", file=sys.stderr)
+        sys.exit(1)
+    if args.format == "dedup":
+        def get_schedule(group: str) -> Any:
+            return schedule_format.dedupe(provider.get_schedule(group))
+
+    pipelined = args.parse_processes > 0 and isinstance(provider, ToguScheduleProvider)
+    if args.parse_processes > 0 and not pipelined:
+        print("--parse-processes поддерживается только для ТОГУ, разбор в потоках",
+              file=sys.stderr)
+    processes = args.parse_processes
+    if args.reparse:
+        # Сеть не нужна: разбор ограничен только числом ядер.
+        pipelined = True
+        processes = processes or os.cpu_count() or 1
+    elif pipelined:
+        fetch = provider.fetch_page
+    if pipelined:
+        adopt = provider.adopt
+        if args.reparse and args.as_of is not None:
+            # Прошлые версии только выводятся: в базе, ленте изменений и индексе
+            # преподавателей остаётся текущее расписание.
+            def adopt(page: ToguPage, schedule: dict[str, Any]) -> dict[str, Any]:
+                return schedule
+
+        finish = adopt
+        if args.format == "dedup":
+            def finish(page: ToguPage, schedule: dict[str, Any]) -> Any:
+                return schedule_format.dedupe(adopt(page, schedule))
+
+    if args.output_dir:
+        sink: bulk.ResultSink = bulk.DirectorySink(args.output_dir)
+        target = args.output_dir
+    elif _is_stdout(args.output):
+        sink = bulk.NdjsonSink(None)
+        target = "stdout"
+    else:
+        target = args.output or Path("schedule.ndjson")
+        sink = bulk.NdjsonSink(target)
+    try:
+        if pipelined:
+            succeeded, failed = bulk.scrape_groups_pipelined(
+                provider.slug,
+                groups,
+                fetch,
+                parse_togu_page,
+                finish,
+                sink,
+                workers=args.workers,
+                processes=processes,
+            )
+        else:
+            succeeded, failed = bulk.scrape_groups(
+                provider.slug,
+                groups,
+                get_schedule,
+                sink,
+                workers=args.workers,
+            )
+    finally:
+        sink.close()
+
+    print(
+        f"Готово: {succeeded} успешно, {failed} с ошибками. Результат: {target}",
+        file=sys.stderr if target == "stdout" else sys.stdout,
+    )
+    if groups and not succeeded:
+        sys.exit(1)
+
+
+def _is_stdout(output: Path | None) -> bool:
+    return output is not None and str(output) == "-"
+
+
+def _fail(args: argparse.Namespace, message: str) -> NoReturn:
+    """Report an error and exit; with --output - also as an envelope on stdout."""
+    print(f"Ошибка: {message}", file=sys.stderr)
+    if _is_stdout(args.output) and not args.list_groups:
+        sys.stdout.buffer.write(schedule_format.frame_error(message, args.framing))
+        sys.stdout.buffer.flush()
+    sys.exit(1)
+
+
+def _write_metrics(args: argparse.Namespace, spans: list[dict[str, Any]]) -> None:
+    if args.metrics_format == "prometheus":
+        text = metrics.prometheus()
+    else:
+        text = json.dumps(
+            {"trace": spans, "histograms": metrics.snapshot()},
+            ensure_ascii=False,
+            indent=2,
+        ) + "\n"
+    if str(args.metrics) == "-":
+        sys.stderr.write(text)
+    else:
+        args.metrics.write_text(text, encoding="utf-8")
+
+
 def main() -> None:
     args = parse_args()
+    if args.metrics:
+        metrics.enable()
+        # Процессорное время до main(): запуск интерпретатора и импорты.
+        metrics.record("process.startup_cpu", time.process_time())
+    with metrics.trace() as spans:
+        try:
+            _run(args)
+        finally:
+            if args.metrics and not args.serve:
+                _write_metrics(args, spans)
+
+
+def _run(args: argparse.Namespace) -> None:
+    if args.serve:
+        try:
+            serve(args)
+        except KeyboardInterrupt:
+            pass
+        return
+
     provider = get_provider(args.slug)
 
+    if args.all_groups or args.groups_file or args.reparse:
+        scrape_many(args, provider)
+        return
+
     if args.list_groups:
         try:
             groups = provider.list_groups()
@@ -440,20 +1376,41 @@ def main() -> None:
         return
 
     if not args.group:
+        if _is_stdout(args.output):
+            _fail(args, "Укажите группу (--group) или используйте --list-groups")
         print("Укажите группу (--group) или используйте --list-groups")
         sys.exit(1)
 
     try:
-        schedule = provider.get_schedule(args.group)
+        if args.date:
+            schedule = provider.get_day(args.group, _parse_day(provider.slug, args.date))
+        else:
+            schedule = provider.get_schedule(args.group)
     except Exception as exc:
-        print(f"Ошибка: {exc}", file=sys.stderr)
-        sys.exit(1)
+        _fail(args, str(exc))
 
-    args.output.write_text(
-        json.dumps(schedule, ensure_ascii=False, indent=2),
-        encoding="utf-8"
-    )
-    print(f"Расписание сохранено в {args.output}")
+    if _is_stdout(args.output):
+        try:
+            with metrics.span("output.encode"):
+                payload = schedule_format.frame(schedule, args.format, args.framing)
+        except Exception as exc:
+            _fail(args, str(exc))
+        with metrics.span("output.write") as span:
+            span.bytes = len(payload)
+            sys.stdout.buffer.write(payload)
+            sys.stdout.buffer.flush()
+        return
+
+    try:
+        with metrics.span("output.encode"):
+            payload = schedule_format.encode(schedule, args.format)
+    except Exception as exc:
+        _fail(args, str(exc))
+    output = args.output or Path("schedule.json")
+    with metrics.span("output.write") as span:
+        span.bytes = len(payload)
+        output.write_bytes(payload)
+    print(f"Расписание сохранено в {output}")
 
 
 if __name__ == "__main__":
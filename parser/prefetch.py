@@ -0,0 +1,228 @@
+"""Background refresh of the most requested schedules.
+
+``Prefetcher.record(slug, group)`` is called for every schedule request, with
+the group name the result is cached under (not the spelling of the request),
+and keeps an exponentially decayed request count per (slug, group), so
+yesterday's popular groups still rank high at 8 a.m. and groups nobody asks
+for any more fade out. A daemon thread wakes up every ``interval`` seconds and
+additionally ``lead`` seconds before each of the ``peaks`` (``HH:MM`` in
+``tz``, server-local time if None) and calls ``refresh(slug, group)`` for
+those of the ``top`` hottest groups whose cached result (``expires_in(slug,
+group)`` seconds left, None if not cached) would go stale before the next
+wake-up. Reloads to one host are capped at ``host_budget`` per hour
+(``host_of(slug)`` maps a slug to its host), hottest groups first.
+
+The counts are saved to ``path`` after every run and on ``stop()``, so a
+restarted process knows which groups to warm up before the first peak.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, tzinfo
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+HOUR = 60 * 60
+MAX_TRACKED = 10000
+
+
+def parse_peaks(text: str) -> list[tuple[int, int]]:
+    """``"07:45, 13:00"`` -> ``[(7, 45), (13, 0)]``."""
+    peaks = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        hours, _, minutes = item.partition(":")
+        try:
+            peak = (int(hours), int(minutes or 0))
+        except ValueError:
+            raise ValueError(f"Неверное время пика: {item}") from None
+        if not (0 <= peak[0] < 24 and 0 <= peak[1] < 60):
+            raise ValueError(f"Неверное время пика: {item}")
+        peaks.append(peak)
+    return sorted(peaks)
+
+
+class Prefetcher:
+    def __init__(
+        self,
+        refresh: Callable[[str, str], None],
+        expires_in: Callable[[str, str], float | None],
+        host_of: Callable[[str], str],
+        *,
+        interval: float,
+        top: int,
+        host_budget: int,
+        peaks: Iterable[tuple[int, int]] = (),
+        lead: float = 15 * 60,
+        half_life: float = 24 * HOUR,
+        path: Path | None = None,
+        tz: tzinfo | None = None,
+    ) -> None:
+        self.interval = interval
+        self.top = top
+        self.host_budget = host_budget
+        self.peaks = list(peaks)
+        self.lead = lead
+        self.half_life = half_life
+        self.path = path
+        self.tz = tz
+        self._refresh = refresh
+        self._expires_in = expires_in
+        self._host_of = host_of
+        self._lock = threading.Lock()
+        self._scores: dict[tuple[str, str], tuple[float, float]] = {}
+        self._requests: dict[str, deque[float]] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._counters = {
+            "runs": 0,
+            "refreshed": 0,
+            "fresh": 0,
+            "over_budget": 0,
+            "errors": 0,
+        }
+        self._load()
+
+    def record(self, slug: str, group: str) -> None:
+        now = time.time()
+        key = (slug, group)
+        with self._lock:
+            score, updated_at = self._scores.get(key, (0.0, now))
+            self._scores[key] = (self._decayed(score, updated_at, now) + 1.0, now)
+            if len(self._scores) > MAX_TRACKED:
+                coldest = min(
+                    self._scores,
+                    key=lambda item: self._decayed(*self._scores[item], now),
+                )
+                del self._scores[coldest]
+
+    def hottest(self, limit: int) -> list[tuple[str, str, float]]:
+        now = time.time()
+        with self._lock:
+            ranked = [
+                (slug, group, self._decayed(score, updated_at, now))
+                for (slug, group), (score, updated_at) in self._scores.items()
+            ]
+        ranked.sort(key=lambda item: item[2], reverse=True)
+        return ranked[:limit]
+
+    def run_once(self, fresh_for: float | None = None) -> None:
+        """Refresh the hottest groups that would go stale within ``fresh_for`` seconds."""
+        if fresh_for is None:
+            now = time.time()
+            # С запасом, чтобы результат дожил до следующего прохода.
+            fresh_for = self.next_run(now) - now + self.interval / 10
+        for slug, group, _ in self.hottest(self.top):
+            host = self._host_of(slug)
+            try:
+                expires_in = self._expires_in(slug, group)
+                if expires_in is not None and expires_in > fresh_for:
+                    self._count("fresh")
+                    continue
+                if not self._has_budget(host):
+                    self._count("over_budget")
+                    continue
+                # Неудачный запрос к сайту тоже расходует бюджет.
+                self._spend(host)
+                self._refresh(slug, group)
+                self._count("refreshed")
+            except Exception as exc:
+                self._count("errors")
+                print(f"Предзагрузка {slug}/{group} не удалась: {exc}", file=sys.stderr)
+        self._count("runs")
+        self._save()
+
+    def next_run(self, now: float) -> float:
+        """The next wake-up: ``interval`` from now or ``lead`` before a peak."""
+        wake = now + self.interval
+        current = datetime.fromtimestamp(now, self.tz)
+        for days in (0, 1):
+            for hours, minutes in self.peaks:
+                peak = (current + timedelta(days=days)).replace(
+                    hour=hours, minute=minutes, second=0, microsecond=0
+                )
+                before_peak = peak.timestamp() - self.lead
+                if now < before_peak < wake:
+                    wake = before_peak
+        return wake
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        # Поток не ждём: он может стоять на сетевом запросе.
+        self._stop.set()
+        self._thread = None
+        self._save()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {**self._counters, "tracked": len(self._scores)}
+
+    def _loop(self) -> None:
+        # Первый проход сразу: после перезапуска кэш пуст.
+        while True:
+            self.run_once()
+            now = time.time()
+            if self._stop.wait(max(0.0, self.next_run(now) - now)):
+                return
+
+    def _decayed(self, score: float, updated_at: float, now: float) -> float:
+        return score * 0.5 ** ((now - updated_at) / self.half_life)
+
+    def _has_budget(self, host: str) -> bool:
+        now = time.time()
+        with self._lock:
+            requests = self._requests.setdefault(host, deque())
+            while requests and now - requests[0] >= HOUR:
+                requests.popleft()
+            return len(requests) < self.host_budget
+
+    def _spend(self, host: str) -> None:
+        with self._lock:
+            self._requests.setdefault(host, deque()).append(time.time())
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _load(self) -> None:
+        if not self.path or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self._scores = {
+                (slug, group): (float(score), float(updated_at))
+                for slug, group, score, updated_at in data.get("scores", [])
+            }
+        except (OSError, ValueError, TypeError):
+            return
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            scores = [
+                [slug, group, score, updated_at]
+                for (slug, group), (score, updated_at) in self._scores.items()
+            ]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(
+                json.dumps({"scores": scores}, ensure_ascii=False), encoding="utf-8"
+            )
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            print(f"Не удалось сохранить статистику предзагрузки: {exc}", file=sys.stderr)
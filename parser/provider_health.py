@@ -0,0 +1,278 @@
+"""Negative cache and circuit breakers for schedule providers.
+
+``ProviderHealth.guard(slug, group, fn)`` runs a fetch for one provider and
+remembers how it went:
+
+* a failed group (``group`` set, e.g. "Расписание не найдено") is not asked
+  for again until its backoff expires - ``base_backoff`` seconds after the
+  first failure, doubling up to ``max_backoff``;
+* ``threshold`` consecutive failures of one slug (its group list, or transport
+  errors / 4xx answers for any of its groups) open the slug circuit;
+* ``threshold`` consecutive timeouts, connection errors or 5xx answers from
+  one host open the host circuit for every slug on it.
+
+While a key is blocked ``guard`` raises ValueError with the cached reason
+without touching the network; once the backoff expires the next call goes
+through, and a success closes the circuit.
+
+The probe results in providers_status.json (``scripts/probe_dnevuch.py``) seed
+the slug circuits: slugs that have no groups, publish empty schedules or point
+to an external site are blocked from the start, until ``max_backoff`` after
+the probe (``checked_at``). Load errors of the page or of the sample group may
+be transient and only go through the circuits above. Entries without
+``checked_at`` block their slug for as long as the registry reports them;
+the registry is re-read when the file changes. The state is saved to
+``path``, so one-shot CLI runs share it with each other and with ``--serve``;
+every save merges the file under a lock, the newer entry of each key wins.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+from file_lock import FileLock
+
+T = TypeVar("T")
+
+
+def probe_reason(item: dict[str, Any]) -> str | None:
+    """Why a providers_status.json entry cannot be served, None if it can or may."""
+    notes = item.get("notes")
+    slug = item.get("slug")
+    if notes in ("no groups array", "no sample group"):
+        return f"На dnevuch.ru нет списка групп для '{slug}'"
+    if notes == "empty scheduleData":
+        return f"dnevuch.ru не публикует расписание для '{slug}'"
+    if notes == "external url":
+        return f"Расписание '{slug}' ведётся на другом сайте: {item.get('info_url')}"
+    # base_error / group_error: сбой мог быть временным, решают обычные блокировки.
+    return None
+
+
+def _host_error(exc: BaseException) -> bool:
+    """Timeouts, connection errors and 5xx answers speak about the whole host."""
+    if not isinstance(exc, OSError):
+        return False
+    response = getattr(exc, "response", None)
+    return response is None or response.status_code >= 500
+
+
+def _timestamp(text: Any) -> float | None:
+    from datetime import datetime
+
+    try:
+        return datetime.fromisoformat(str(text)).timestamp()
+    except ValueError:
+        return None
+
+
+class ProviderHealth:
+    def __init__(
+        self,
+        host_of: Callable[[str], str],
+        *,
+        threshold: int,
+        base_backoff: float,
+        max_backoff: float,
+        registry: Path | None = None,
+        path: Path | None = None,
+    ) -> None:
+        self.threshold = threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.registry = registry
+        self.path = path
+        self._host_of = host_of
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._registry_mtime: float | None = None
+        # "slug:..." -> reason для записей реестра без времени проверки.
+        self._probed: dict[str, str] = {}
+        # "host:..." / "slug:..." / "group:slug/name" -> failures, reason,
+        # retry_at, updated_at.
+        self._state: dict[str, dict[str, Any]] = {}
+        self._counters = {"short_circuited": 0, "failures": 0}
+
+    def guard(self, slug: str, group: str | None, fn: Callable[[], T]) -> T:
+        self.check(slug, group)
+        try:
+            value = fn()
+        except Exception as exc:
+            self.failure(slug, group, exc)
+            raise
+        self.success(slug, group)
+        return value
+
+    def check(self, slug: str, group: str | None = None) -> None:
+        """Raise ValueError with the cached reason if ``slug`` / ``group`` is blocked."""
+        now = time.time()
+        with self._lock:
+            self._load()
+            for key in self._keys(slug, group):
+                if key in self._probed:
+                    self._counters["short_circuited"] += 1
+                    raise ValueError(
+                        f"{self._probed[key]}. Повторите проверку: scripts/probe_dnevuch.py"
+                    )
+                entry = self._state.get(key)
+                if entry is None or entry["retry_at"] <= now:
+                    continue
+                self._counters["short_circuited"] += 1
+                wait = int(entry["retry_at"] - now) + 1
+                raise ValueError(f"{entry['reason']}. Повторная попытка через {wait} с")
+
+    def failure(self, slug: str, group: str | None, exc: BaseException) -> None:
+        now = time.time()
+        reason = str(exc) or type(exc).__name__
+        keys = []
+        if group is not None:
+            keys.append((self._group_key(slug, group), 1, reason))
+        if group is None or isinstance(exc, OSError):
+            keys.append((f"slug:{slug}", self.threshold, reason))
+        if _host_error(exc):
+            host = self._host_of(slug)
+            keys.append(
+                (f"host:{host}", self.threshold, f"Сайт {host} не отвечает ({type(exc).__name__})")
+            )
+        with self._lock:
+            self._load()
+            self._counters["failures"] += 1
+            for key, threshold, key_reason in keys:
+                entry = self._state.get(key)
+                failures = (entry["failures"] if entry else 0) + 1
+                retry_at = 0.0
+                if failures >= threshold:
+                    backoff = self.base_backoff * 2 ** (failures - threshold)
+                    retry_at = now + min(backoff, self.max_backoff)
+                self._state[key] = {
+                    "failures": failures,
+                    "reason": key_reason,
+                    "retry_at": retry_at,
+                    "updated_at": now,
+                }
+            self._save()
+
+    def success(self, slug: str, group: str | None) -> None:
+        with self._lock:
+            self._load()
+            changed = False
+            for key in self._keys(slug, group):
+                entry = self._state.get(key)
+                if entry is not None and entry["failures"]:
+                    # Запись с нулём перекрывает старую проверку из реестра.
+                    self._state[key] = {
+                        "failures": 0,
+                        "reason": None,
+                        "retry_at": 0.0,
+                        "updated_at": time.time(),
+                    }
+                    changed = True
+            if changed:
+                self._save()
+
+    def stats(self) -> dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            self._load()
+            blocked = {
+                key: {"reason": entry["reason"], "retry_in": round(entry["retry_at"] - now)}
+                for key, entry in self._state.items()
+                if entry["retry_at"] > now
+            }
+            for key, reason in self._probed.items():
+                blocked[key] = {"reason": reason, "retry_in": None}
+            return {**self._counters, "blocked": blocked}
+
+    def _keys(self, slug: str, group: str | None) -> list[str]:
+        keys = [f"host:{self._host_of(slug)}", f"slug:{slug}"]
+        if group is not None:
+            keys.append(self._group_key(slug, group))
+        return keys
+
+    @staticmethod
+    def _group_key(slug: str, group: str) -> str:
+        return f"group:{slug}/{group}"
+
+    def _load(self) -> None:
+        if not self._loaded:
+            self._loaded = True
+            self._state = self._read_state()
+        self._load_registry()
+
+    def _load_registry(self) -> None:
+        if not self.registry:
+            return
+        try:
+            mtime = self.registry.stat().st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self._registry_mtime:
+            return
+        self._registry_mtime = mtime
+        self._probed = {}
+        if mtime is None:
+            return
+        try:
+            items = json.loads(self.registry.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            print(f"Не удалось прочитать {self.registry.name}: {exc}", file=sys.stderr)
+            return
+        for item in items:
+            reason = probe_reason(item) if isinstance(item, dict) else None
+            if reason is None:
+                continue
+            key = f"slug:{item['slug']}"
+            checked_at = _timestamp(item.get("checked_at"))
+            if checked_at is None:
+                # Без времени проверки блокировка держится, пока её сообщает реестр.
+                self._probed[key] = reason
+                continue
+            entry = self._state.get(key)
+            # Более свежая собственная попытка важнее проверки из реестра.
+            if entry is not None and entry["updated_at"] >= checked_at:
+                continue
+            self._state[key] = {
+                "failures": self.threshold,
+                "reason": reason,
+                "retry_at": checked_at + self.max_backoff,
+                "updated_at": checked_at,
+            }
+
+    def _read_state(self) -> dict[str, dict[str, Any]]:
+        if not self.path or not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with FileLock(self.path.with_name(f"{self.path.name}.lock")):
+                # Другие процессы могли записать свои ошибки после нашего чтения.
+                for key, entry in self._read_state().items():
+                    current = self._state.get(key)
+                    if current is None or entry["updated_at"] > current["updated_at"]:
+                        self._state[key] = entry
+                now = time.time()
+                # Старые ошибки не копятся: подряд идущими считаются только недавние.
+                self._state = {
+                    key: entry
+                    for key, entry in self._state.items()
+                    if entry["retry_at"] > now or now - entry["updated_at"] < self.max_backoff
+                }
+                tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+                tmp_path.write_text(json.dumps(self._state, ensure_ascii=False), encoding="utf-8")
+                os.replace(tmp_path, self.path)
+        except OSError as exc:
+            print(f"Не удалось сохранить состояние провайдеров: {exc}", file=sys.stderr)
+
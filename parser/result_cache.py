@@ -0,0 +1,119 @@
+"""In-memory cache of parsed schedules keyed by (provider slug, group).
+
+Entries expire after ``ttl`` seconds and are evicted in LRU order once the
+entry count or the total size of the source pages exceeds the limits. Each
+entry remembers a hash of the raw page it was parsed from: when an expired
+entry is refreshed and the page turns out to be unchanged, the old parsed
+result is reused and parsing is skipped.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class _Entry:
+    __slots__ = ("value", "digest", "size", "stored_at")
+
+    def __init__(self, value: Any, digest: str, size: int, stored_at: float) -> None:
+        self.value = value
+        self.digest = digest
+        self.size = size
+        self.stored_at = stored_at
+
+
+def content_digest(content: str) -> str:
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, *, max_entries: int, max_bytes: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "unchanged": 0,
+            "parsed": 0,
+            "evictions": 0,
+        }
+
+    def get(self, key: Hashable) -> Any | None:
+        """Return a fresh cached value or None (a miss or an expired entry)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            if time.time() - entry.stored_at >= self.ttl:
+                self._counters["expired"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry.value
+
+    def put_page(self, key: Hashable, content: str, parse: Callable[[], Any]) -> Any:
+        """Store the result for ``content``, calling ``parse`` only if the page changed."""
+        digest = content_digest(content)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.digest == digest:
+                entry.stored_at = time.time()
+                self._entries.move_to_end(key)
+                self._counters["unchanged"] += 1
+                return entry.value
+
+        value = parse()
+        with self._lock:
+            self._counters["parsed"] += 1
+            self._store(key, _Entry(value, digest, len(content), time.time()))
+        return value
+
+    def expires_in(self, key: Hashable) -> float | None:
+        """Seconds until ``key`` expires (negative once expired), None if absent."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            return entry.stored_at + self.ttl - time.time()
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _store(self, key: Hashable, entry: _Entry) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.size
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self._counters["evictions"] += 1
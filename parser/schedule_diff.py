@@ -0,0 +1,210 @@
+"""Structural diffs between successive versions of a group's schedule.
+
+Both schedule shapes are reduced to an ordered mapping ``day -> lessons``:
+TOGU results by ``days[].name`` / ``days[].lessons`` (a name that repeats
+gets the day's position, ``Понедельник #7``, see ``day_name``), raw dnevuch
+``scheduleData`` arrays by the date of the first slot of each day (or its
+position when a day has no date), with slots playing the role of lessons.
+A lesson is compared as a whole: an edited lesson shows up as one removed and
+one added entry of the same day.
+
+``ChangeFeed`` keeps the last version seen for every (slug, group) and records
+a numbered event whenever a new version differs from it. The last versions are
+written to disk and only their digests stay in memory; the previous version is
+read back only when a change has to be described. A restarted process
+therefore still notices what changed while it was down.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Hashable, Iterator
+
+Days = dict[str, list[Any]]
+
+_POSITION_RE = re.compile(r" #\d+$")
+
+
+def day_name(key: str) -> str:
+    """The day name of a ``schedule_days`` key, without the position of a repeat."""
+    return _POSITION_RE.sub("", key)
+
+
+def schedule_days(schedule: Any) -> Days:
+    """Ordered ``day -> lessons`` view of a TOGU result or a dnevuch array."""
+    days: Days = {}
+    if isinstance(schedule, dict) and isinstance(schedule.get("days"), list):
+        for index, day in enumerate(schedule["days"]):
+            name = str(day.get("name") or f"#{index}")
+            if name in days:
+                # Повторяющийся день (например, две недели подряд) не затирает первый.
+                name = f"{name} #{index}"
+            days[name] = list(day.get("lessons") or [])
+    elif isinstance(schedule, list):
+        for index, day in enumerate(schedule):
+            slots = day if isinstance(day, list) else [day]
+            date = next(
+                (
+                    slot["date"]
+                    for slot in slots
+                    if isinstance(slot, dict) and slot.get("date")
+                ),
+                None,
+            )
+            days[str(date or f"#{index}")] = slots
+    return days
+
+
+def _key(lesson: Any) -> str:
+    return json.dumps(lesson, ensure_ascii=False, sort_keys=True)
+
+
+def _subtract(items: list[Any], other: Counter[str]) -> list[Any]:
+    remaining = Counter(other)
+    result = []
+    for item in items:
+        key = _key(item)
+        if remaining[key]:
+            remaining[key] -= 1
+        else:
+            result.append(item)
+    return result
+
+
+def diff_days(old: Days, new: Days) -> list[dict[str, Any]]:
+    """Per-day changes from ``old`` to ``new``; empty when nothing changed."""
+    changes: list[dict[str, Any]] = []
+    for name, lessons in new.items():
+        if name not in old:
+            changes.append({"day": name, "status": "added", "added": lessons, "removed": []})
+            continue
+        previous = old[name]
+        added = _subtract(lessons, Counter(map(_key, previous)))
+        removed = _subtract(previous, Counter(map(_key, lessons)))
+        if added or removed:
+            changes.append(
+                {"day": name, "status": "changed", "added": added, "removed": removed}
+            )
+    for name, lessons in old.items():
+        if name not in new:
+            changes.append({"day": name, "status": "removed", "added": [], "removed": lessons})
+    return changes
+
+
+def diff_schedules(old: Any, new: Any) -> list[dict[str, Any]]:
+    return diff_days(schedule_days(old), schedule_days(new))
+
+
+class ChangeFeed:
+    def __init__(self, *, path: Path | None, max_events: int) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._digests: dict[Hashable, str] = {}
+        # Без каталога на диске предыдущие версии хранятся в памяти.
+        self._snapshots: dict[Hashable, Days] = {}
+        self._events: deque[dict[str, Any]] = deque(maxlen=max(1, max_events))
+        self._seq = 0
+
+    def observe(self, slug: str, group: str, schedule: Any) -> dict[str, Any] | None:
+        """Remember ``schedule`` as the latest version; return an event if it changed."""
+        key = (slug, group)
+        days = schedule_days(schedule)
+        digest = hashlib.blake2b(
+            json.dumps(days, ensure_ascii=False, sort_keys=True).encode("utf-8"),
+            digest_size=16,
+        ).hexdigest()
+        with self._lock:
+            if self._digests.get(key) == digest:
+                return None
+            self._digests[key] = digest
+            previous = self._snapshots.get(key) if not self.path else self._load(key)
+            changes = diff_days(previous, days) if previous is not None else []
+            if previous is None or changes:
+                if self.path:
+                    self._save(key, days)
+                else:
+                    self._snapshots[key] = days
+            if not changes:
+                return None
+            self._seq += 1
+            event = {
+                "seq": self._seq,
+                "slug": slug,
+                "group": group,
+                "at": time.time(),
+                "changes": changes,
+            }
+            self._events.append(event)
+        return event
+
+    def snapshots(self) -> Iterator[tuple[str, str, Days]]:
+        """The last version of every (slug, group) seen, in memory or on disk."""
+        if not self.path:
+            with self._lock:
+                items = list(self._snapshots.items())
+            for (slug, group), days in items:
+                yield slug, group, days
+            return
+        for file in sorted(self.path.glob("*.json")):
+            try:
+                data = json.loads(file.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                continue
+            key = data.get("key")
+            if isinstance(key, list) and len(key) == 2 and isinstance(data.get("days"), dict):
+                yield key[0], key[1], data["days"]
+
+    def since(self, seq: int = 0, slug: str | None = None) -> dict[str, Any]:
+        """Events after ``seq``; ``truncated`` means older ones were dropped."""
+        with self._lock:
+            # seq больше текущего - процесс перезапускался, отдаём всё.
+            if seq > self._seq:
+                seq = 0
+            events = [
+                event
+                for event in self._events
+                if event["seq"] > seq and (slug is None or event["slug"] == slug)
+            ]
+            truncated = bool(self._events) and self._events[0]["seq"] > seq + 1
+            return {"seq": self._seq, "truncated": truncated, "events": events}
+
+    def _file(self, key: Hashable) -> Path | None:
+        if not self.path:
+            return None
+        name = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=12).hexdigest()
+        return self.path / f"{name}.json"
+
+    def _load(self, key: Hashable) -> Days | None:
+        file = self._file(key)
+        if file is None or not file.exists():
+            return None
+        try:
+            data = json.loads(file.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        if data.get("key") != list(key) or not isinstance(data.get("days"), dict):
+            return None
+        return data["days"]
+
+    def _save(self, key: Hashable, days: Days) -> None:
+        file = self._file(key)
+        if file is None:
+            return
+        try:
+            file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = file.with_name(f"{file.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(
+                json.dumps({"key": list(key), "days": days}, ensure_ascii=False),
+                encoding="utf-8",
+            )
+            os.replace(tmp_path, file)
+        except OSError as exc:
+            print(f"Не удалось сохранить снимок расписания: {exc}", file=sys.stderr)
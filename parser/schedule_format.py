@@ -0,0 +1,173 @@
+"""Output encodings for parsed schedules.
+
+* ``json`` - indented JSON, the historical output of parser.py;
+* ``compact`` - the same JSON without indentation;
+* ``dedup`` - compact JSON where repeated records are stored once in
+  ``tables`` and lessons refer to them by index. For TOGU these are the
+  ``pair``, ``rooms`` and ``teachers`` of each lesson; for dnevuch the
+  ``classes`` of each time slot. ``restore()`` turns it back into the usual
+  shape;
+* ``msgpack`` - MessagePack of the usual shape (needs the ``msgpack``
+  package).
+
+When the result goes to stdout (``--output -``) it can additionally be framed:
+``ndjson`` wraps it in a one-line ``{"ok": true, "result": ...}`` envelope and
+``length`` prefixes the payload with its size as a 4-byte big-endian integer.
+Failures are reported with the same ``{"ok": false, "error": ...}`` envelope.
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+from typing import Any
+
+FORMATS = ("json", "compact", "dedup", "msgpack")
+FRAMINGS = ("none", "ndjson", "length")
+DEDUP_VERSION = "dedup/1"
+
+
+class _Table:
+    def __init__(self) -> None:
+        self.rows: list[Any] = []
+        self._index: dict[str, int] = {}
+
+    def add(self, row: Any) -> int:
+        key = json.dumps(row, ensure_ascii=False, sort_keys=True)
+        index = self._index.get(key)
+        if index is None:
+            index = len(self.rows)
+            self._index[key] = index
+            self.rows.append(row)
+        return index
+
+
+def dedupe(schedule: Any) -> Any:
+    if isinstance(schedule, dict) and isinstance(schedule.get("days"), list):
+        return _dedupe_days(schedule)
+    if isinstance(schedule, list):
+        return _dedupe_slots(schedule)
+    return schedule
+
+
+def restore(packed: Any) -> Any:
+    if not isinstance(packed, dict) or packed.get("format") != DEDUP_VERSION:
+        return packed
+    tables = packed["tables"]
+    if "classes" in tables:
+        classes = tables["classes"]
+        return [
+            [
+                {**slot, "classes": [classes[i] for i in slot["classes"]]}
+                if isinstance(slot, dict) and isinstance(slot.get("classes"), list)
+                else slot
+                for slot in day
+            ]
+            if isinstance(day, list)
+            else day
+            for day in packed["days"]
+        ]
+
+    pairs, rooms, teachers = tables["pairs"], tables["rooms"], tables["teachers"]
+    schedule = {k: v for k, v in packed.items() if k not in ("format", "tables")}
+    schedule["days"] = [
+        {
+            **day,
+            "lessons": [
+                {
+                    **lesson,
+                    "pair": pairs[lesson["pair"]],
+                    "rooms": [rooms[i] for i in lesson["rooms"]],
+                    "teachers": [teachers[i] for i in lesson["teachers"]],
+                }
+                for lesson in day["lessons"]
+            ],
+        }
+        for day in packed["days"]
+    ]
+    return schedule
+
+
+def _dedupe_days(schedule: dict[str, Any]) -> dict[str, Any]:
+    pairs, rooms, teachers = _Table(), _Table(), _Table()
+    days = [
+        {
+            **day,
+            "lessons": [
+                {
+                    **lesson,
+                    "pair": pairs.add(lesson["pair"]),
+                    "rooms": [rooms.add(room) for room in lesson["rooms"]],
+                    "teachers": [teachers.add(t) for t in lesson["teachers"]],
+                }
+                for lesson in day["lessons"]
+            ],
+        }
+        for day in schedule["days"]
+    ]
+    packed = {"format": DEDUP_VERSION, **schedule, "days": days}
+    packed["tables"] = {
+        "pairs": pairs.rows,
+        "rooms": rooms.rows,
+        "teachers": teachers.rows,
+    }
+    return packed
+
+
+def _dedupe_slots(schedule: list[Any]) -> dict[str, Any]:
+    classes = _Table()
+    days = [
+        [
+            {**slot, "classes": [classes.add(item) for item in slot["classes"]]}
+            if isinstance(slot, dict) and isinstance(slot.get("classes"), list)
+            else slot
+            for slot in day
+        ]
+        if isinstance(day, list)
+        else day
+        for day in schedule
+    ]
+    return {"format": DEDUP_VERSION, "tables": {"classes": classes.rows}, "days": days}
+
+
+def encode(schedule: Any, fmt: str) -> bytes:
+    if fmt == "json":
+        return json.dumps(schedule, ensure_ascii=False, indent=2).encode("utf-8")
+    if fmt == "compact":
+        return _compact(schedule)
+    if fmt == "dedup":
+        return _compact(dedupe(schedule))
+    if fmt == "msgpack":
+        try:
+            import msgpack
+        except ImportError as error:
+            raise RuntimeError(
+                "Для формата msgpack установите пакет: pip install msgpack"
+            ) from error
+        return msgpack.packb(schedule, use_bin_type=True)
+    raise ValueError(f"Неизвестный формат: {fmt}")
+
+
+def _compact(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def frame(schedule: Any, fmt: str, framing: str) -> bytes:
+    """Encode a successful result for a stream."""
+    if framing == "ndjson":
+        if fmt == "msgpack":
+            raise ValueError("Формат msgpack нельзя передать в NDJSON")
+        result = dedupe(schedule) if fmt == "dedup" else schedule
+        return _compact({"ok": True, "result": result}) + b"\n"
+    payload = encode(schedule, fmt)
+    if framing == "length":
+        return struct.pack(">I", len(payload)) + payload
+    return payload
+
+
+def frame_error(message: str, framing: str) -> bytes:
+    """Encode a failure envelope for a stream."""
+    payload = _compact({"ok": False, "error": message})
+    if framing == "length":
+        return struct.pack(">I", len(payload)) + payload
+    return payload + b"\n"
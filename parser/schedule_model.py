@@ -0,0 +1,269 @@
+"""Compact in-memory model of a parsed TOGU schedule.
+
+A cache process keeps thousands of schedules, and as plain dicts every lesson
+row carries its own copies of the same subject, teacher, room and
+``"числ."`` strings. Here lessons are frozen ``__slots__`` records, all
+strings are interned, and equal pairs, rooms, teachers and whole lessons are
+shared between lessons and between groups. ``to_dict()`` returns the usual
+JSON shape.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import weakref
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Iterable, TypeVar
+
+from lesson_index import WEEKDAYS
+
+_Record = TypeVar("_Record")
+
+_SHARED: weakref.WeakValueDictionary[Any, Any] = weakref.WeakValueDictionary()
+_SHARED_LOCK = threading.Lock()
+
+
+def _str(value: Any) -> str | None:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _share(record: _Record) -> _Record:
+    """Return the existing record equal to ``record``, or remember this one."""
+    with _SHARED_LOCK:
+        existing = _SHARED.get(record)
+        if existing is None:
+            _SHARED[record] = record
+            return record
+        return existing
+
+
+@dataclass(frozen=True, slots=True, weakref_slot=True)
+class Pair:
+    label: str | None
+    number: str | None = None
+    start: str | None = None
+    end: str | None = None
+    time_range: str | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Pair:
+        return _share(
+            cls(
+                _str(data.get("label")),
+                _str(data.get("number")),
+                _str(data.get("start")),
+                _str(data.get("end")),
+                _str(data.get("time_range")),
+            )
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        # Пустые поля не выводятся, как и в исходном словаре пары.
+        data: dict[str, Any] = {"label": self.label}
+        if self.number is not None:
+            data["number"] = self.number
+        if self.start is not None:
+            data["start"] = self.start
+        if self.end is not None:
+            data["end"] = self.end
+        if self.time_range is not None:
+            data["time_range"] = self.time_range
+        return data
+
+
+@dataclass(frozen=True, slots=True, weakref_slot=True)
+class Room:
+    name: str
+    url: str | None
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Room:
+        return _share(cls(_str(data["name"]), _str(data.get("url"))))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"name": self.name, "url": self.url}
+
+
+@dataclass(frozen=True, slots=True, weakref_slot=True)
+class Teacher:
+    name: str
+    title: str | None
+    url: str | None
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Teacher:
+        return _share(
+            cls(_str(data["name"]), _str(data.get("title")), _str(data.get("url")))
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"name": self.name, "title": self.title, "url": self.url}
+
+
+@dataclass(frozen=True, slots=True, weakref_slot=True)
+class Lesson:
+    pair: Pair | None
+    week_type: str | None
+    subject: str | None
+    lesson_type: str | None
+    lesson_type_full: str | None
+    date_range: str | None
+    subgroups: tuple[str, ...]
+    rooms: tuple[Room, ...]
+    teachers: tuple[Teacher, ...]
+
+    @classmethod
+    def build(
+        cls,
+        *,
+        pair: Pair | None,
+        week_type: str | None,
+        subject: str | None,
+        lesson_type: str | None,
+        lesson_type_full: str | None,
+        date_range: str | None,
+        subgroups: Iterable[str],
+        rooms: Iterable[dict[str, Any]],
+        teachers: Iterable[dict[str, Any]],
+    ) -> Lesson:
+        # Лекции потока совпадают целиком у нескольких групп.
+        return _share(cls(
+            pair,
+            _str(week_type),
+            _str(subject),
+            _str(lesson_type),
+            _str(lesson_type_full),
+            _str(date_range),
+            tuple(sys.intern(item) for item in subgroups),
+            tuple(Room.from_dict(room) for room in rooms),
+            tuple(Teacher.from_dict(teacher) for teacher in teachers),
+        ))
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Lesson:
+        return cls.build(
+            pair=Pair.from_dict(data["pair"]) if data.get("pair") else None,
+            week_type=data.get("week_type"),
+            subject=data.get("subject"),
+            lesson_type=data.get("lesson_type"),
+            lesson_type_full=data.get("lesson_type_full"),
+            date_range=data.get("date_range"),
+            subgroups=data.get("subgroups") or (),
+            rooms=data.get("rooms") or (),
+            teachers=data.get("teachers") or (),
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "pair": self.pair.to_dict() if self.pair else {},
+            "week_type": self.week_type,
+            "subject": self.subject,
+            "lesson_type": self.lesson_type,
+            "lesson_type_full": self.lesson_type_full,
+            "date_range": self.date_range,
+            "subgroups": list(self.subgroups),
+            "rooms": [room.to_dict() for room in self.rooms],
+            "teachers": [teacher.to_dict() for teacher in self.teachers],
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class Day:
+    name: str
+    lessons: tuple[Lesson, ...]
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Day:
+        return cls(
+            sys.intern(data["name"]),
+            tuple(Lesson.from_dict(lesson) for lesson in data.get("lessons") or ()),
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"name": self.name, "lessons": [lesson.to_dict() for lesson in self.lessons]}
+
+
+@dataclass(frozen=True, slots=True)
+class DateEntry:
+    """One date of the lesson index; the weekday follows from the date."""
+
+    week_type: str | None
+    lessons: tuple[tuple[int, int], ...]
+
+    def to_dict(self, day: date) -> dict[str, Any]:
+        return {
+            "weekday": WEEKDAYS[day.weekday()],
+            "week_type": self.week_type,
+            "lessons": [list(position) for position in self.lessons],
+        }
+
+
+def compact_dates(index: dict[str, Any]) -> dict[str, DateEntry]:
+    """Compact form of a lesson_index dict for one schedule."""
+    # Одни и те же позиции и наборы занятий повторяются каждую неделю.
+    positions: dict[tuple[int, int], tuple[int, int]] = {}
+    entries: dict[DateEntry, DateEntry] = {}
+    result: dict[str, DateEntry] = {}
+    for iso, data in index.items():
+        lessons = tuple(
+            positions.setdefault((day, lesson), (day, lesson))
+            for day, lesson in data["lessons"]
+        )
+        entry = DateEntry(_str(data.get("week_type")), lessons)
+        result[sys.intern(iso)] = entries.setdefault(entry, entry)
+    return result
+
+
+@dataclass(frozen=True, slots=True)
+class ToguSchedule:
+    provider: str
+    group: str
+    group_id: str
+    source: str
+    retrieved_at: str
+    pair_times: dict[str, tuple[str, str]]
+    days: tuple[Day, ...]
+    # Индекс дат (lesson_index) ссылается на позиции в days.
+    dates: dict[str, DateEntry]
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> ToguSchedule:
+        return cls(
+            sys.intern(data["provider"]),
+            sys.intern(data["group"]),
+            sys.intern(str(data["group_id"])),
+            data["source"],
+            data["retrieved_at"],
+            data["pair_times"],
+            tuple(Day.from_dict(day) for day in data.get("days") or ()),
+            compact_dates(data.get("dates") or {}),
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "group": self.group,
+            "group_id": self.group_id,
+            "source": self.source,
+            "retrieved_at": self.retrieved_at,
+            "pair_times": self.pair_times,
+            "days": [day.to_dict() for day in self.days],
+            "dates": {
+                iso: entry.to_dict(date.fromisoformat(iso))
+                for iso, entry in self.dates.items()
+            },
+        }
+
+    def lessons_on(self, day: date) -> dict[str, Any]:
+        """Same result as lesson_index.lessons_on() for the dict form."""
+        entry = self.dates.get(day.isoformat())
+        return {
+            "date": day.isoformat(),
+            "weekday": WEEKDAYS[day.weekday()],
+            "week_type": entry.week_type if entry else None,
+            "lessons": [
+                self.days[d].lessons[i].to_dict() for d, i in entry.lessons
+            ] if entry else [],
+        }
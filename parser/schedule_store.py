@@ -0,0 +1,286 @@
+"""SQLite store of parsed schedules.
+
+Every fetched schedule is written to one SQLite file in WAL mode, so readers
+never block the writer and the data outlives the process (and, with
+``PARSER_DB`` on a mounted volume, the container). The schedule is
+normalized:
+
+* ``groups`` - one row per (slug, group) with the metadata of the result, the
+  hash of the source page and the time it was last fetched;
+* ``lessons`` - one row per TOGU lesson or dnevuch slot, with its position in
+  the schedule, weekday / date, pair, week type and the lesson itself as JSON;
+* ``lesson_dates`` - the per-date lesson index (see lesson_index), keyed by
+  (group, date);
+* ``teachers``, ``rooms`` and the ``lesson_teachers`` / ``lesson_rooms`` links.
+
+``day()`` reads one day of one group through the (group, date) key and
+decodes only the lessons of that day. A page that did not change since the
+last fetch only updates ``stored_at``.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable
+
+import lesson_index
+from entity_index import lesson_names
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    id INTEGER PRIMARY KEY,
+    slug TEXT NOT NULL,
+    name TEXT NOT NULL,
+    meta TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    UNIQUE (slug, name)
+);
+CREATE TABLE IF NOT EXISTS lessons (
+    id INTEGER PRIMARY KEY,
+    group_id INTEGER NOT NULL REFERENCES groups (id) ON DELETE CASCADE,
+    day_index INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    day TEXT,
+    pair TEXT,
+    week_type TEXT,
+    subject TEXT,
+    data TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS lessons_by_position
+    ON lessons (group_id, day_index, position);
+CREATE INDEX IF NOT EXISTS lessons_by_day ON lessons (group_id, day);
+CREATE TABLE IF NOT EXISTS lesson_dates (
+    group_id INTEGER NOT NULL REFERENCES groups (id) ON DELETE CASCADE,
+    date TEXT NOT NULL,
+    ord INTEGER NOT NULL,
+    week_type TEXT,
+    lesson_id INTEGER NOT NULL REFERENCES lessons (id) ON DELETE CASCADE,
+    PRIMARY KEY (group_id, date, ord)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS teachers (
+    id INTEGER PRIMARY KEY,
+    slug TEXT NOT NULL,
+    name TEXT NOT NULL,
+    url TEXT,
+    UNIQUE (slug, name)
+);
+CREATE TABLE IF NOT EXISTS rooms (
+    id INTEGER PRIMARY KEY,
+    slug TEXT NOT NULL,
+    name TEXT NOT NULL,
+    url TEXT,
+    UNIQUE (slug, name)
+);
+CREATE TABLE IF NOT EXISTS lesson_teachers (
+    lesson_id INTEGER NOT NULL REFERENCES lessons (id) ON DELETE CASCADE,
+    teacher_id INTEGER NOT NULL REFERENCES teachers (id),
+    PRIMARY KEY (lesson_id, teacher_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS lesson_teachers_by_teacher ON lesson_teachers (teacher_id);
+CREATE TABLE IF NOT EXISTS lesson_rooms (
+    lesson_id INTEGER NOT NULL REFERENCES lessons (id) ON DELETE CASCADE,
+    room_id INTEGER NOT NULL REFERENCES rooms (id),
+    PRIMARY KEY (lesson_id, room_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS lesson_rooms_by_room ON lesson_rooms (room_id);
+"""
+
+
+def _days(schedule: Any) -> list[tuple[str | None, list[Any]]]:
+    """(day name, lessons) of a TOGU result or of a dnevuch array."""
+    if isinstance(schedule, dict):
+        return [(day.get("name"), list(day.get("lessons") or [])) for day in schedule["days"]]
+    return [(None, day if isinstance(day, list) else []) for day in schedule]
+
+
+def _lesson_columns(day_name: str | None, lesson: Any) -> tuple[Any, ...]:
+    if not isinstance(lesson, dict):
+        return None, None, None, None
+    if "classes" in lesson:
+        slot_date = lesson_index.parse_slot_date(lesson.get("date"))
+        subjects = [item.get("name") for item in lesson["classes"] if isinstance(item, dict)]
+        return (
+            slot_date.isoformat() if slot_date else None,
+            lesson.get("time"),
+            lesson_index.week_type_of(lesson.get("week")),
+            "; ".join(subject for subject in subjects if subject) or None,
+        )
+    pair = lesson.get("pair") or {}
+    return day_name, pair.get("number"), lesson.get("week_type"), lesson.get("subject")
+
+
+class ScheduleStore:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def save(self, slug: str, group: str, digest: str,
+             schedule: Callable[[], Any]) -> None:
+        """Store the schedule built from a page with hash ``digest``.
+
+        ``schedule`` is only called when the page differs from the stored one.
+        """
+        connection = self._connection()
+        now = time.time()
+        with self._transaction(connection):
+            row = connection.execute(
+                "SELECT id, digest FROM groups WHERE slug = ? AND name = ?", (slug, group)
+            ).fetchone()
+            if row is not None and row[1] == digest:
+                connection.execute("UPDATE groups SET stored_at = ? WHERE id = ?", (now, row[0]))
+                return
+            value = schedule()
+            meta = (
+                {key: item for key, item in value.items() if key not in ("days", "dates")}
+                if isinstance(value, dict)
+                else {}
+            )
+            if row is not None:
+                # Занятия и даты удаляются каскадом.
+                connection.execute("DELETE FROM lessons WHERE group_id = ?", (row[0],))
+                connection.execute(
+                    "UPDATE groups SET meta = ?, digest = ?, stored_at = ? WHERE id = ?",
+                    (json.dumps(meta, ensure_ascii=False), digest, now, row[0]),
+                )
+                group_id = row[0]
+            else:
+                group_id = connection.execute(
+                    "INSERT INTO groups (slug, name, meta, digest, stored_at) VALUES (?, ?, ?, ?, ?)",
+                    (slug, group, json.dumps(meta, ensure_ascii=False), digest, now),
+                ).lastrowid
+            self._insert_lessons(connection, slug, group_id, value)
+
+    def day(self, slug: str, group: str, day: date, *, max_age: float) -> dict[str, Any] | None:
+        """Lessons of one date, or None if the group is missing or older than ``max_age``."""
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT id, stored_at FROM groups WHERE slug = ? AND name = ?", (slug, group)
+        ).fetchone()
+        if row is None or time.time() - row[1] >= max_age:
+            return None
+        rows = connection.execute(
+            "SELECT lesson_dates.week_type, lessons.data FROM lesson_dates"
+            " JOIN lessons ON lessons.id = lesson_dates.lesson_id"
+            " WHERE lesson_dates.group_id = ? AND lesson_dates.date = ?"
+            " ORDER BY lesson_dates.ord",
+            (row[0], day.isoformat()),
+        ).fetchall()
+        return {
+            "date": day.isoformat(),
+            "weekday": lesson_index.WEEKDAYS[day.weekday()],
+            "week_type": rows[0][0] if rows else None,
+            "lessons": [json.loads(data) for _, data in rows],
+        }
+
+    def stats(self) -> dict[str, int]:
+        connection = self._connection()
+        return {
+            table: connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("groups", "lessons", "teachers", "rooms")
+        }
+
+    def _insert_lessons(self, connection: sqlite3.Connection, slug: str,
+                        group_id: int, schedule: Any) -> None:
+        lesson_ids: dict[tuple[int, int], int] = {}
+        entities: dict[str, dict[str, int]] = {"teachers": {}, "rooms": {}}
+        for day_index, (day_name, lessons) in enumerate(_days(schedule)):
+            for position, lesson in enumerate(lessons):
+                lesson_id = connection.execute(
+                    "INSERT INTO lessons (group_id, day_index, position, day, pair, week_type,"
+                    " subject, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        group_id,
+                        day_index,
+                        position,
+                        *_lesson_columns(day_name, lesson),
+                        json.dumps(lesson, ensure_ascii=False),
+                    ),
+                ).lastrowid
+                lesson_ids[(day_index, position)] = lesson_id
+                if not isinstance(lesson, dict):
+                    continue
+                for kind, names in lesson_names(lesson).items():
+                    for name, url in dict(names).items():
+                        entity_id = self._entity(connection, kind, slug, name, url, entities)
+                        connection.execute(
+                            f"INSERT OR IGNORE INTO lesson_{kind} VALUES (?, ?)",
+                            (lesson_id, entity_id),
+                        )
+
+        dates = (
+            schedule.get("dates") if isinstance(schedule, dict) else None
+        ) or lesson_index.build_date_index(schedule)
+        connection.executemany(
+            "INSERT INTO lesson_dates (group_id, date, ord, week_type, lesson_id)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (
+                (group_id, iso, ord_, entry["week_type"], lesson_ids[tuple(position)])
+                for iso, entry in dates.items()
+                for ord_, position in enumerate(entry["lessons"])
+            ),
+        )
+
+    @staticmethod
+    def _entity(connection: sqlite3.Connection, kind: str, slug: str, name: str,
+                url: str | None, known: dict[str, dict[str, int]]) -> int:
+        entity_id = known[kind].get(name)
+        if entity_id is not None:
+            return entity_id
+        connection.execute(
+            f"INSERT INTO {kind} (slug, name, url) VALUES (?, ?, ?)"
+            f" ON CONFLICT (slug, name) DO UPDATE SET url = coalesce({kind}.url, excluded.url)",
+            (slug, name, url),
+        )
+        entity_id = connection.execute(
+            f"SELECT id FROM {kind} WHERE slug = ? AND name = ?", (slug, name)
+        ).fetchone()[0]
+        known[kind][name] = entity_id
+        return entity_id
+
+    def _connection(self) -> sqlite3.Connection:
+        # Соединение на поток: sqlite3 не разрешает делить его между потоками.
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA foreign_keys = ON")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self._init(connection)
+            self._local.connection = connection
+        return connection
+
+    def _init(self, connection: sqlite3.Connection) -> None:
+        with self._init_lock:
+            if self._initialized:
+                return
+            # WAL: читатели не ждут писателя и наоборот; режим сохраняется в файле.
+            connection.execute("PRAGMA journal_mode = WAL")
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version not in (0, SCHEMA_VERSION):
+                raise RuntimeError(
+                    f"Неизвестная версия базы расписаний {version}: {self.path}"
+                )
+            connection.executescript(SCHEMA)
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._initialized = True
+
+    class _transaction:
+        def __init__(self, connection: sqlite3.Connection) -> None:
+            self.connection = connection
+
+        def __enter__(self) -> sqlite3.Connection:
+            # IMMEDIATE: блокировка записи берётся сразу, без гонки за её повышение.
+            self.connection.execute("BEGIN IMMEDIATE")
+            return self.connection
+
+        def __exit__(self, exc_type: Any, *exc_info: Any) -> None:
+            self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""Compare GroupResolver with the old linear difflib lookup.
+
+Usage: python bench_group_resolver.py [names.json] [--queries N] [--synthetic N]
+
+names.json is a JSON list of group names (default: togu_mapping_keys.json).
+--synthetic N adds N generated names in the TOGU pattern (``ПИ(б) - 51``,
+``ЗМУ(м)з - 24``, ...), the size of a real university directory.
+Queries are the names with one random typo, a lower-cased copy or removed
+spaces. The script fails if the two lookups disagree on any query.
+"""
+
+from __future__ import annotations
+
+import argparse
+import difflib
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+PARSER_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PARSER_DIR))
+
+from group_resolver import GroupResolver  # noqa: E402
+
+
+def legacy_resolve(group_name: str, group_ids: dict[str, str]) -> str | None:
+    if group_name in group_ids:
+        return group_name
+
+    variants = [group_name]
+    for enc in ("cp1251", "cp866", "latin-1"):
+        for raw, codec in ((group_name.encode(enc, errors="ignore"), "utf-8"),
+                           (group_name.encode("utf-8", errors="ignore"), enc)):
+            try:
+                variants.append(raw.decode(codec))
+            except UnicodeError:
+                pass
+    for variant in variants:
+        if variant in group_ids:
+            return variant
+        lowered = variant.casefold()
+        for key in group_ids:
+            if key.casefold() == lowered:
+                return key
+
+    keys = list(group_ids.keys())
+    matches = difflib.get_close_matches(group_name, keys, n=1, cutoff=0.6)
+    if matches:
+        return matches[0]
+    folded = [key.casefold() for key in keys]
+    matches = difflib.get_close_matches(group_name.casefold(), folded, n=1, cutoff=0.6)
+    if matches:
+        return keys[folded.index(matches[0])]
+    return None
+
+
+def synthetic_names(count: int, rng: random.Random) -> list[str]:
+    letters = "АБВГДЕЖЗИКЛМНОПРСТУФХЦЧШЭЮЯ"
+    names: set[str] = set()
+    while len(names) < count:
+        prefix = "".join(rng.choice(letters) for _ in range(rng.randint(1, 5)))
+        level = rng.choice(["б", "м", "с", "а", "9м", "11б"])
+        form = rng.choice(["", "", "", "з", "оз"])
+        names.add(f"{prefix}({level}){form} - {rng.randint(1, 5)}{rng.randint(1, 4)}")
+    return sorted(names)
+
+
+def make_query(name: str, rng: random.Random) -> str:
+    chars = list(name)
+    position = rng.randrange(len(chars))
+    action = rng.choice(["delete", "insert", "replace", "lower", "nospace"])
+    if action == "delete" and len(chars) > 1:
+        del chars[position]
+    elif action == "insert":
+        chars.insert(position, rng.choice("абв -()"))
+    elif action == "replace":
+        chars[position] = rng.choice("абвгд0123")
+    elif action == "lower":
+        return name.lower()
+    elif action == "nospace":
+        return name.replace(" ", "")
+    return "".join(chars)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "names",
+        nargs="?",
+        type=Path,
+        default=PARSER_DIR / "togu_mapping_keys.json",
+        help="JSON list of group names.",
+    )
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--synthetic", type=int, default=0, help="generated names to add (default: 0)"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    names = json.loads(args.names.read_text(encoding="utf-8"))
+    rng = random.Random(args.seed)
+    names += synthetic_names(args.synthetic, rng)
+    group_ids = {name: str(index) for index, name in enumerate(names)}
+    queries = [make_query(rng.choice(names), rng) for _ in range(args.queries)]
+
+    started = time.perf_counter()
+    resolver = GroupResolver(group_ids)
+    build_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    expected = [legacy_resolve(query, group_ids) for query in queries]
+    legacy_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    actual = [resolver.resolve(query) for query in queries]
+    cold_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for query in queries:
+        resolver.resolve(query)
+    warm_time = time.perf_counter() - started
+
+    mismatches = [
+        (query, old, new)
+        for query, old, new in zip(queries, expected, actual)
+        if old != new
+    ]
+    per_query = 1000 / len(queries)
+    print(f"names: {len(names)}, queries: {len(queries)}")
+    print(f"index build:       {build_time * 1000:8.2f} ms")
+    print(f"legacy lookup:     {legacy_time * per_query:8.3f} ms/query")
+    print(f"resolver (cold):   {cold_time * per_query:8.3f} ms/query")
+    print(f"resolver (repeat): {warm_time * per_query:8.3f} ms/query")
+    if mismatches:
+        for query, old, new in mismatches[:10]:
+            print(f"mismatch: {query!r}: legacy={old!r} resolver={new!r}")
+        raise SystemExit(f"{len(mismatches)} mismatch(es)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+"""Offline benchmark of the parser stages on recorded pages.
+
+Usage: python bench_parser.py [fixtures_dir] [--repeat N] [--save FILE]
+                              [--baseline FILE] [--max-regression PCT]
+
+Record pages first, e.g.:
+
+    PARSER_FIXTURES_MODE=record python parser/parser.py --slug togu --all-groups
+    PARSER_FIXTURES_MODE=record python parser/parser.py --slug tpu --list-groups
+
+Stages: the TOGU group directory (_fetch_togu_group_ids, fetched from the
+replay store), _parse_togu_schedule on every recorded group page,
+extract_js_array on every recorded dnevuch page and _resolve_togu_group_name
+on typo'd group names. For each stage the best of N samples is reported as
+time per item and items per second, plus the peak memory allocated per item. With
+--baseline the results are compared to a file written by --save and the script
+fails if any stage got slower by more than --max-regression percent.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import random
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import http_client  # noqa: E402
+import parser as schedule_parser  # noqa: E402
+from page_fixtures import DEFAULT_DIR, PageFixtures  # noqa: E402
+
+TOGU_GROUPS_PATH_RE = re.compile(r"/rasp/groups/?$")
+TOGU_GROUP_PATH_RE = re.compile(r"/rasp/groups/\d+/?$")
+JS_PATTERNS = {
+    "groups": schedule_parser.PATTERN_GROUPS,
+    "scheduleData": schedule_parser.PATTERN_SCHEDULE,
+}
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        items: list[Any],
+        run: Callable[[Any], Any],
+        reset: Callable[[], None] | None = None,
+    ) -> None:
+        self.name = name
+        self.items = items
+        self.run = run
+        self.reset = reset
+
+    def pass_(self) -> None:
+        if self.reset:
+            self.reset()
+        for item in self.items:
+            self.run(item)
+
+
+def classify(fixtures: PageFixtures) -> dict[str, list[str]]:
+    pages: dict[str, list[str]] = {"togu_groups": [], "togu_schedule": [], "dnevuch": []}
+    for url in sorted(fixtures.urls()):
+        path = url.split("?", 1)[0]
+        if TOGU_GROUP_PATH_RE.search(path):
+            pages["togu_schedule"].append(url)
+        elif TOGU_GROUPS_PATH_RE.search(path):
+            pages["togu_groups"].append(url)
+        else:
+            pages["dnevuch"].append(url)
+    return pages
+
+
+def typo(name: str, rng: random.Random) -> str:
+    chars = list(name)
+    position = rng.randrange(len(chars))
+    action = rng.choice(["delete", "replace", "lower", "exact"])
+    if action == "delete" and len(chars) > 1:
+        del chars[position]
+    elif action == "replace":
+        chars[position] = rng.choice("абвгд0123")
+    elif action == "lower":
+        return name.lower()
+    return "".join(chars)
+
+
+def build_stages(fixtures: PageFixtures, queries: int) -> list[Stage]:
+    pages = classify(fixtures)
+    stages: list[Stage] = []
+
+    directory = schedule_parser.get_togu_directory()
+    if pages["togu_groups"]:
+        directory.url = pages["togu_groups"][0]
+        directory.path = None
+
+        def fetch_group_ids(_: Any) -> dict[str, str]:
+            directory.invalidate()
+            return schedule_parser._fetch_togu_group_ids()
+
+        stages.append(Stage("_fetch_togu_group_ids", [None], fetch_group_ids))
+
+    togu_pages = [fixtures.load(url) for url in pages["togu_schedule"]]
+    if togu_pages:
+        stages.append(
+            Stage("_parse_togu_schedule", togu_pages, schedule_parser._parse_togu_schedule)
+        )
+
+    js_items = []
+    for url in pages["dnevuch"]:
+        html = fixtures.load(url)
+        js_items.extend(
+            (html, pattern) for pattern in JS_PATTERNS.values() if pattern.search(html)
+        )
+    if js_items:
+        stages.append(
+            Stage(
+                "extract_js_array",
+                js_items,
+                lambda item: schedule_parser.extract_js_array(*item),
+            )
+        )
+
+    if pages["togu_groups"]:
+        resolver = directory.resolver()
+        names = list(directory.get())
+        rng = random.Random(1)
+        query_list = [typo(rng.choice(names), rng) for _ in range(queries)]
+
+        def resolve(query: str) -> str | None:
+            try:
+                return schedule_parser._resolve_togu_group_name(query, resolver)
+            except ValueError:
+                return None
+
+        # Каждый проход с пустым кэшем запросов, иначе меряется только словарь.
+        stages.append(
+            Stage(
+                "_resolve_togu_group_name",
+                query_list,
+                resolve,
+                reset=resolver._memo.clear,
+            )
+        )
+    return stages
+
+
+def measure(stage: Stage, repeat: int, min_time: float) -> dict[str, float]:
+    stage.pass_()  # прогрев
+    best = float("inf")
+    for _ in range(repeat):
+        # Короткие этапы повторяются, пока замер не займёт min_time.
+        passes = 0
+        started = time.perf_counter()
+        while True:
+            stage.pass_()
+            passes += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / passes)
+
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    stage.pass_()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    items = len(stage.items)
+    return {
+        "items": items,
+        "ms_per_item": best * 1000 / items,
+        "items_per_s": items / best if best else float("inf"),
+        "peak_kib_per_item": (peak - baseline) / 1024 / items,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "fixtures",
+        nargs="?",
+        type=Path,
+        default=DEFAULT_DIR,
+        help="Directory with recorded pages (PARSER_FIXTURES_DIR).",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Timed samples per stage.")
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.2,
+        help="Minimum duration of one sample, seconds.",
+    )
+    parser.add_argument("--queries", type=int, default=500, help="Group name lookups.")
+    parser.add_argument("--save", type=Path, help="Write the results as JSON.")
+    parser.add_argument("--baseline", type=Path, help="Compare with a --save file.")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=20.0,
+        help="Allowed slowdown against --baseline, percent.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    fixtures = PageFixtures(args.fixtures, "replay")
+    if not fixtures.urls():
+        raise SystemExit(f"no recorded pages in {args.fixtures}")
+    http_client.set_fixtures(fixtures)
+
+    results = {
+        stage.name: measure(stage, args.repeat, args.min_time)
+        for stage in build_stages(fixtures, args.queries)
+    }
+    baseline = (
+        json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline else {}
+    )
+
+    print(
+        f"{'stage':26} {'items':>6} {'ms/item':>9} {'items/s':>10} "
+        f"{'peak KiB/item':>14} {'vs baseline':>12}"
+    )
+    regressions = []
+    for name, result in results.items():
+        change = ""
+        if name in baseline:
+            delta = (result["ms_per_item"] / baseline[name]["ms_per_item"] - 1) * 100
+            change = f"{delta:+.1f}%"
+            if delta > args.max_regression:
+                regressions.append(f"{name}: {delta:+.1f}%")
+        print(
+            f"{name:26} {result['items']:6} {result['ms_per_item']:9.3f} "
+            f"{result['items_per_s']:10.1f} {result['peak_kib_per_item']:14.1f} "
+            f"{change:>12}"
+        )
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if regressions:
+        raise SystemExit("slower than baseline: " + ", ".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""Throughput of the bulk fetch / parse pipeline on recorded TOGU pages.
+
+Usage: python bench_pipeline.py [fixtures_dir] [--pages N] [--latency MS]
+                                [--workers N] [--processes 0,1,2,4]
+
+Record pages first, e.g.:
+
+    PARSER_FIXTURES_MODE=record python parser/parser.py --slug togu --all-groups
+
+Every run downloads --pages pages, cycling through the recorded TOGU group
+pages; the download is simulated by sleeping --latency milliseconds, so the
+result does not depend on the site. 0 processes is the plain thread pool of
+``parser.py --all-groups`` (every thread downloads and parses); N > 0 is
+parse_pipeline with --workers download threads and N parsing processes, as in
+``--parse-processes N``. The script prints pages per second for each setting
+and checks that all settings produce the same schedules.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import parser as schedule_parser  # noqa: E402
+from page_fixtures import DEFAULT_DIR, PageFixtures  # noqa: E402
+from parse_pipeline import run_pipeline  # noqa: E402
+
+TOGU_GROUP_PATH_RE = re.compile(r"/rasp/groups/(\d+)/?$")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fixtures", type=Path, nargs="?", default=DEFAULT_DIR)
+    parser.add_argument("--pages", type=int, default=60, help="pages per run (default: 60)")
+    parser.add_argument(
+        "--latency", type=float, default=50, help="simulated download time in ms (default: 50)"
+    )
+    parser.add_argument("--workers", type=int, default=8, help="download threads (default: 8)")
+    parser.add_argument(
+        "--processes",
+        default=None,
+        help="comma-separated process counts (default: 0, 1, 2, 4, ... up to the CPU count)",
+    )
+    return parser.parse_args()
+
+
+def load_pages(fixtures: PageFixtures) -> list[schedule_parser.ToguPage]:
+    pages = []
+    for url in sorted(fixtures.urls()):
+        match = TOGU_GROUP_PATH_RE.search(url.split("?", 1)[0])
+        if match:
+            group_id = match.group(1)
+            pages.append(((schedule_parser.ToguScheduleProvider.slug, group_id), group_id,
+                          url, fixtures.load(url), None))
+    return pages
+
+
+def comparable(schedule: dict[str, Any]) -> dict[str, Any]:
+    return {key: value for key, value in schedule.items() if key != "retrieved_at"}
+
+
+def run(jobs: list[schedule_parser.ToguPage], processes: int, workers: int,
+        latency: float) -> tuple[float, dict[int, Any]]:
+    def fetch(index: int) -> schedule_parser.ToguPage:
+        time.sleep(latency)
+        return jobs[index]
+
+    results: dict[int, Any] = {}
+    started = time.perf_counter()
+    if processes == 0:
+        def fetch_and_parse(index: int) -> tuple[int, Any]:
+            return index, schedule_parser.parse_togu_page(fetch(index))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results.update(pool.map(fetch_and_parse, range(len(jobs))))
+    else:
+        outcomes = run_pipeline(
+            range(len(jobs)),
+            fetch,
+            schedule_parser.parse_togu_page,
+            fetch_workers=workers,
+            processes=processes,
+        )
+        for outcome in outcomes:
+            if outcome.error is not None:
+                raise outcome.error
+            results[outcome.item] = outcome.parsed
+    return time.perf_counter() - started, results
+
+
+def main() -> None:
+    args = parse_args()
+    pages = load_pages(PageFixtures(args.fixtures, "replay"))
+    if not pages:
+        sys.exit(f"No recorded TOGU group pages in {args.fixtures}")
+    jobs = [pages[index % len(pages)] for index in range(args.pages)]
+    cores = os.cpu_count() or 1
+    if args.processes:
+        counts = [int(item) for item in args.processes.split(",")]
+    else:
+        counts = [0] + [count for count in (1, 2, 4, 8, 16) if count <= cores]
+
+    print(f"{len(pages)} recorded pages, {args.pages} per run, {args.latency:g} ms latency, "
+          f"{args.workers} download threads, {cores} CPU cores")
+    print(f"{'processes':>9}  {'seconds':>8}  {'pages/s':>8}  {'speedup':>7}")
+    baseline = reference = None
+    for count in counts:
+        # Первый проход прогревает импорты; запуск процессов входит в замер, как в --parse-processes.
+        run(jobs[:len(pages)], count, args.workers, 0)
+        elapsed, results = run(jobs, count, args.workers, args.latency / 1000)
+        schedules = [comparable(results[index]) for index in range(len(jobs))]
+        if reference is None:
+            reference = schedules
+        elif schedules != reference:
+            sys.exit(f"{count} processes produced different schedules")
+        rate = len(jobs) / elapsed
+        baseline = baseline or rate
+        print(f"{count:>9}  {elapsed:>8.2f}  {rate:>8.1f}  {rate / baseline:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Compare the memory footprint of plain-dict and compact TOGU schedules.
+
+Usage: python bench_schedule_memory.py togu.ndjson
+
+The input is the output of ``parser.py --slug togu --all-groups``. Every
+schedule is held once as the plain dicts the parser used to keep in its cache
+and once as schedule_model.ToguSchedule records; the script reports the memory
+allocated for each (tracemalloc) and checks that to_dict() gives back the same
+JSON.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from schedule_model import ToguSchedule  # noqa: E402
+
+
+def read_schedules(path: Path) -> list[str]:
+    """Raw JSON of each successfully scraped TOGU schedule."""
+    schedules = []
+    with path.open(encoding="utf-8") as file:
+        for line in file:
+            record = json.loads(line)
+            schedule = record.get("schedule")
+            if record.get("ok") and isinstance(schedule, dict) and "days" in schedule:
+                schedules.append(json.dumps(schedule, ensure_ascii=False))
+    return schedules
+
+
+def measure(build: Callable[[], Any]) -> tuple[Any, int]:
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("ndjson", type=Path, help="Bulk scrape result (--all-groups).")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    raw = read_schedules(args.ndjson)
+    if not raw:
+        raise SystemExit("no TOGU schedules in the input")
+
+    plain, plain_size = measure(lambda: [json.loads(item) for item in raw])
+    compact, compact_size = measure(
+        lambda: [ToguSchedule.from_dict(json.loads(item)) for item in raw]
+    )
+
+    for before, after in zip(plain, compact):
+        if json.dumps(before, ensure_ascii=False) != json.dumps(
+            after.to_dict(), ensure_ascii=False
+        ):
+            raise SystemExit(f"{before['group']}: to_dict() differs from the original")
+
+    lessons = sum(len(day["lessons"]) for schedule in plain for day in schedule["days"])
+    print(f"groups: {len(raw)}, lessons: {lessons}")
+    print(f"plain dicts:     {plain_size / 1024:10.1f} KiB")
+    print(f"compact records: {compact_size / 1024:10.1f} KiB")
+    print(f"ratio:           {plain_size / compact_size:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
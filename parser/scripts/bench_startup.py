@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+"""Cold-start time of parser.py per command, on recorded pages.
+
+Usage: python bench_startup.py [fixtures_dir] [--repeat N] [--budget-ms MS]
+
+Every command runs in a fresh interpreter (``python -X importtime
+parser.py ...``) with the pages replayed from fixtures_dir (see
+page_fixtures and bench_parser.py for recording). "cold" runs start with an
+empty PARSER_CACHE_DIR; "cached" runs reuse the cache left by the previous run,
+which is what a second invocation of the CLI sees (the TOGU group directory
+is on disk). For each command the median wall time, the median time spent
+importing modules beyond the interpreter's own start-up and the heavy
+dependencies that got loaded are reported.
+
+The import budget applies to ``import parser`` alone, the fixed cost every
+command pays; the script fails if it exceeds --budget-ms. Replayed runs
+never load requests, so the HTTP stack is not part of these numbers.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from page_fixtures import DEFAULT_DIR, PageFixtures  # noqa: E402
+
+PARSER_PATH = Path(__file__).resolve().parent.parent / "parser.py"
+HEAVY_MODULES = (
+    "bs4", "lxml", "selectolax", "requests", "urllib3", "msgpack",
+    "concurrent.futures", "socketserver",
+)
+IMPORT_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)$")
+DNEVUCH_URL_RE = re.compile(r"/raspisanie-([\w-]+)(?:\?group=(.+))?$")
+TOGU_GROUP_URL_RE = re.compile(r"togudv\.ru/rasp/groups/\d+/?$")
+
+
+class Run:
+    def __init__(self, wall_ms: float, import_ms: float, modules: set[str],
+                 stdout: str) -> None:
+        self.wall_ms = wall_ms
+        self.import_ms = import_ms
+        self.modules = modules
+        self.stdout = stdout
+
+
+def child_env(fixtures: Path, cache_dir: str) -> dict[str, str]:
+    env = dict(os.environ)
+    # Без .pyc замер показывал бы компиляцию исходников, а не запуск.
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env.update(
+        PARSER_CACHE_DIR=cache_dir,
+        PARSER_FIXTURES_MODE="replay",
+        PARSER_FIXTURES_DIR=str(fixtures),
+    )
+    return env
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    """Module name -> self import time, microseconds."""
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORT_LINE_RE.match(line)
+        if match:
+            modules[match.group(2)] = int(match.group(1))
+    return modules
+
+
+def run(argv: list[str], env: dict[str, str], baseline: set[str]) -> Run:
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", *argv],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    modules = parse_importtime(process.stderr)
+    if process.returncode != 0:
+        errors = [line for line in process.stderr.splitlines() if not IMPORT_LINE_RE.match(line)]
+        raise SystemExit(f"{' '.join(argv)} failed:\n" + "\n".join(errors or [process.stdout]))
+    loaded = set(modules) - baseline
+    import_ms = sum(modules[name] for name in loaded) / 1000
+    return Run(wall_ms, import_ms, loaded, process.stdout)
+
+
+def interpreter_modules(env: dict[str, str]) -> set[str]:
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "pass"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(parse_importtime(process.stderr))
+
+
+def first_togu_group(fixtures: Path, baseline: set[str]) -> str:
+    with tempfile.TemporaryDirectory() as cache_dir:
+        listing = run(
+            [str(PARSER_PATH), "--slug", "togu", "--list-groups"],
+            child_env(fixtures, cache_dir),
+            baseline,
+        )
+    return next(iter(listing.stdout.splitlines()), "")
+
+
+def commands(fixtures: PageFixtures, args: argparse.Namespace,
+             baseline: set[str]) -> list[tuple[str, list[str]]]:
+    urls = fixtures.urls()
+    slug, group = args.dnevuch_slug, args.dnevuch_group
+    for url in sorted(urls):
+        match = DNEVUCH_URL_RE.search(url)
+        if match:
+            slug = slug or match.group(1)
+            if match.group(1) == slug and match.group(2):
+                group = group or match.group(2)
+
+    result = []
+    if slug:
+        result.append((f"{slug} --list-groups", ["--slug", slug, "--list-groups"]))
+        if group:
+            result.append((f"{slug} --group", ["--slug", slug, "--group", group]))
+    if any(TOGU_GROUP_URL_RE.search(url) for url in urls) or args.togu_group:
+        togu_group = args.togu_group or first_togu_group(args.fixtures, baseline)
+        result.append(("togu --list-groups", ["--slug", "togu", "--list-groups"]))
+        result.append(("togu --group", ["--slug", "togu", "--group", togu_group]))
+    return result
+
+
+def measure(argv: list[str], fixtures: Path, repeat: int,
+            baseline: set[str]) -> dict[str, list[Run]]:
+    samples: dict[str, list[Run]] = {"cold": [], "cached": []}
+    # Прогрев: .pyc модулей команды и файловый кэш ОС, в замер не входит.
+    with tempfile.TemporaryDirectory() as cache_dir:
+        run([str(PARSER_PATH), *argv], child_env(fixtures, cache_dir), baseline)
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            env = child_env(fixtures, cache_dir)
+            for state in ("cold", "cached"):
+                samples[state].append(run([str(PARSER_PATH), *argv], env, baseline))
+    return samples
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "fixtures",
+        nargs="?",
+        type=Path,
+        default=DEFAULT_DIR,
+        help="Directory with recorded pages (PARSER_FIXTURES_DIR).",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per command.")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=40.0,
+        help="Allowed median time of 'import parser', milliseconds.",
+    )
+    parser.add_argument("--dnevuch-slug", help="dnevuch slug (default: first recorded).")
+    parser.add_argument("--dnevuch-group", help="dnevuch group (default: first recorded).")
+    parser.add_argument("--togu-group", help="TOGU group (default: first listed).")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    fixtures = PageFixtures(args.fixtures, "replay")
+    if not fixtures.urls():
+        raise SystemExit(f"no recorded pages in {args.fixtures}")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = child_env(args.fixtures, cache_dir)
+        baseline = interpreter_modules(env)
+        # Первый запуск - прогрев.
+        imports = [
+            run(["-c", "import parser"], {**env, "PYTHONPATH": str(PARSER_PATH.parent)}, baseline)
+            for _ in range(args.repeat + 1)
+        ][1:]
+
+    selected = commands(fixtures, args, baseline)
+
+    print(f"{'command':24} {'cache':7} {'wall ms':>8} {'import ms':>10}  heavy modules")
+    import_ms = statistics.median(sample.import_ms for sample in imports)
+    wall_ms = statistics.median(sample.wall_ms for sample in imports)
+    print(f"{'import parser':24} {'-':7} {wall_ms:8.1f} {import_ms:10.1f}")
+    for name, argv in selected:
+        for state, runs in measure(argv, args.fixtures, args.repeat, baseline).items():
+            heavy = sorted(
+                module for module in HEAVY_MODULES
+                if any(module in sample.modules for sample in runs)
+            )
+            print(
+                f"{name:24} {state:7} "
+                f"{statistics.median(sample.wall_ms for sample in runs):8.1f} "
+                f"{statistics.median(sample.import_ms for sample in runs):10.1f}  "
+                f"{', '.join(heavy) or '-'}"
+            )
+
+    if import_ms > args.budget_ms:
+        raise SystemExit(
+            f"import parser takes {import_ms:.1f} ms, budget {args.budget_ms:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
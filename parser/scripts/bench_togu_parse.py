@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""Benchmark _parse_togu_schedule against the old re-parsing cell helpers.
+
+Usage: python bench_togu_parse.py saved_togu_page.html [--repeat N]
+
+The old implementation serialized every discipline cell and parsed it again
+with a fresh BeautifulSoup to be able to extract() tags. It is kept here only
+as a reference point; the script also checks that both produce identical JSON.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, Tag
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import parser as schedule_parser  # noqa: E402
+
+
+def legacy_parse_teachers(cell: Tag | None) -> list[dict[str, Any]]:
+    teachers: list[dict[str, Any]] = []
+    if not cell:
+        return teachers
+    paragraphs = cell.find_all("p") or [cell]
+    for item in paragraphs:
+        content = item.get_text(strip=True)
+        if not content:
+            continue
+        title_tag = item.find("span", class_="prepod-title")
+        title = title_tag.get_text(strip=True) if title_tag else None
+        if title_tag:
+            title_tag.extract()
+        link = item.find("a", href=True)
+        if link:
+            name = link.get_text(strip=True)
+            href = urljoin(schedule_parser.TOGU_GROUPS_URL, link["href"])
+        else:
+            name = item.get_text(strip=True)
+            href = None
+        teachers.append({"name": name, "title": title, "url": href})
+    return teachers
+
+
+def legacy_parse_discipline(cell: Tag | None) -> dict[str, Any]:
+    if not cell:
+        return {
+            "subject": None,
+            "lesson_type": None,
+            "lesson_type_full": None,
+            "date_range": None,
+            "subgroups": [],
+        }
+    copy = BeautifulSoup(str(cell), "html.parser").find("td")
+    event_type_tag = copy.find("span", class_="event-type")
+    lesson_type = None
+    lesson_type_full = None
+    if event_type_tag:
+        lesson_type = event_type_tag.get_text(strip=True)
+        lesson_type_full = event_type_tag.get("title")
+        event_type_tag.extract()
+    subgroups: list[str] = []
+    for subgroup_tag in copy.select("span.event-subgroup"):
+        text = subgroup_tag.get_text(strip=True)
+        if text:
+            subgroups.append(text)
+        subgroup_tag.extract()
+    strong_tag = copy.find("strong")
+    date_range = None
+    if strong_tag:
+        date_range = strong_tag.get_text(strip=True)
+        strong_tag.extract()
+    mobile_block = copy.find("div", class_="visible-xs")
+    if mobile_block:
+        mobile_block.extract()
+    subject = copy.get_text(" ", strip=True) or None
+    return {
+        "subject": subject,
+        "lesson_type": lesson_type or None,
+        "lesson_type_full": lesson_type_full or None,
+        "date_range": date_range or None,
+        "subgroups": subgroups,
+    }
+
+
+def run_legacy(html: str) -> list[dict[str, Any]]:
+    current = (schedule_parser._parse_discipline, schedule_parser._parse_teachers)
+    schedule_parser._parse_discipline = legacy_parse_discipline
+    schedule_parser._parse_teachers = legacy_parse_teachers
+    try:
+        return schedule_parser._parse_togu_schedule(html)
+    finally:
+        schedule_parser._parse_discipline, schedule_parser._parse_teachers = current
+
+
+def timed(func: Callable[[str], Any], html: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(html)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pages", nargs="+", type=Path, help="Saved TOGU group pages.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per page (best is reported).")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    print(f"{'page':40} {'lessons':>8} {'legacy, ms':>11} {'current, ms':>12} {'speedup':>8}")
+    for page in args.pages:
+        html = page.read_text(encoding="utf-8")
+        legacy = run_legacy(html)
+        current = schedule_parser._parse_togu_schedule(html)
+        if json.dumps(legacy, ensure_ascii=False) != json.dumps(current, ensure_ascii=False):
+            raise SystemExit(f"{page}: output differs from the legacy implementation")
+
+        lessons = sum(len(day["lessons"]) for day in current)
+        legacy_time = timed(run_legacy, html, args.repeat)
+        current_time = timed(schedule_parser._parse_togu_schedule, html, args.repeat)
+        print(
+            f"{page.name[:40]:40} {lessons:8} "
+            f"{legacy_time * 1000:11.1f} {current_time * 1000:12.1f} "
+            f"{legacy_time / current_time:7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""Check every installed HTML backend against golden parser outputs.
+
+Golden pages live in fixtures/golden/<kind>/<name>.html next to the expected
+<name>.json. Kinds map to the parsing functions below. Run with --update to
+regenerate the JSON from the reference html.parser backend after an
+intentional change in parsing logic.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Callable
+
+PARSER_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PARSER_DIR))
+
+import html_backend  # noqa: E402
+import parser as schedule_parser  # noqa: E402
+from discover_slugs import extract_slugs  # noqa: E402
+
+REFERENCE_BACKEND = "html.parser"
+KINDS: dict[str, Callable[[str], Any]] = {
+    "togu_schedule": schedule_parser._parse_togu_schedule,
+    "togu_groups": schedule_parser._parse_togu_group_ids,
+    "dnevuch_home": lambda html: extract_slugs(html, "https://dnevuch.ru/"),
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--fixtures",
+        type=Path,
+        default=PARSER_DIR / "fixtures" / "golden",
+        help="Directory with golden pages (default: fixtures/golden).",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Rewrite golden JSON using the reference backend.",
+    )
+    return parser.parse_args()
+
+
+def render(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, indent=2, sort_keys=True) + "\n"
+
+
+def main() -> None:
+    args = parse_args()
+    backends = html_backend.available_backends()
+    if args.update:
+        backends = {REFERENCE_BACKEND: backends[REFERENCE_BACKEND]}
+
+    failures = 0
+    for kind, parse in KINDS.items():
+        for page in sorted((args.fixtures / kind).glob("*.html")):
+            html = page.read_text(encoding="utf-8")
+            golden = page.with_suffix(".json")
+            for name in backends:
+                html_backend.set_backend(name)
+                actual = render(parse(html))
+                if args.update:
+                    golden.write_text(actual, encoding="utf-8")
+                    print(f"updated  {kind}/{golden.name}")
+                    continue
+                expected = golden.read_text(encoding="utf-8") if golden.exists() else None
+                status = "ok" if actual == expected else "FAIL"
+                if status == "FAIL":
+                    failures += 1
+                print(f"{status:8} {name:12} {kind}/{page.name}")
+
+    if failures:
+        raise SystemExit(f"{failures} golden mismatch(es)")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,40 +4,39 @@
 from __future__ import annotations
 
 import re
+import sys
+from pathlib import Path
 from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/120.0.0.0 Safari/537.36"
-    )
-}
+from html_backend import get_backend  # noqa: E402
+from http_client import get_client  # noqa: E402
 
 
-def discover_slugs() -> dict[str, str]:
-    resp = requests.get("https://dnevuch.ru", headers=HEADERS, timeout=30)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
+def extract_slugs(html: str, base_url: str) -> dict[str, str]:
     slugs: dict[str, str] = {}
 
-    for link in soup.select("a[href*='raspisanie-']"):
-        href = link.get("href")
-        if not href:
+    for link in get_backend().links(html):
+        href = link.href
+        if not href or "raspisanie-" not in href:
             continue
-        full = urljoin(resp.url, href)
+        full = urljoin(base_url, href)
         match = re.search(r"raspisanie-([a-z0-9-]+)", full)
         if not match:
             continue
         slug = match.group(1)
-        text = link.get_text(strip=True) or link.get("title") or ""
+        text = link.text or link.title or ""
         slugs.setdefault(slug, text)
     return slugs
 
 
+def discover_slugs() -> dict[str, str]:
+    resp = get_client().get("https://dnevuch.ru")
+    resp.raise_for_status()
+    return extract_slugs(resp.text, resp.url)
+
+
 def main() -> None:
     for slug, label in sorted(discover_slugs().items()):
         print(f"{slug:15} {label}")
@@ -5,27 +5,27 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
+import re
 import sys
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from typing import Any, Iterable
 
-import requests
-
 from discover_slugs import discover_slugs
-
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/120.0.0.0 Safari/537.36"
-    )
-}
+from http_client import fetch_text  # каталог парсера добавлен в sys.path в discover_slugs
 
 PATTERN_GROUPS = r"let\s+groups\s*=\s*(\[[\s\S]*?\]);"
 PATTERN_SCHEDULE = r"let\s+scheduleData\s*=\s*(\[[\s\S]*?\]);"
 PATTERN_INFO = r"let\s+info\s*=\s*(\{[\s\S]*?\});"
 
+DEFAULT_STATUS_FILE = Path(__file__).resolve().parent.parent / "providers_status.json"
+DURATION_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*$")
+DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
 
 @dataclass
 class SlugResult:
@@ -34,6 +34,7 @@ class SlugResult:
     schedule_items: int | str | None
     info_url: str | None
     notes: str | None = None
+    checked_at: str | None = None
 
     def as_dict(self) -> dict[str, Any]:
         return {
@@ -42,14 +43,12 @@ class SlugResult:
             "schedule_items": self.schedule_items,
             "info_url": self.info_url,
             "notes": self.notes,
+            "checked_at": self.checked_at,
         }
 
 
 def fetch(url: str) -> str:
-    resp = requests.get(url, headers=HEADERS, timeout=30)
-    resp.raise_for_status()
-    resp.encoding = "utf-8"
-    return resp.text
+    return fetch_text(url)
 
 
 def extract_json(text: str, pattern: str) -> Any | None:
@@ -117,6 +116,12 @@ def inspect_slug(slug: str, *, preferred_group: str | None = None) -> SlugResult
     return SlugResult(slug, sample_group, schedule_len, info_url, notes)
 
 
+def probe(slug: str, preferred_group: str | None) -> SlugResult:
+    result = inspect_slug(slug, preferred_group=preferred_group)
+    result.checked_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    return result
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Inspect dnevuch.ru schedule sources for slugs."
@@ -143,9 +148,74 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Output JSON instead of table.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help=(
+            "Slugs probed in parallel (default: 8). Requests to one host are "
+            "additionally capped by PARSER_HTTP_PER_HOST."
+        ),
+    )
+    parser.add_argument(
+        "--status-file",
+        type=Path,
+        nargs="?",
+        const=DEFAULT_STATUS_FILE,
+        help=(
+            "Merge every finished probe into this JSON file as it completes "
+            "(default path: providers_status.json next to parser.py)."
+        ),
+    )
+    parser.add_argument(
+        "--stale-after",
+        type=parse_duration,
+        metavar="AGE",
+        help=(
+            "Only probe slugs whose status in --status-file is older than AGE "
+            "(e.g. 90m, 12h, 7d). Re-running an interrupted probe with the same "
+            "value resumes it."
+        ),
+    )
     return parser.parse_args()
 
 
+def parse_duration(value: str) -> timedelta:
+    match = DURATION_RE.match(value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid duration '{value}', expected e.g. 12h")
+    amount, unit = match.groups()
+    return timedelta(seconds=float(amount) * DURATION_UNITS[unit])
+
+
+def load_status(path: Path) -> dict[str, dict[str, Any]]:
+    if not path.exists():
+        return {}
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return {item["slug"]: item for item in data if item.get("slug")}
+
+
+def save_status(path: Path, status: dict[str, dict[str, Any]]) -> None:
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(
+        json.dumps(
+            [status[slug] for slug in sorted(status)], ensure_ascii=False, indent=2
+        ),
+        encoding="utf-8",
+    )
+    os.replace(tmp_path, path)
+
+
+def is_stale(item: dict[str, Any] | None, max_age: timedelta) -> bool:
+    if not item or not item.get("checked_at"):
+        return True
+    try:
+        checked_at = datetime.fromisoformat(item["checked_at"])
+    except ValueError:
+        return True
+    return datetime.now(timezone.utc) - checked_at > max_age
+
+
 def parse_group_overrides(values: Iterable[str]) -> dict[str, str]:
     overrides: dict[str, str] = {}
     for value in values:
@@ -179,11 +249,37 @@ def main() -> None:
     if not slugs:
         slugs = DEFAULT_SLUGS
     overrides = parse_group_overrides(args.group)
-
-    results = [
-        inspect_slug(slug, preferred_group=overrides.get(slug.lower()))
-        for slug in slugs
-    ]
+    slugs = list(dict.fromkeys(slugs))
+
+    if args.stale_after is not None and args.status_file is None:
+        args.status_file = DEFAULT_STATUS_FILE
+    status = load_status(args.status_file) if args.status_file else {}
+    if args.stale_after is not None:
+        fresh = [slug for slug in slugs if not is_stale(status.get(slug), args.stale_after)]
+        slugs = [slug for slug in slugs if slug not in fresh]
+        if fresh:
+            print(f"Skipping {len(fresh)} slug(s) checked recently.", file=sys.stderr)
+
+    finished: dict[str, SlugResult] = {}
+    pool = ThreadPoolExecutor(max_workers=max(1, args.workers))
+    try:
+        futures = {
+            pool.submit(probe, slug, overrides.get(slug.lower())): slug
+            for slug in slugs
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            finished[result.slug] = result
+            if args.status_file:
+                status[result.slug] = result.as_dict()
+                save_status(args.status_file, status)
+    except KeyboardInterrupt:
+        pool.shutdown(wait=False, cancel_futures=True)
+        saved = f", saved to {args.status_file}" if args.status_file else ""
+        raise SystemExit(f"Interrupted after {len(finished)} of {len(slugs)} slug(s){saved}.")
+    pool.shutdown()
+
+    results = [finished[slug] for slug in slugs]
 
     if args.json:
         json.dump([item.as_dict() for item in results], sys.stdout, ensure_ascii=False, indent=2)
@@ -0,0 +1,157 @@
+"""Long-running JSON request loop used by ``parser.py --serve``.
+
+Requests and responses are newline-delimited JSON objects. A request looks
+like ``{"id": 1, "method": "get_schedule", "slug": "togu", "group": "..."}``
+and is answered with ``{"id": 1, "ok": true, "result": ...}`` or
+``{"id": 1, "ok": false, "error": "..."}``. Requests are handled by a shared
+thread pool, so responses may arrive out of order and are matched by ``id``.
+A request with ``"trace": true`` also gets the timing spans of its handling
+in ``"trace"`` (see metrics). Handling is timed as ``request.<method>`` for
+the ``methods`` the caller knows and as ``request.unknown`` for anything
+else, so arbitrary client input cannot create new metric names.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Collection, Iterable
+
+import metrics
+
+Handler = Callable[[dict[str, Any]], Any]
+
+
+def _handle_line(handler: Handler, methods: Collection[str], line: str) -> dict[str, Any]:
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError as exc:
+        return {"id": None, "ok": False, "error": f"invalid JSON: {exc}"}
+    if not isinstance(request, dict):
+        return {"id": None, "ok": False, "error": "request must be an object"}
+
+    request_id = request.get("id")
+    method = request.get("method")
+    name = method if isinstance(method, str) and method in methods else "unknown"
+    with metrics.trace() as spans:
+        try:
+            with metrics.span(f"request.{name}"):
+                result = handler(request)
+            response = {"id": request_id, "ok": True, "result": result}
+        except Exception as exc:  # noqa: BLE001
+            response = {"id": request_id, "ok": False, "error": str(exc)}
+    if request.get("trace"):
+        response["trace"] = spans
+    return response
+
+
+class _LineWriter:
+    def __init__(self, write: Callable[[str], Any], flush: Callable[[], Any]):
+        self._write = write
+        self._flush = flush
+        self._lock = threading.Lock()
+
+    def send(self, response: dict[str, Any]) -> None:
+        with metrics.span("output.serialize", trace=False) as span:
+            try:
+                line = json.dumps(response, ensure_ascii=False) + "\n"
+            except (TypeError, ValueError) as exc:
+                # Ответ всё равно нужен: иначе клиент ждёт этот id вечно.
+                line = json.dumps(
+                    {
+                        "id": response.get("id"),
+                        "ok": False,
+                        "error": f"result is not JSON serializable: {exc}",
+                    },
+                    ensure_ascii=False,
+                    default=str,
+                ) + "\n"
+            span.bytes = len(line)
+        with self._lock:
+            try:
+                self._write(line)
+                self._flush()
+            except (BrokenPipeError, ConnectionError, ValueError):
+                # Клиент ушёл раньше, чем получил ответ.
+                pass
+
+
+def _dispatch(
+    handler: Handler,
+    methods: Collection[str],
+    lines: Iterable[str],
+    writer: _LineWriter,
+    pool: ThreadPoolExecutor,
+) -> None:
+    pending: set[Future] = set()
+    lock = threading.Lock()
+
+    def finished(future: Future) -> None:
+        with lock:
+            pending.discard(future)
+
+    for line in lines:
+        if not line.strip():
+            continue
+        future = pool.submit(
+            lambda text=line: writer.send(_handle_line(handler, methods, text))
+        )
+        with lock:
+            pending.add(future)
+        future.add_done_callback(finished)
+    # Клиент мог закрыть запись, не дочитав ответы: до выхода они должны уйти.
+    with lock:
+        remaining = set(pending)
+    wait(remaining)
+
+
+def serve_stdio(
+    handler: Handler, *, workers: int, methods: Collection[str] = frozenset()
+) -> None:
+    sys.stdin.reconfigure(encoding="utf-8")
+    sys.stdout.reconfigure(encoding="utf-8")
+    writer = _LineWriter(sys.stdout.write, sys.stdout.flush)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        _dispatch(handler, methods, sys.stdin, writer, pool)
+
+
+def serve_unix(
+    handler: Handler,
+    path: Path,
+    *,
+    workers: int,
+    methods: Collection[str] = frozenset(),
+) -> None:
+    if not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError("Unix-сокеты не поддерживаются на этой платформе")
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+
+    class _Connection(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            def write(text: str) -> None:
+                self.wfile.write(text.encode("utf-8"))
+
+            writer = _LineWriter(write, self.wfile.flush)
+            lines = (raw.decode("utf-8", errors="replace") for raw in self.rfile)
+            _dispatch(handler, methods, lines, writer, pool)
+
+    class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    if path.exists():
+        path.unlink()
+    try:
+        with _Server(str(path), _Connection) as server:
+            print(f"Парсер слушает {path}", file=sys.stderr)
+            server.serve_forever()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        if path.exists():
+            os.unlink(path)
@@ -0,0 +1,61 @@
+"""Single-flight execution of identical concurrent calls.
+
+``SingleFlight.do(key, fn)`` runs ``fn`` once for all callers that ask for the
+same ``key`` while it is in progress: the first caller runs it, the others
+wait and get the same result (or the same exception). Nothing is cached once
+the call has finished, which is the job of result_cache and directory_cache;
+this only keeps a burst of identical requests from downloading and parsing
+the same page side by side.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Hashable
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "coalesced": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+                self._counters["calls"] += 1
+            else:
+                self._counters["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._counters, "in_flight": len(self._calls)}
@@ -48,6 +48,27 @@ interface ParseScheduleResult {
     error?: string;
 }
 
+interface ParserEnvelope {
+    ok: boolean;
+    result?: any;
+    error?: string;
+}
+
+/**
+ * Разбирает ответ парсера в режиме --output - --framing ndjson
+ */
+function parseEnvelope(output: string | undefined): ParserEnvelope | null {
+    const line = (output || '').split('\n').map(item => item.trim()).filter(item => item.length > 0).pop();
+    if (!line) {
+        return null;
+    }
+    try {
+        return JSON.parse(line);
+    } catch {
+        return null;
+    }
+}
+
 /**
  * Проверяет доступность парсера
  */
@@ -104,37 +125,36 @@ export async function parseSchedule(options: ParseScheduleOptions): Promise<Pars
     const { slug, group } = options;
     
     try {
-        // Определяем директорию парсера
-        const parserDir = path.dirname(PARSER_SCRIPT!);
-        // Создаем временный файл для результата в директории парсера
-        const tempFile = path.resolve(parserDir, 'temp_schedule.json');
-        
-        // Запускаем парсер
-        const command = `python "${PARSER_SCRIPT}" --slug "${slug}" --group "${group}" --output "${tempFile}"`;
+        // Результат приходит в stdout одной NDJSON-строкой, без временного файла:
+        // параллельные запросы не перезаписывают результаты друг друга
+        const command = `python "${PARSER_SCRIPT}" --slug "${slug}" --group "${group}" --output - --framing ndjson`;
         
         console.log(`🔍 Парсинг расписания: ${slug} / ${group}`);
         console.log(`📝 Команда: ${command}`);
         
-        const { stdout, stderr } = await execAsync(command, {
-            encoding: 'utf-8',
-            maxBuffer: 10 * 1024 * 1024 // 10MB
-        });
-        
-        // Проверяем наличие файла результата
-        if (!fs.existsSync(tempFile)) {
-            throw new Error('Файл расписания не был создан');
+        let stdout: string;
+        try {
+            ({ stdout } = await execAsync(command, {
+                encoding: 'utf-8',
+                maxBuffer: 10 * 1024 * 1024 // 10MB
+            }));
+        } catch (error: any) {
+            // При ошибке парсер тоже пишет в stdout конверт {"ok": false, "error": ...}
+            const envelope = parseEnvelope(error.stdout);
+            if (envelope && !envelope.ok) {
+                throw new Error(envelope.error);
+            }
+            throw error;
         }
         
-        // Читаем результат
-        const scheduleContent = fs.readFileSync(tempFile, 'utf-8');
-        const schedule = JSON.parse(scheduleContent);
-        
-        // Удаляем временный файл
-        try {
-            fs.unlinkSync(tempFile);
-        } catch (e) {
-            // Игнорируем ошибки удаления
+        const envelope = parseEnvelope(stdout);
+        if (!envelope) {
+            throw new Error('Парсер не вернул расписание');
+        }
+        if (!envelope.ok) {
+            throw new Error(envelope.error);
         }
+        const schedule = envelope.result;
         
         console.log(`✅ Расписание успешно распарсено`);
         